@@ -2,25 +2,81 @@
 
 from __future__ import annotations
 
-from datetime import timedelta
-from typing import Any
-
-from apm_crewconnect import Apm
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, timedelta
+from functools import partial
+import logging
+from typing import Any, TypeVar
+
+from apm_crewconnect import Apm, Roster
+from apm_crewconnect.exceptions import ApmClientException, OktaClientException
+from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
+from requests.exceptions import RequestException
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, Platform
-from homeassistant.core import HomeAssistant, callback
-
-from .calendar import ApmCalendar
-from .const import CONF_APM_TOKEN, CONF_OKTA_TOKEN, DOMAIN
+from homeassistant.const import CONF_HOST, EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later, async_track_point_in_utc_time
+from homeassistant.util.dt import now, utc_from_timestamp, utcnow
+
+from .cache import SCHEDULE_RETENTION, ApmCache, async_remove_cache
+from .const import (
+    APM_ERRORS,
+    CONF_APM_TOKEN,
+    CONF_MAX_WORKERS,
+    CONF_OKTA_TOKEN,
+    CONF_REQUESTS_PER_MINUTE,
+    DOMAIN,
+)
+from .coordinator import ApmRosterCoordinator
+from .executor import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    async_get_executor,
+)
+from .schedule import ApmFlightSchedule, async_get_flight_schedule
 from .services import async_register_services
+from .transport import async_get_transport
+from .util.circuit_breaker import CircuitBreaker
+from .util.ical import render_event
+from .util.roster_store import ActivityMemo, RosterWindow
+from .util.schedule_columns import ScheduleColumns
+from .util.schedule_index import ScheduleIndex
+from .util.single_flight import SingleFlight
+from .views import ApmRosterFeedView
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+PLATFORMS: list[Platform] = [Platform.CALENDAR, Platform.SENSOR]
+
+APM_CALL_TIMEOUT = 30
+APM_FAILURE_THRESHOLD = 3
+APM_CIRCUIT_RESET_TIMEOUT = timedelta(minutes=5)
 
-PLATFORMS: list[Platform] = [Platform.CALENDAR]
-MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=300)
+SCHEDULE_SOFT_TTL = timedelta(minutes=2)
+SCHEDULE_HARD_TTL = timedelta(minutes=15)
+
+# Long ranges are fetched as concurrent fixed-size chunks, each retried on its own
+ROSTER_CHUNK = timedelta(days=31)
+SCHEDULE_CHUNK = timedelta(days=7)
+MAX_PARALLEL_FETCHES = 4
+CHUNK_RETRIES = 2
+CHUNK_RETRY_DELAY = 1
+
+# Tokens are refreshed in the background ahead of their expiry
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_REFRESH_RETRY = timedelta(minutes=1)
+TOKEN_REFRESH_MAX_RETRY = timedelta(hours=1)
+TOKEN_SAVE_DELAY = 10
 
 
 async def async_setup(hass, config):
     """Track states and offer events for sensors."""
+    hass.http.register_view(ApmRosterFeedView())
+
     return True
 
 
@@ -28,12 +84,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up APM CrewConnect from a config entry."""
     host = entry.data[CONF_HOST]
 
+    # Apply the configured limits to the executor shared by all APM calls
+    executor = async_get_executor(hass)
+    executor.configure(
+        entry.entry_id,
+        entry.options.get(CONF_MAX_WORKERS, DEFAULT_MAX_WORKERS),
+        entry.options.get(CONF_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE),
+    )
+    entry.async_on_unload(partial(executor.release, entry.entry_id))
+
     # Initialize ApmData
     data = ApmData(hass, entry, host)
     await data.setup()
 
-    # Store ApmData for future use
-    hass.data[DOMAIN] = data
+    # Store ApmData for future use, one per account
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = data
+
+    data.async_schedule_token_refresh()
 
     # This creates each HA object for each platform your device requires.
     # It's done by calling the `async_setup_entry` function in each platform module.
@@ -42,6 +109,18 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Register other services
     await async_register_services(hass)
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    # Persist pending token writes before Home Assistant stops
+    @callback
+    def _async_flush_tokens(_: Event) -> None:
+        data.token_manager.async_flush()
+
+    entry.async_on_unload(data.token_manager.async_flush)
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_flush_tokens)
+    )
+
     return True
 
 
@@ -50,10 +129,22 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     if unload_ok:
-        hass.data.pop(DOMAIN)
+        hass.data[DOMAIN].pop(entry.entry_id)
     return unload_ok
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry after its options were updated."""
+    # Token writes update the entry's data, which doesn't require a reload
+    if entry.options != hass.data[DOMAIN][entry.entry_id].options:
+        await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the persisted cache of a config entry."""
+    await async_remove_cache(hass, entry.entry_id)
+
+
 class ApmData:
     """Handle getting the latest data from APM so platforms can use it.
 
@@ -61,6 +152,11 @@ class ApmData:
     """
 
     apm: Apm | None = None
+    cache: ApmCache | None = None
+    schedule: ApmFlightSchedule | None = None
+    coordinator: ApmRosterCoordinator | None = None
+    ical_blocks: ActivityMemo[str] | None = None
+    token_manager: TokenManager | None = None
 
     def __init__(
         self,
@@ -72,32 +168,320 @@ class ApmData:
         self._hass = hass
         self.entry = entry
         self.host = host
+        self._roster_requests: SingleFlight[Roster] = SingleFlight()
+        self._breaker = CircuitBreaker(
+            APM_FAILURE_THRESHOLD, APM_CIRCUIT_RESET_TIMEOUT.total_seconds()
+        )
+        self._fetch_slots = asyncio.Semaphore(MAX_PARALLEL_FETCHES)
+        self._executor = async_get_executor(hass)
+        self._transport = async_get_transport(hass)
+        self._unsub_token_refresh: Callable[[], None] | None = None
+        self._token_refresh_failures = 0
+        self.options = dict(entry.options)
 
     async def setup(self) -> None:
         """Ensure the ApmData object is set up."""
-        self.apm = await self._hass.async_add_executor_job(
-            lambda: Apm(
-                host=self.host,
-                token_manager=TokenManager(self._hass, self.entry),
+        self.token_manager = TokenManager(self._hass, self.entry)
+        self.apm = await self._executor.async_run(
+            self._transport.run,
+            lambda: Apm(host=self.host, token_manager=self.token_manager),
+        )
+        self._transport.attach(self.apm)
+
+        self.entry.async_on_unload(self._async_cancel_token_refresh)
+
+        self.coordinator = ApmRosterCoordinator(self._hass, self)
+        self.cache = ApmCache(self._hass, self.entry.entry_id, self.coordinator.store)
+        self.schedule = async_get_flight_schedule(self._hass, self.host)
+        await self.schedule.async_load()
+        self.ical_blocks = self.coordinator.store.memo(
+            partial(render_event, self.apm.user_id)
+        )
+
+        if await self.cache.async_load():
+            # Serve the cached roster straight away and revalidate it in the background
+            self.coordinator.async_set_updated_data(self.coordinator.store)
+            self.entry.async_create_background_task(
+                self._hass,
+                self.coordinator.async_refresh(),
+                "apm_roster_revalidate",
             )
+        else:
+            await self.coordinator.async_config_entry_first_refresh()
+
+    async def async_get_roster(
+        self, start_date: date, end_date: date
+    ) -> Roster | RosterWindow:
+        """Get the roster, fetching long ranges as concurrent chunks.
+
+        Each chunk joins any in-flight request covering it, so the returned roster
+        may span more than the requested range.
+        """
+        rosters = await self._async_fetch_chunked(
+            start_date, end_date, ROSTER_CHUNK, self._async_fetch_roster
+        )
+
+        return rosters[0] if len(rosters) == 1 else RosterWindow.combine(rosters)
+
+    async def _async_fetch_roster(self, start_date: date, end_date: date) -> Roster:
+        """Fetch the roster, joining a covering request already in flight."""
+        roster, _ = await self._roster_requests.async_run(
+            start_date,
+            end_date,
+            lambda: self._async_call(self.apm.get_roster, start_date, end_date),
         )
 
-    # @Throttle(MIN_TIME_BETWEEN_UPDATES)
-    # async def update(self):
-    #     """Get the latest data from APM."""
-    #     assert isinstance(self.apm, Apm)
-    #     await self._hass.async_add_executor_job(self.apm.update)
+        return roster
+
+    async def async_get_flight_schedule(
+        self, start_date: date, end_date: date | None = None
+    ) -> list:
+        """Get the flight schedule, serving cached days whenever possible.
+
+        Without an end date, only the start date is returned.
+        """
+        end_date = end_date or start_date
+        await self._async_ensure_flight_schedule(start_date, end_date)
+
+        return self.schedule.days.flights(start_date, end_date)
+
+    async def async_get_schedule_index(
+        self, start_date: date, end_date: date
+    ) -> ScheduleIndex:
+        """Get the index of the flight schedule, covering at least the range."""
+        await self._async_ensure_flight_schedule(start_date, end_date)
+
+        return self.schedule.days.index
+
+    async def async_get_schedule_columns(
+        self, start_date: date, end_date: date
+    ) -> ScheduleColumns:
+        """Get the flight schedule of a range as NumPy columns."""
+        await self._async_ensure_flight_schedule(start_date, end_date)
+
+        return self.schedule.days.columns(start_date, end_date)
+
+    async def _async_ensure_flight_schedule(
+        self, start_date: date, end_date: date
+    ) -> None:
+        """Ensure the flight schedule of a range is cached.
+
+        Days fetched longer than the soft TTL ago are kept while being refreshed in
+        the background. Days missing or past the hard TTL are fetched, falling back
+        to expired days when APM can't be reached. Expired days older than the
+        persisted ones are dropped first, so past days don't pile up in memory.
+        """
+        schedules = self.schedule.days
+        moment = utcnow()
+        schedules.prune(now().date() - SCHEDULE_RETENTION, moment - SCHEDULE_HARD_TTL)
+
+        if missing := schedules.missing(
+            start_date, end_date, moment - SCHEDULE_HARD_TTL
+        ):
+            try:
+                await self._async_fetch_flight_schedules(missing)
+            except APM_ERRORS:
+                if not schedules.covers(start_date, end_date):
+                    raise
+
+                _LOGGER.warning(
+                    "Unable to reach APM, using flight schedule fetched at %s",
+                    schedules.oldest(start_date, end_date),
+                )
+
+        if stale := schedules.missing(
+            start_date, end_date, moment - SCHEDULE_SOFT_TTL
+        ):
+            self.entry.async_create_background_task(
+                self._hass,
+                self._async_revalidate_flight_schedule(stale),
+                "apm_flight_schedule_revalidate",
+            )
+
+    async def _async_fetch_flight_schedules(
+        self, ranges: list[tuple[date, date]]
+    ) -> None:
+        """Fetch ranges of the flight schedule into the cache as concurrent chunks."""
+        await asyncio.gather(
+            *(
+                self._async_fetch_chunked(
+                    range_start,
+                    range_end,
+                    SCHEDULE_CHUNK,
+                    self._async_fetch_flight_schedule,
+                )
+                for range_start, range_end in ranges
+            )
+        )
+
+    async def _async_fetch_flight_schedule(
+        self, start_date: date, end_date: date
+    ) -> None:
+        """Fetch a range of the flight schedule shared with the host's accounts."""
+        await self.schedule.async_fetch(
+            start_date,
+            end_date,
+            lambda: self._async_call(
+                self.apm.get_flight_schedule, start_date, end_date
+            ),
+        )
+
+    async def _async_revalidate_flight_schedule(
+        self, ranges: list[tuple[date, date]]
+    ) -> None:
+        """Refresh stale ranges of the cached flight schedule in the background."""
+        try:
+            await self._async_fetch_flight_schedules(ranges)
+        except APM_ERRORS as err:
+            _LOGGER.debug("Unable to revalidate flight schedule: %s", repr(err))
+
+    async def _async_fetch_chunked(
+        self,
+        start_date: date,
+        end_date: date,
+        chunk: timedelta,
+        fetch: Callable[[date, date], Awaitable[_T]],
+    ) -> list[_T]:
+        """Fetch a date range as concurrent fixed-size chunks, returned in order."""
+        return await asyncio.gather(
+            *(
+                self._async_fetch_chunk(chunk_start, chunk_end, fetch)
+                for chunk_start, chunk_end in _chunks(start_date, end_date, chunk)
+            )
+        )
+
+    async def _async_fetch_chunk(
+        self,
+        start_date: date,
+        end_date: date,
+        fetch: Callable[[date, date], Awaitable[_T]],
+    ) -> _T:
+        """Fetch one chunk through the bounded pool, retrying it on failure."""
+        attempt = 0
+
+        while True:
+            try:
+                async with self._fetch_slots:
+                    return await fetch(start_date, end_date)
+            except (TimeoutError, RequestException) as err:
+                if attempt == CHUNK_RETRIES:
+                    raise
+
+                _LOGGER.debug(
+                    "Retrying fetch of %s to %s: %s", start_date, end_date, repr(err)
+                )
+                await asyncio.sleep(CHUNK_RETRY_DELAY * 2**attempt)
+                attempt += 1
+
+    @callback
+    def async_schedule_token_refresh(self, delay: timedelta = timedelta()) -> None:
+        """Schedule the next token refresh, shortly before a token expires.
+
+        The refresh is never scheduled sooner than the given delay.
+        """
+        self._async_cancel_token_refresh()
+
+        if (expires_at := self.token_manager.expires_at()) is None:
+            return
+
+        self._unsub_token_refresh = async_track_point_in_utc_time(
+            self._hass,
+            self._async_refresh_tokens,
+            max(expires_at - TOKEN_REFRESH_MARGIN, utcnow() + delay),
+        )
+
+    async def _async_refresh_tokens(self, _: datetime) -> None:
+        """Refresh the tokens in the background so requests never wait on it.
+
+        The client refreshes the Okta token, gets a new APM token with it and
+        hands both to the token manager. Failed refreshes are retried less and
+        less often, except for a rejected refresh token, which only the user can
+        replace.
+        """
+        self._unsub_token_refresh = None
+        expires_at = self.token_manager.expires_at()
+
+        try:
+            await self._async_call(self.apm.client.refresh_token)
+        except InvalidGrantError as err:
+            _LOGGER.warning("APM refresh token was rejected, reauthenticating: %r", err)
+            self.entry.async_start_reauth(self._hass)
+            return
+        except (*APM_ERRORS, ApmClientException, OktaClientException) as err:
+            _LOGGER.warning("Unable to refresh APM tokens, will retry: %r", err)
+            self._async_retry_token_refresh()
+            return
+
+        if self.token_manager.expires_at() == expires_at:
+            _LOGGER.debug("APM tokens were not renewed, will retry")
+            self._async_retry_token_refresh()
+            return
+
+        self._token_refresh_failures = 0
+        self.async_schedule_token_refresh(TOKEN_REFRESH_RETRY)
+
+    @callback
+    def _async_retry_token_refresh(self) -> None:
+        """Schedule another refresh, backing off further after each failure."""
+        delay = min(
+            TOKEN_REFRESH_RETRY * 2**self._token_refresh_failures,
+            TOKEN_REFRESH_MAX_RETRY,
+        )
+        self._token_refresh_failures += 1
+        self.async_schedule_token_refresh(delay)
+
+    @callback
+    def _async_cancel_token_refresh(self) -> None:
+        if self._unsub_token_refresh is not None:
+            self._unsub_token_refresh()
+            self._unsub_token_refresh = None
+
+    async def _async_call(self, job: Callable[..., _T], *args: Any) -> _T:
+        """Run a blocking APM call with a deadline, behind the circuit breaker."""
+        self._breaker.check()
+
+        try:
+            async with asyncio.timeout(APM_CALL_TIMEOUT):
+                result = await self._executor.async_run(
+                    self._transport.run, job, *args
+                )
+        except (TimeoutError, RequestException):
+            self._breaker.record_failure()
+            raise
+        except BaseException:
+            # Other errors, such as unparsable responses or a cancellation, tell
+            # nothing about APM's health but must not leave a trial call pending
+            self._breaker.release_trial()
+            raise
+
+        self._breaker.record_success()
+
+        return result
+
+
+def _chunks(
+    start_date: date, end_date: date, chunk: timedelta
+) -> list[tuple[date, date]]:
+    """Split an inclusive date range into consecutive chunks."""
+    chunks = []
+
+    while start_date <= end_date:
+        chunk_end = min(start_date + chunk - timedelta(days=1), end_date)
+        chunks.append((start_date, chunk_end))
+        start_date = chunk_end + timedelta(days=1)
+
+    return chunks
 
 
 class TokenManager:
     """Token Manager implementation for APM CrewConnect."""
 
-    _tokens: dict[str, dict[str, Any]] = {}
-
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """Initialize the Token Manager."""
         self.hass = hass
         self.config_entry = config_entry
+        self._tokens: dict[str, dict[str, Any]] = {}
+        self._unsub_save: Callable[[], None] | None = None
         self._retrieve()
 
     def set(self, **kwargs) -> None:
@@ -122,12 +506,35 @@ class TokenManager:
         """Determine if a specific token is held."""
         return self.get(key) is not None
 
+    def expires_at(self) -> datetime | None:
+        """Return when the first of the held tokens expires."""
+        return min(
+            (
+                utc_from_timestamp(token["expires_at"])
+                for token in self._tokens.values()
+                if isinstance(token, dict) and token.get("expires_at")
+            ),
+            default=None,
+        )
+
+    @callback
+    def async_flush(self) -> None:
+        """Persist pending token writes straight away."""
+        if self._unsub_save is not None:
+            self._unsub_save()
+            self._async_save()
+
     def _store(self) -> None:
-        data = dict(self.config_entry.data)
-        data[CONF_APM_TOKEN] = self._tokens["apm"]
-        data[CONF_OKTA_TOKEN] = self._tokens["okta"]
+        # Tokens are written from executor threads, often several at once, so
+        # writes are coalesced into a single config entry update
+        self.hass.loop.call_soon_threadsafe(self._async_schedule_save)
 
-        self.hass.add_job(self._update_config_entry, data)
+    @callback
+    def _async_schedule_save(self) -> None:
+        if self._unsub_save is None:
+            self._unsub_save = async_call_later(
+                self.hass, TOKEN_SAVE_DELAY, self._async_save
+            )
 
     def _retrieve(self) -> None:
         self._tokens = {}
@@ -139,5 +546,11 @@ class TokenManager:
             self._tokens["okta"] = self.config_entry.data[CONF_OKTA_TOKEN]
 
     @callback
-    def _update_config_entry(self, data):
+    def _async_save(self, _: datetime | None = None) -> None:
+        self._unsub_save = None
+
+        data = dict(self.config_entry.data)
+        data[CONF_APM_TOKEN] = self._tokens["apm"]
+        data[CONF_OKTA_TOKEN] = self._tokens["okta"]
+
         self.hass.config_entries.async_update_entry(self.config_entry, data=data)
@@ -0,0 +1,160 @@
+"""Persistent roster and flight schedule cache for APM CrewConnect."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+from homeassistant.util.dt import now, parse_datetime
+
+from .const import ACFT_TYPES, DOMAIN, ROLES
+from .util.coverage import CoverageInterval
+from .util.roster_store import RosterStore
+from .util.schedule_cache import FlightScheduleCache, ScheduleDay
+from .util.serialize import decode, encode
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Bumped whenever the layout of the stored document changes, discarding older caches
+CACHE_FORMAT = 4
+SAVE_DELAY = 30
+SCHEDULE_RETENTION = timedelta(days=1)
+
+
+class ApmCache:
+    """Persist the roster store of an account between restarts.
+
+    Library objects are stored as plain JSON values and rebuilt on load. A cache
+    which can't be rebuilt is discarded.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, roster_store: RosterStore
+    ) -> None:
+        """Initialize the cache for a config entry."""
+        self._store = _async_get_store(hass, entry_id)
+        self.roster_store = roster_store
+
+    async def async_load(self) -> bool:
+        """Load cached data into the roster store, returning whether any was found."""
+        if (stored := await self._store.async_load()) is None:
+            return False
+
+        if stored.get("format") != CACHE_FORMAT:
+            return False
+
+        try:
+            self.roster_store.restore(
+                stored["user_id"],
+                decode(stored["roster"]["activities"]),
+                [
+                    CoverageInterval(
+                        date.fromisoformat(start),
+                        date.fromisoformat(end),
+                        parse_datetime(fetched_at),
+                    )
+                    for start, end, fetched_at in stored["roster"]["coverage"]
+                ],
+            )
+        except Exception:  # noqa: BLE001
+            _LOGGER.warning("Discarding APM cache which could not be restored")
+            return False
+
+        return bool(self.roster_store.coverage)
+
+    def async_schedule_save(self) -> None:
+        """Save the cache once writes have settled."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {
+            "format": CACHE_FORMAT,
+            "user_id": self.roster_store.user_id,
+            "roster": {
+                "coverage": [
+                    [
+                        interval.start.isoformat(),
+                        interval.end.isoformat(),
+                        interval.fetched_at.isoformat(),
+                    ]
+                    for interval in self.roster_store.coverage.intervals
+                ],
+                "activities": encode(self.roster_store.activities),
+            },
+        }
+
+
+class ApmScheduleCache:
+    """Persist the flight schedule of an APM host between restarts.
+
+    The flight schedule is the same for every account on a host, so it is cached
+    once per host rather than once per config entry.
+    """
+
+    def __init__(self, hass: HomeAssistant, host: str) -> None:
+        """Initialize the cache for a host."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass,
+            STORAGE_VERSION,
+            f"{DOMAIN}.schedule.{slugify(host)}",
+            private=True,
+        )
+        self.schedules = FlightScheduleCache(ROLES, ACFT_TYPES)
+
+    async def async_load(self) -> None:
+        """Load the cached flight schedule."""
+        if (stored := await self._store.async_load()) is None:
+            return
+
+        if stored.get("format") != CACHE_FORMAT:
+            return
+
+        try:
+            self.schedules.restore(
+                ScheduleDay(
+                    date.fromisoformat(day["day"]),
+                    parse_datetime(day["fetched_at"]),
+                    decode(day["flights"]),
+                )
+                for day in stored["schedules"]
+            )
+        except Exception:  # noqa: BLE001
+            _LOGGER.warning(
+                "Discarding flight schedule cache which could not be restored"
+            )
+
+    def async_schedule_save(self) -> None:
+        """Save the cache once writes have settled."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        # Past days are only kept in memory while fresh, never persisted
+        first_day = now().date() - SCHEDULE_RETENTION
+
+        return {
+            "format": CACHE_FORMAT,
+            "schedules": [
+                {
+                    "day": day.day.isoformat(),
+                    "fetched_at": day.fetched_at.isoformat(),
+                    "flights": encode(day.flights),
+                }
+                for day in self.schedules
+                if day.day >= first_day
+            ],
+        }
+
+
+async def async_remove_cache(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the persisted cache of a config entry."""
+    await _async_get_store(hass, entry_id).async_remove()
+
+
+def _async_get_store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}", private=True)
+
@@ -1,16 +1,23 @@
 """Calendar entity for APM CrewConnect."""
 
-from datetime import date, datetime, timedelta
+from datetime import datetime
+import logging
 
-from apm_crewconnect import Roster
+from apm_crewconnect import Activity, utils as apm_utils
 
 from homeassistant.components.calendar import CalendarEntity, CalendarEvent
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.util.dt import now
 
-from .const import DOMAIN
+from .const import APM_ERRORS, DOMAIN
+from .coordinator import ApmRosterCoordinator
+from .util.pairings import Pairing
+
+_LOGGER = logging.getLogger(__name__)
 
 
 # This function is called as part of the __init__.async_setup_entry (via the
@@ -21,20 +28,28 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Add calendar for passed config_entry in Home Assistant."""
-    async_add_entities([ApmCalendar(hass)])
+    async_add_entities(
+        [ApmCalendar(hass, config_entry), ApmTripCalendar(hass, config_entry)]
+    )
 
 
-class ApmCalendar(CalendarEntity):
+class ApmCalendar(CoordinatorEntity[ApmRosterCoordinator], CalendarEntity):
     """A calendar entity."""
 
     def __init__(
         self,
         hass: HomeAssistant,
+        config_entry: ConfigEntry,
     ) -> None:
         """Initialize the calendar entity."""
+        self.data = hass.data[DOMAIN][config_entry.entry_id]
+        super().__init__(self.data.coordinator)
         self._hass = hass
-        self._roster = None
-        self.data = hass.data[DOMAIN]
+        self._store = self.coordinator.store
+        self._register_events()
+        self._activity: Activity | None = None
+        self._unsub_boundary: CALLBACK_TYPE | None = None
+        self._was_available = False
 
     @property
     def unique_id(self) -> str | None:
@@ -48,19 +63,58 @@ class ApmCalendar(CalendarEntity):
 
     @property
     def event(self) -> CalendarEvent | None:
-        """Return the next upcoming event."""
-        upcoming_activities = [
-            activity
-            for activity in (self._roster.activities if self._roster else [])
-            if activity.start > now()
-        ]
+        """Return the current or next upcoming event."""
+        return self._event(self._activity) if self._activity else None
+
+    async def async_added_to_hass(self) -> None:
+        """Start tracking the current or next activity."""
+        await super().async_added_to_hass()
+        self._was_available = self.available
+        self._async_track_activity()
+        self.async_on_remove(self._async_cancel_boundary)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when the roster or availability has changed."""
+        if not self.coordinator.last_merge and self.available == self._was_available:
+            return
+
+        self._was_available = self.available
+        self._async_track_activity()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_boundary_reached(self, _: datetime) -> None:
+        """Move on to the next activity once the tracked one starts or ends."""
+        self._unsub_boundary = None
+        self._async_track_activity()
+        self.async_write_ha_state()
+
+    @callback
+    def _async_track_activity(self) -> None:
+        """Point at the current or next activity and wait for its next boundary."""
+        self._async_cancel_boundary()
+
+        moment = now()
+        self._activity = self._current_or_next(moment)
+
+        if self._activity is None:
+            return
 
-        return (
-            self._parse_activity_to_event(upcoming_activities[0])
-            if upcoming_activities
-            else None
+        self._unsub_boundary = async_track_point_in_time(
+            self.hass,
+            self._async_boundary_reached,
+            self._activity.start
+            if moment < self._activity.start
+            else self._activity.end,
         )
 
+    @callback
+    def _async_cancel_boundary(self) -> None:
+        if self._unsub_boundary is not None:
+            self._unsub_boundary()
+            self._unsub_boundary = None
+
     async def async_get_events(
         self,
         hass: HomeAssistant,
@@ -68,38 +122,28 @@ class ApmCalendar(CalendarEntity):
         end_date: datetime,
     ) -> list[CalendarEvent]:
         """Return calendar events within a datetime range."""
-        # Check if the events within the requested date range are already loaded
-        if not self._range_loaded(start_date, end_date):
-            # Fetch new events for the requested date range
-            await hass.async_add_executor_job(
-                self.fetch_roster, start_date.date(), end_date.date()
+        # Only fetch the parts of the requested date range which aren't loaded yet
+        try:
+            await self.coordinator.async_fetch_range(
+                start_date.date(), end_date.date()
             )
+        except APM_ERRORS as err:
+            _LOGGER.warning("Unable to fetch roster, showing cached events: %r", err)
 
         # Return events within the requested date range
         return [
-            self._parse_activity_to_event(activity)
+            self._event(activity)
             for activity in self._activities_in_range(start_date, end_date)
         ]
 
-    async def async_update(self) -> None:
-        """Fetch the latest general calendar state."""
-        # Set default date range
-        start_date = now().date()
-        end_date = start_date + timedelta(days=30)
-
-        # Fetch roster
-        await self._hass.async_add_executor_job(self.fetch_roster, start_date, end_date)
+    def _register_events(self) -> None:
+        self._events = self._store.memo(self._parse_activity_to_event)
 
-    def fetch_roster(self, start_date: date, end_date: date) -> None:
-        """Fetch events from APM service (blocking)."""
-        self._load_roster(self.data.apm.get_roster(start_date, end_date))
+    def _event(self, activity) -> CalendarEvent:
+        return self._events.get(activity)
 
-    def _parse_roster_to_events(self, roster: Roster) -> list[CalendarEvent]:
-        """Convert roster into CalendarEvent objects."""
-        return sorted(
-            [self._parse_activity_to_event(activity) for activity in roster.activities],
-            key=lambda event: event.start,
-        )
+    def _current_or_next(self, moment: datetime):
+        return self._store.current_or_next(moment)
 
     def _parse_activity_to_event(self, activity) -> CalendarEvent:
         return CalendarEvent(
@@ -109,51 +153,80 @@ class ApmCalendar(CalendarEntity):
             description=activity.details,
         )
 
-    def _range_loaded(self, start_date: datetime, end_date: datetime) -> bool:
-        """Check if we have the roster loaded for the specified date range."""
-        if not self._roster:
-            return False
-
-        # Check if the specified range is within the loaded roster's bounds
-        # and if there are any loaded activities within the specified range
-        # This can result in more API calls than necessary but ensures nothing gets missed
-        return (
-            self._roster.start <= start_date.date()
-            and end_date.date() <= self._roster.end
-            and len(self._activities_in_range(start_date, end_date)) > 0
-        )
-
     def _activities_in_range(self, start_date: datetime, end_date: datetime):
-        return [
-            activity
-            for activity in self._roster.activities
-            if activity.start >= start_date and activity.end <= end_date
-        ]
+        return self._store.in_range(start_date, end_date)
 
-    def _load_roster(self, new_roster: Roster) -> None:
-        """Load a new roster into the existing one, overwriting the overlapping date range with activities from new_roster."""
-        if not self._roster:
-            self._roster = new_roster
-            return
 
-        activities = [
-            activity
-            for activity in self._roster.activities
-            if (
-                activity.end.date() < new_roster.start
-                and activity.start.date() > new_roster.end
+class ApmTripCalendar(ApmCalendar):
+    """A calendar entity with one event per trip, from report to release."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+    ) -> None:
+        """Initialize the trip calendar entity."""
+        super().__init__(hass, config_entry)
+        self._pairings = self.coordinator.pairings
+
+    @property
+    def unique_id(self) -> str | None:
+        """Return the unique ID of the calendar."""
+        return "apm_trips_" + self.data.apm.user_id
+
+    @property
+    def name(self) -> str | None:
+        """Return the name of the calendar."""
+        return "APM Trips" + " [" + self.data.apm.user_id + "]"
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Drop the events of trips no longer on the roster."""
+        for activity in self.coordinator.last_merge.removed:
+            if self._pairings.get(activity.pairing_id) is None:
+                self._trip_events.pop(activity.pairing_id, None)
+
+        super()._handle_coordinator_update()
+
+    def _register_events(self) -> None:
+        # Trips are cached here rather than in a store memo, as they are rebuilt
+        # from several activities
+        self._trip_events: dict[object, tuple[Pairing, CalendarEvent]] = {}
+
+    def _event(self, activity: Pairing) -> CalendarEvent:
+        # Pairings are rebuilt whenever one of their activities changes
+        cached = self._trip_events.get(activity.pairing_id)
+
+        if cached is None or cached[0] is not activity:
+            cached = self._trip_events[activity.pairing_id] = (
+                activity,
+                self._parse_trip_to_event(activity),
             )
-        ]
 
-        activities.extend(new_roster.activities)
+        return cached[1]
 
-        activities = sorted(
-            activities,
-            key=lambda activity: activity.start,
-        )
+    def _current_or_next(self, moment: datetime) -> Pairing | None:
+        return self._pairings.current_or_next(moment)
 
-        self._roster.activities = activities
-        if new_roster.start < self._roster.start:
-            self._roster.start = new_roster.start
-        if self._roster.end < new_roster.end:
-            self._roster.end = new_roster.end
+    def _activities_in_range(self, start_date: datetime, end_date: datetime):
+        return self._pairings.overlapping(start_date, end_date)
+
+    def _parse_trip_to_event(self, trip: Pairing) -> CalendarEvent:
+        return CalendarEvent(
+            start=trip.report,
+            end=trip.release,
+            summary="Trip " + "-".join(trip.route),
+            description="\n".join(
+                [
+                    "BLK : "
+                    + apm_utils.timedelta_to_str(trip.block_time, "{:02}:{:02}"),
+                    *(
+                        "Layover : "
+                        + (station or "?")
+                        + " "
+                        + apm_utils.timedelta_to_str(end - start, "{:02}:{:02}")
+                        for station, start, end in trip.layovers
+                    ),
+                ]
+            ),
+        )
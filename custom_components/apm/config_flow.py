@@ -2,21 +2,45 @@
 
 from __future__ import annotations
 
+from collections.abc import Callable, Mapping
 import logging
-from typing import Any
+from typing import Any, TypeVar
 
 from apm_crewconnect import Apm
 from apm_crewconnect.exceptions import InvalidAuthRedirectException
 from requests.exceptions import ConnectionError
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
+from homeassistant.config_entries import (
+    SOURCE_REAUTH,
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
 from homeassistant.const import CONF_HOST
-
-from .const import CONF_APM_TOKEN, CONF_AUTH_REDIRECT, CONF_OKTA_TOKEN, DOMAIN
+from homeassistant.core import callback
+
+from .const import (
+    CONF_APM_TOKEN,
+    CONF_AUTH_REDIRECT,
+    CONF_MAX_WORKERS,
+    CONF_OKTA_TOKEN,
+    CONF_REQUESTS_PER_MINUTE,
+    DOMAIN,
+)
+from .executor import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    MAX_WORKERS,
+    async_get_executor,
+)
+from .transport import ApmTransport
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 
 class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for APM CrewConnect."""
@@ -24,6 +48,15 @@ class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
     _apm: Apm | None = None
+    # The flow runs before any entry is set up, so it sends its few requests with
+    # plain `requests` rather than over Home Assistant's aiohttp session
+    _transport: ApmTransport | None = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> ApmOptionsFlow:
+        """Get the options flow for this handler."""
+        return ApmOptionsFlow(config_entry)
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -32,13 +65,16 @@ class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
         errors: dict[str, str] = {}
 
         if user_input is not None:
+            self._transport = ApmTransport()
+
             try:
-                self._apm: Apm = await self.hass.async_add_executor_job(
+                self._apm: Apm = await self._async_run(
                     lambda: Apm(
                         host=user_input[CONF_HOST],
                         manual_auth=True,
                     )
                 )
+                self._transport.attach(self._apm)
             except ConnectionError:
                 errors["base"] = "cannot_connect"
 
@@ -55,6 +91,12 @@ class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_reauth(
+        self, entry_data: Mapping[str, Any]
+    ) -> ConfigFlowResult:
+        """Authorize again once APM rejected the refresh token."""
+        return await self.async_step_user({CONF_HOST: entry_data[CONF_HOST]})
+
     async def async_step_authorize(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -66,23 +108,39 @@ class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             # Attempt to obtain tokens from APM and finish the flow.
             try:
-                await self.hass.async_add_executor_job(
+                await self._async_run(
                     self._apm.authenticate_from_redirect, user_input[CONF_AUTH_REDIRECT]
                 )
 
-                # Tokens obtained; create the config entry.
-                return self.async_create_entry(
-                    title=self._apm.user_id,
-                    data={
-                        CONF_HOST: self._apm.host,
-                        CONF_APM_TOKEN: self._apm.client.token,
-                        CONF_OKTA_TOKEN: self._apm.client.okta_client.token,
-                    },
+                # Each crew account may only be configured once per host.
+                await self.async_set_unique_id(
+                    f"{self._apm.host}_{self._apm.user_id}"
                 )
+                data = {
+                    CONF_HOST: self._apm.host,
+                    CONF_APM_TOKEN: self._apm.client.token,
+                    CONF_OKTA_TOKEN: self._apm.client.okta_client.token,
+                }
+
+                if self.source == SOURCE_REAUTH:
+                    # Only the account being reauthenticated may replace its tokens
+                    entry = self.hass.config_entries.async_get_entry(
+                        self.context["entry_id"]
+                    )
+
+                    if entry.unique_id != self.unique_id:
+                        return self.async_abort(reason="wrong_account")
+
+                    return self.async_update_reload_and_abort(entry, data=data)
+
+                self._abort_if_unique_id_configured()
+
+                # Tokens obtained; create the config entry.
+                return self.async_create_entry(title=self._apm.user_id, data=data)
             except InvalidAuthRedirectException:
                 errors["base"] = "invalid_auth_redirect"
 
-        auth_url = await self.hass.async_add_executor_job(self._apm.generate_auth_url)
+        auth_url = await self._async_run(self._apm.generate_auth_url)
 
         return self.async_show_form(
             step_id="authorize",
@@ -94,3 +152,44 @@ class ApmConfigFlow(ConfigFlow, domain=DOMAIN):
             errors=errors,
             description_placeholders={"auth_url": auth_url},
         )
+
+    async def _async_run(self, job: Callable[..., _T], *args: Any) -> _T:
+        """Run a blocking APM call through the flow's transport."""
+        return await async_get_executor(self.hass).async_run(
+            self._transport.run, job, *args
+        )
+
+
+class ApmOptionsFlow(OptionsFlow):
+    """Handle the options of APM CrewConnect."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Manage the limits applied to requests to APM."""
+        if user_input is not None:
+            return self.async_create_entry(data=user_input)
+
+        options = self._config_entry.options
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_MAX_WORKERS,
+                        default=options.get(CONF_MAX_WORKERS, DEFAULT_MAX_WORKERS),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_WORKERS)),
+                    vol.Required(
+                        CONF_REQUESTS_PER_MINUTE,
+                        default=options.get(
+                            CONF_REQUESTS_PER_MINUTE, DEFAULT_REQUESTS_PER_MINUTE
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=600)),
+                }
+            ),
+        )
@@ -1,16 +1,48 @@
 """Constants for the APM CrewConnect integration."""
 
+from datetime import timedelta
+
+from requests.exceptions import RequestException
+
+from .util.circuit_breaker import CircuitOpenError
+
 DOMAIN = "apm"
 
 CONF_AUTH_REDIRECT = "auth_redirect"
 CONF_APM_TOKEN = "apm_token"
 CONF_OKTA_TOKEN = "okta_token"
+CONF_MAX_WORKERS = "max_workers"
+CONF_REQUESTS_PER_MINUTE = "requests_per_minute"
 
+ATTR_ACCOUNT = "account"
 ATTR_START_DATE = "start_date"
 ATTR_END_DATE = "end_date"
 ATTR_ACFT_TYPE = "aircraft_type"
+ATTR_ACFT_TYPES = "aircraft_types"
+ATTR_CREW_CODE = "crew_code"
 ATTR_ROLE = "role"
+ATTR_ROLES = "roles"
 ATTR_SAVE_TO_FILE = "save_to_file"
+ATTR_LIMIT = "limit"
+ATTR_OFFSET = "offset"
+ATTR_FIELDS = "fields"
+ATTR_DEPARTURE = "departure"
+ATTR_BLOCK_TIME = "block_time"
+ATTR_DUTY_TIME = "duty_time"
+ATTR_REST = "rest"
+ATTR_HOME_BASE = "home_base"
+ATTR_PAIRING_ID = "pairing_id"
 
 ACFT_TYPES = ["73H", "32N"]
 ROLES = ["CDB", "OPL", "SUPT", "INS", "CC", "CA", "SUPC", "SOL"]
+
+# Minimum rest around a picked up flight
+DEFAULT_REST = timedelta(hours=12)
+
+# Rolling windows of flight time limitations, in days, with the EASA limits
+FTL_WINDOWS = [7, 28, 365]
+FTL_BLOCK_LIMITS = {28: timedelta(hours=100), 365: timedelta(hours=1000)}
+FTL_DUTY_LIMITS = {7: timedelta(hours=60), 28: timedelta(hours=190)}
+
+# Errors raised when APM is slow, unreachable or refused by the circuit breaker
+APM_ERRORS = (TimeoutError, RequestException, CircuitOpenError)
@@ -0,0 +1,170 @@
+"""Roster update coordinator for APM CrewConnect."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, timedelta
+import logging
+from typing import TYPE_CHECKING
+
+from apm_crewconnect import Roster
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.util.dt import now, utcnow
+
+from .const import APM_ERRORS, DOMAIN
+from .util.ftl import FtlTracker
+from .util.pairings import PairingIndex
+from .util.roster_store import MergeResult, RosterStore, is_duty
+
+if TYPE_CHECKING:
+    from . import ApmData
+
+_LOGGER = logging.getLogger(__name__)
+
+ROSTER_WINDOW = timedelta(days=30)
+ROSTER_SOFT_TTL = timedelta(hours=1)
+# Past days only change when block times are logged after the fact
+ROSTER_HISTORY_TTL = timedelta(days=7)
+
+# Poll often around duties, when roster changes actually matter, and back off
+# during long stretches without any activity.
+UPDATE_INTERVAL_ON_DUTY = timedelta(minutes=5)
+UPDATE_INTERVAL_DUTY_SOON = timedelta(minutes=15)
+UPDATE_INTERVAL_DEFAULT = timedelta(hours=1)
+UPDATE_INTERVAL_DAYS_OFF = timedelta(hours=3)
+
+DUTY_IMMINENT = timedelta(hours=3)
+DUTY_SOON = timedelta(hours=24)
+DAYS_OFF = timedelta(days=2)
+
+
+class ApmRosterCoordinator(DataUpdateCoordinator[RosterStore]):
+    """Coordinate roster fetches from APM for all entities and services."""
+
+    def __init__(self, hass: HomeAssistant, data: ApmData) -> None:
+        """Initialize the roster coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=DOMAIN,
+            update_interval=UPDATE_INTERVAL_DEFAULT,
+        )
+        self._data = data
+        self.store = RosterStore()
+        self.last_merge = MergeResult()
+        self.ftl = FtlTracker()
+        self.store.observe(self.ftl)
+        self.pairings = PairingIndex()
+        self.store.observe(self.pairings)
+
+    async def _async_update_data(self) -> RosterStore:
+        """Refresh the upcoming roster window."""
+        self.last_merge = MergeResult()
+        start_date = now().date()
+        end_date = start_date + ROSTER_WINDOW
+
+        try:
+            roster = await self._data.async_get_roster(start_date, end_date)
+        except APM_ERRORS as err:
+            raise UpdateFailed(f"Unable to fetch roster: {err!r}") from err
+
+        self.last_merge = self._merge(roster)
+        self.update_interval = self._adaptive_interval()
+
+        return self.store
+
+    async def async_fetch_range(
+        self, start_date: date, end_date: date
+    ) -> MergeResult:
+        """Ensure a date range is loaded, fetching only the parts which are missing.
+
+        Parts fetched longer than the soft TTL ago are served as they are and
+        refreshed in the background. Past days use the much longer history TTL,
+        so loading months of history doesn't refetch all of it every hour.
+        """
+        today = now().date()
+        moment = utcnow()
+        stale = []
+
+        if start_date < today:
+            stale += self.store.coverage.stale(
+                start_date,
+                min(end_date, today - timedelta(days=1)),
+                moment - ROSTER_HISTORY_TTL,
+            )
+        if end_date >= today:
+            stale += self.store.coverage.stale(
+                max(start_date, today), end_date, moment - ROSTER_SOFT_TTL
+            )
+
+        if stale:
+            self._data.entry.async_create_background_task(
+                self.hass,
+                self._async_revalidate(stale),
+                "apm_roster_revalidate",
+            )
+
+        return await self._async_fetch(self.store.coverage.gaps(start_date, end_date))
+
+    async def _async_fetch(self, ranges: list[tuple[date, date]]) -> MergeResult:
+        """Fetch and merge date ranges of the roster."""
+        result = MergeResult()
+
+        if not ranges:
+            return result
+
+        rosters = await asyncio.gather(
+            *(
+                self._data.async_get_roster(range_start, range_end)
+                for range_start, range_end in ranges
+            )
+        )
+
+        for roster in rosters:
+            result.extend(self._merge(roster))
+
+        if result:
+            self.last_merge = result
+            self.async_update_listeners()
+
+        return result
+
+    async def _async_revalidate(self, ranges: list[tuple[date, date]]) -> None:
+        """Refresh stale date ranges of the roster in the background."""
+        try:
+            await self._async_fetch(ranges)
+        except APM_ERRORS as err:
+            _LOGGER.debug("Unable to revalidate roster: %s", repr(err))
+
+    def _merge(self, roster: Roster) -> MergeResult:
+        """Merge a fetched roster into the store and persist it."""
+        result = self.store.merge(roster, utcnow())
+        self._data.cache.async_schedule_save()
+
+        return result
+
+    def _adaptive_interval(self) -> timedelta:
+        """Determine how soon the roster should be polled again.
+
+        Only duties count: days off, leave and layovers are activities too, but
+        nothing changes on them which needs close polling.
+        """
+        moment = now()
+
+        if self.store.has_overlap(moment, moment + DUTY_IMMINENT, is_duty):
+            return UPDATE_INTERVAL_ON_DUTY
+
+        upcoming_duty = self.store.next_after(moment, is_duty)
+
+        if upcoming_duty is None or upcoming_duty.start - moment > DAYS_OFF:
+            return UPDATE_INTERVAL_DAYS_OFF
+
+        if upcoming_duty.start - moment < DUTY_SOON:
+            return UPDATE_INTERVAL_DUTY_SOON
+
+        return UPDATE_INTERVAL_DEFAULT
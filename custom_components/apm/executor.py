@@ -0,0 +1,149 @@
+"""Dedicated executor for blocking APM CrewConnect calls."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+import logging
+from typing import Any, TypeVar
+
+from requests.exceptions import HTTPError
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .const import DOMAIN
+from .util.rate_limiter import TokenBucket
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+DATA_EXECUTOR = f"{DOMAIN}_executor"
+
+DEFAULT_MAX_WORKERS = 4
+MAX_WORKERS = 16
+DEFAULT_REQUESTS_PER_MINUTE = 30
+REQUEST_BURST = 5
+MIN_REQUESTS_PER_MINUTE = 2
+
+
+class ApmExecutor:
+    """Run blocking APM calls on a bounded thread pool behind a rate limiter.
+
+    Every APM call made by the integration goes through this executor, so a
+    burst of slow requests can't starve Home Assistant's shared executor and the
+    APM host is never hit harder than the configured rate.
+
+    The executor is shared by all config entries, so it applies the most generous
+    limits configured by any of them. The pool itself is never replaced: it only
+    starts threads as calls need them, while the number of calls running at once
+    is bounded separately and can change with calls in flight.
+    """
+
+    def __init__(self, max_workers: int, requests_per_minute: float) -> None:
+        """Initialize the executor."""
+        self._defaults = (max_workers, requests_per_minute)
+        self._limits: dict[str, tuple[int, float]] = {}
+        self._max_workers = max_workers
+        self._slots = asyncio.Semaphore(max_workers)
+        self._pool = _create_pool(MAX_WORKERS)
+        self.limiter = _create_limiter(requests_per_minute)
+
+    def configure(
+        self, entry_id: str, max_workers: int, requests_per_minute: float
+    ) -> None:
+        """Apply the limits of a config entry, combined with those of the others."""
+        self._limits[entry_id] = (max_workers, requests_per_minute)
+        self._apply_limits()
+
+    def release(self, entry_id: str) -> None:
+        """Stop applying the limits of a config entry."""
+        if self._limits.pop(entry_id, None) is not None:
+            self._apply_limits()
+
+    async def async_run(self, job: Callable[..., _T], *args: Any) -> _T:
+        """Run a blocking APM call once a slot is free and the rate limiter allows."""
+        async with self._slots:
+            await self.limiter.async_acquire()
+
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, partial(job, *args)
+                )
+            except HTTPError as err:
+                if err.response is not None and is_overloaded(
+                    err.response.status_code
+                ):
+                    _LOGGER.debug(
+                        "APM responded %s, slowing down requests",
+                        err.response.status_code,
+                    )
+                    self.limiter.backoff(_retry_after(err.response.headers))
+                raise
+
+        self.limiter.recover()
+
+        return result
+
+    def shutdown(self) -> None:
+        """Stop the thread pool without waiting for running calls."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _apply_limits(self) -> None:
+        limits = list(self._limits.values()) or [self._defaults]
+        max_workers = min(max(workers for workers, _ in limits), MAX_WORKERS)
+        requests_per_minute = max(rate for _, rate in limits)
+
+        if max_workers != self._max_workers:
+            # Calls in flight release the slots they hold on the previous bound
+            self._max_workers = max_workers
+            self._slots = asyncio.Semaphore(max_workers)
+
+        if requests_per_minute / 60 != self.limiter.max_rate:
+            self.limiter.configure(requests_per_minute / 60)
+
+
+@callback
+def async_get_executor(hass: HomeAssistant) -> ApmExecutor:
+    """Return the executor shared by every part of the integration."""
+    if (executor := hass.data.get(DATA_EXECUTOR)) is None:
+        executor = hass.data[DATA_EXECUTOR] = ApmExecutor(
+            DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_MINUTE
+        )
+
+        @callback
+        def _async_shutdown(_: Event) -> None:
+            executor.shutdown()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_shutdown)
+
+    return executor
+
+
+def _create_pool(max_workers: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=DOMAIN)
+
+
+def _create_limiter(requests_per_minute: float) -> TokenBucket:
+    return TokenBucket(
+        requests_per_minute / 60, REQUEST_BURST, MIN_REQUESTS_PER_MINUTE / 60
+    )
+
+
+def is_overloaded(status: int) -> bool:
+    """Return whether an HTTP status tells APM is overloaded."""
+    return (
+        status == HTTPStatus.TOO_MANY_REQUESTS
+        or status >= HTTPStatus.INTERNAL_SERVER_ERROR
+    )
+
+
+def _retry_after(headers: Any) -> float | None:
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
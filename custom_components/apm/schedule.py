@@ -0,0 +1,74 @@
+"""Flight schedule shared by the APM CrewConnect accounts of a host."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import date
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util.dt import utcnow
+
+from .cache import ApmScheduleCache
+from .const import DOMAIN
+from .util.schedule_cache import FlightScheduleCache
+from .util.single_flight import SingleFlight
+
+DATA_SCHEDULES = f"{DOMAIN}_schedules"
+
+
+class ApmFlightSchedule:
+    """Cache and fetch the flight schedule of a host for all of its accounts.
+
+    Every crew member on a host sees the same flight schedule, so accounts share
+    one cache and join each other's in-flight requests rather than downloading
+    the schedule once each.
+    """
+
+    def __init__(self, hass: HomeAssistant, host: str) -> None:
+        """Initialize the flight schedule of a host."""
+        self.host = host
+        self.cache = ApmScheduleCache(hass, host)
+        self._requests: SingleFlight[list] = SingleFlight()
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+
+    @property
+    def days(self) -> FlightScheduleCache:
+        """Return the cached schedule days."""
+        return self.cache.schedules
+
+    async def async_load(self) -> None:
+        """Load the persisted flight schedule, once for all accounts."""
+        async with self._load_lock:
+            if not self._loaded:
+                await self.cache.async_load()
+                self._loaded = True
+
+    async def async_fetch(
+        self,
+        start_date: date,
+        end_date: date,
+        request: Callable[[], Awaitable[list]],
+    ) -> None:
+        """Fetch a range of the flight schedule into the cache.
+
+        A request already in flight for a covering range, made by any account, is
+        joined instead.
+        """
+        flights, shared = await self._requests.async_run(start_date, end_date, request)
+
+        if not shared:
+            self.days.add(start_date, end_date, flights, utcnow())
+            self.cache.async_schedule_save()
+
+
+@callback
+def async_get_flight_schedule(hass: HomeAssistant, host: str) -> ApmFlightSchedule:
+    """Return the flight schedule shared by the accounts of a host."""
+    schedules: dict[str, ApmFlightSchedule] = hass.data.setdefault(DATA_SCHEDULES, {})
+
+    if (schedule := schedules.get(host)) is None:
+        schedule = schedules[host] = ApmFlightSchedule(hass, host)
+
+    return schedule
@@ -0,0 +1,134 @@
+"""Flight time limitation sensors for APM CrewConnect."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util.dt import now
+
+from .const import (
+    APM_ERRORS,
+    DOMAIN,
+    FTL_BLOCK_LIMITS,
+    FTL_DUTY_LIMITS,
+    FTL_WINDOWS,
+)
+from .coordinator import ApmRosterCoordinator
+
+if TYPE_CHECKING:
+    from . import ApmData
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS = {"block": FTL_BLOCK_LIMITS, "duty": FTL_DUTY_LIMITS}
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add flight time sensors for passed config_entry in Home Assistant."""
+    data = hass.data[DOMAIN][config_entry.entry_id]
+
+    async_add_entities(
+        ApmFlightTimeSensor(data, metric, days)
+        for metric in METRICS
+        for days in FTL_WINDOWS
+    )
+
+    # The longest window needs the roster of the past year, which is only fetched
+    # once and then kept in the persistent cache
+    config_entry.async_create_background_task(
+        hass,
+        _async_fetch_history(data.coordinator, max(FTL_WINDOWS)),
+        "apm_ftl_history",
+    )
+
+
+async def _async_fetch_history(coordinator: ApmRosterCoordinator, days: int) -> None:
+    """Load the roster of the past days into the store."""
+    today = now().date()
+
+    try:
+        await coordinator.async_fetch_range(today - timedelta(days=days - 1), today)
+    except APM_ERRORS as err:
+        _LOGGER.warning("Unable to fetch roster history: %r", err)
+
+
+class ApmFlightTimeSensor(CoordinatorEntity[ApmRosterCoordinator], SensorEntity):
+    """Block or duty time accumulated over a rolling window of days."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.HOURS
+    _attr_suggested_display_precision = 1
+
+    def __init__(self, data: ApmData, metric: str, days: int) -> None:
+        """Initialize the sensor."""
+        super().__init__(data.coordinator)
+        self.data = data
+        self._metric = metric
+        self._days = days
+        self._limit = METRICS[metric].get(days)
+
+    @property
+    def unique_id(self) -> str | None:
+        """Return the unique ID of the sensor."""
+        return f"apm_{self._metric}_{self._days}d_{self.data.apm.user_id}"
+
+    @property
+    def name(self) -> str | None:
+        """Return the name of the sensor."""
+        return (
+            f"APM {self._metric.capitalize()} Time {self._days}d"
+            f" [{self.data.apm.user_id}]"
+        )
+
+    @property
+    def native_value(self) -> float:
+        """Return the total over the window ending today, in hours."""
+        return self._total() / timedelta(hours=1)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the applicable limit and the time remaining under it."""
+        if self._limit is None:
+            return None
+
+        return {
+            "limit": self._limit / timedelta(hours=1),
+            "remaining": max(self._limit - self._total(), timedelta())
+            / timedelta(hours=1),
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """Roll the window over at midnight."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass, self._async_midnight, hour=0, minute=0, second=0
+            )
+        )
+
+    @callback
+    def _async_midnight(self, _: Any) -> None:
+        self.async_write_ha_state()
+
+    def _total(self) -> timedelta:
+        return getattr(
+            self.coordinator.ftl.totals(now().date(), self._days), self._metric
+        )
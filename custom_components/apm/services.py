@@ -1,6 +1,12 @@
 """Services registry for APM CrewConnect."""
 
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any
+
 from .util.ical import iCal
+from .util.open_time import fitting_flights
+from .util.roster_store import is_duty
+from .util.schedule_columns import staffing_heatmap as compute_staffing_heatmap
 import voluptuous as vol
 
 from homeassistant.core import (
@@ -9,58 +15,81 @@ from homeassistant.core import (
     ServiceCall,
     ServiceResponse,
 )
+from homeassistant.exceptions import ServiceValidationError
 import homeassistant.helpers.config_validation as cv
+from homeassistant.util.dt import as_local, now, start_of_local_day
 from homeassistant.util.json import JsonObjectType
 
 from .const import (
     ACFT_TYPES,
+    ATTR_ACCOUNT,
     ATTR_ACFT_TYPE,
+    ATTR_ACFT_TYPES,
+    ATTR_BLOCK_TIME,
+    ATTR_CREW_CODE,
+    ATTR_DEPARTURE,
+    ATTR_DUTY_TIME,
     ATTR_END_DATE,
+    ATTR_FIELDS,
+    ATTR_HOME_BASE,
+    ATTR_LIMIT,
+    ATTR_OFFSET,
+    ATTR_PAIRING_ID,
+    ATTR_REST,
     ATTR_ROLE,
+    ATTR_ROLES,
     ATTR_START_DATE,
     ATTR_SAVE_TO_FILE,
+    DEFAULT_REST,
     DOMAIN,
+    FTL_BLOCK_LIMITS,
+    FTL_DUTY_LIMITS,
+    FTL_WINDOWS,
     ROLES,
 )
+from .coordinator import ROSTER_WINDOW
+
+if TYPE_CHECKING:
+    from . import ApmData
+    from .util.schedule_index import ScheduleIndex
+
+# Fields of the compact flight records returned on request
+FLIGHT_FIELDS = {
+    "flight_number": lambda flight, index: flight.flight_number,
+    "departure_time": lambda flight, index: flight.departure_time.isoformat(),
+    "arrival_time": lambda flight, index: flight.arrival_time.isoformat(),
+    "origin": lambda flight, index: flight.departure_airport_commercial_code,
+    "destination": lambda flight, index: flight.arrival_airport_commercial_code,
+    "aircraft_type": lambda flight, index: flight.aircraft_type,
+    "missing_roles": lambda flight, index: list(index.missing_roles(flight)),
+}
 
 
 async def async_register_services(hass: HomeAssistant) -> None:
     """Handle registering APM services."""
 
-    data = hass.data[DOMAIN]
-
-    def find_unstaffed_flights(service: ServiceCall) -> JsonObjectType:
+    async def find_unstaffed_flights(service: ServiceCall) -> JsonObjectType:
         """Find flights with missing crew members."""
-        if ATTR_END_DATE in service.data:
-            flights = data.apm.get_flight_schedule(
-                service.data[ATTR_START_DATE], service.data[ATTR_END_DATE]
-            )
-        else:
-            flights = data.apm.get_flight_schedule(service.data[ATTR_START_DATE])
-
-        flights_with_missing_crew_members = [
-            flight
-            for flight in flights
-            if (
-                service.data.get(ATTR_ACFT_TYPE) is None
-                or flight.aircraft_type == service.data.get(ATTR_ACFT_TYPE)
-            )
-            and (
-                (
-                    service.data.get(ATTR_ROLE) is None
-                    and flight.is_missing_crew_members()
-                )
-                or flight.is_missing_crew_members(service.data.get(ATTR_ROLE))
-            )
-        ]
+        # The flight schedule is the same for every account on a host
+        data = _get_account(hass, service, any_account=True)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data.get(ATTR_END_DATE, start_date)
 
-        flights_with_missing_crew_members.sort(
-            key=lambda flight: flight.departure_time.isoformat()
+        index = await data.async_get_schedule_index(start_date, end_date)
+        flights_with_missing_crew_members = index.missing(
+            service.data[ATTR_ACFT_TYPE],
+            service.data.get(ATTR_ROLE),
+            start_date,
+            end_date,
         )
 
+        offset = service.data[ATTR_OFFSET]
+        page = _page(flights_with_missing_crew_members, service)
+
         return {
             "count": len(flights_with_missing_crew_members),
-            "data": flights_with_missing_crew_members,
+            "offset": offset,
+            "data": _project(page, service, index),
         }
 
     hass.services.async_register(
@@ -69,26 +98,319 @@ async def async_register_services(hass: HomeAssistant) -> None:
         find_unstaffed_flights,
         schema=vol.Schema(
             {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
                 vol.Required(ATTR_START_DATE): cv.date,
                 vol.Optional(ATTR_END_DATE): cv.date,
                 vol.Required(ATTR_ACFT_TYPE): vol.In(ACFT_TYPES),
                 vol.Optional(ATTR_ROLE): vol.In(ROLES),
+                vol.Optional(ATTR_LIMIT): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=1000)
+                ),
+                vol.Optional(ATTR_OFFSET, default=0): vol.All(
+                    vol.Coerce(int), vol.Range(min=0)
+                ),
+                vol.Optional(ATTR_FIELDS): vol.All(
+                    cv.ensure_list, [vol.In(FLIGHT_FIELDS)]
+                ),
             }
         ),
         supports_response=SupportsResponse.ONLY,
     )
 
-    def generate_roster_ical(service: ServiceCall) -> ServiceResponse:
-        """Generate a roster iCal."""
-        roster = data.apm.get_roster(
-            service.data[ATTR_START_DATE],
-            service.data[ATTR_END_DATE],
+    async def find_staffing_gaps(service: ServiceCall) -> JsonObjectType:
+        """Find flights with missing crew members for several criteria at once."""
+        data = _get_account(hass, service, any_account=True)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data.get(ATTR_END_DATE, start_date)
+
+        # The schedule is fetched and indexed once, each combination is a lookup
+        index = await data.async_get_schedule_index(start_date, end_date)
+        offset = service.data[ATTR_OFFSET]
+        gaps: dict[str, dict[str, JsonObjectType]] = {}
+        flights: dict[str, Any] = {}
+
+        for aircraft_type in service.data[ATTR_ACFT_TYPES]:
+            gaps[aircraft_type] = {}
+
+            for role in service.data[ATTR_ROLES]:
+                missing = index.missing(aircraft_type, role, start_date, end_date)
+                page = _page(missing, service)
+                gaps[aircraft_type][role] = {
+                    "count": len(missing),
+                    "offset": offset,
+                    "data": [_flight_key(flight) for flight in page],
+                }
+
+                for flight in page:
+                    flights.setdefault(_flight_key(flight), flight)
+
+        # A flight missing several roles is listed once, the gaps refer to it by key
+        return {
+            "gaps": gaps,
+            "flights": dict(
+                zip(flights, _project(list(flights.values()), service, index))
+            ),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "find_staffing_gaps",
+        find_staffing_gaps,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_START_DATE): cv.date,
+                vol.Optional(ATTR_END_DATE): cv.date,
+                vol.Optional(ATTR_ACFT_TYPES, default=ACFT_TYPES): vol.All(
+                    cv.ensure_list, [vol.In(ACFT_TYPES)]
+                ),
+                vol.Optional(ATTR_ROLES, default=ROLES): vol.All(
+                    cv.ensure_list, [vol.In(ROLES)]
+                ),
+                vol.Optional(ATTR_LIMIT): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=1000)
+                ),
+                vol.Optional(ATTR_OFFSET, default=0): vol.All(
+                    vol.Coerce(int), vol.Range(min=0)
+                ),
+                vol.Optional(ATTR_FIELDS): vol.All(
+                    cv.ensure_list, [vol.In(FLIGHT_FIELDS)]
+                ),
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def staffing_heatmap(service: ServiceCall) -> JsonObjectType:
+        """Count flights and missing crew per day, aircraft type and role."""
+        data = _get_account(hass, service, any_account=True)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data[ATTR_END_DATE]
+
+        columns = await data.async_get_schedule_columns(start_date, end_date)
+
+        return compute_staffing_heatmap(
+            columns,
+            start_date,
+            end_date,
+            service.data.get(ATTR_ACFT_TYPES),
+            service.data[ATTR_ROLES],
+        ).as_dict()
+
+    hass.services.async_register(
+        DOMAIN,
+        "staffing_heatmap",
+        staffing_heatmap,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_START_DATE): cv.date,
+                vol.Required(ATTR_END_DATE): cv.date,
+                vol.Optional(ATTR_ACFT_TYPES): vol.All(
+                    cv.ensure_list, [vol.In(ACFT_TYPES)]
+                ),
+                vol.Optional(ATTR_ROLES, default=ROLES): vol.All(
+                    cv.ensure_list, vol.Length(min=1), [vol.In(ROLES)]
+                ),
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def find_crew_member_flights(service: ServiceCall) -> JsonObjectType:
+        """Find the flights a crew member is assigned to."""
+        data = _get_account(hass, service, any_account=True)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data.get(ATTR_END_DATE, start_date)
+
+        index = await data.async_get_schedule_index(start_date, end_date)
+        flights = index.crew_member(
+            service.data[ATTR_CREW_CODE], start_date, end_date
+        )
+
+        return {
+            "count": len(flights),
+            "data": flights,
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "find_crew_member_flights",
+        find_crew_member_flights,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_CREW_CODE): cv.string,
+                vol.Required(ATTR_START_DATE): cv.date,
+                vol.Optional(ATTR_END_DATE): cv.date,
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def find_open_time(service: ServiceCall) -> JsonObjectType:
+        """Find unstaffed flights which fit into free time of the roster."""
+        data = _get_account(hass, service)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data.get(ATTR_END_DATE, start_date)
+
+        # Activities just outside the range still constrain its edges
+        await data.coordinator.async_fetch_range(
+            start_date - timedelta(days=1), end_date + timedelta(days=1)
         )
+        index = await data.async_get_schedule_index(start_date, end_date)
 
-        ical = iCal.from_roster(roster)
+        # Days off, leave and layovers are the free time open flights fill
+        duties = [
+            activity
+            for activity in data.coordinator.store.overlapping(
+                start_of_local_day(start_date - timedelta(days=1)),
+                start_of_local_day(end_date + timedelta(days=2)),
+            )
+            if is_duty(activity)
+        ]
+        flights = fitting_flights(
+            duties,
+            index.missing(
+                service.data.get(ATTR_ACFT_TYPE),
+                service.data[ATTR_ROLE],
+                start_date,
+                end_date,
+            ),
+            service.data[ATTR_REST],
+            service.data.get(ATTR_HOME_BASE),
+        )
+
+        return {
+            "count": len(flights),
+            "data": _project(flights, service, index),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "find_open_time",
+        find_open_time,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_START_DATE): cv.date,
+                vol.Optional(ATTR_END_DATE): cv.date,
+                vol.Required(ATTR_ROLE): vol.In(ROLES),
+                vol.Optional(ATTR_ACFT_TYPE): vol.In(ACFT_TYPES),
+                vol.Optional(ATTR_REST, default=DEFAULT_REST): cv.positive_time_period,
+                vol.Optional(ATTR_HOME_BASE): vol.All(cv.string, vol.Upper),
+                vol.Optional(ATTR_FIELDS): vol.All(
+                    cv.ensure_list, [vol.In(FLIGHT_FIELDS)]
+                ),
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def check_flight_time_limits(service: ServiceCall) -> JsonObjectType:
+        """Check whether an additional flight would breach a time limit."""
+        data = _get_account(hass, service)
+        departure = service.data[ATTR_DEPARTURE]
+        block_time = service.data[ATTR_BLOCK_TIME]
+        duty_time = service.data.get(ATTR_DUTY_TIME, block_time)
+        day = as_local(departure).date()
+
+        # Every window containing the flight's day must stay within its limits,
+        # including the windows ending on the days after it. Rosters aren't
+        # published beyond the coordinator's window, so there is nothing to fetch
+        # (and revalidate on every call) past it
+        await data.coordinator.async_fetch_range(
+            day - timedelta(days=max(FTL_WINDOWS) - 1),
+            min(
+                day + timedelta(days=max(FTL_WINDOWS) - 1),
+                max(day, now().date() + ROSTER_WINDOW),
+            ),
+        )
+
+        windows = []
+
+        for days in FTL_WINDOWS:
+            totals = data.coordinator.ftl.peak_totals(day, days)
+            block = totals.block + block_time
+            duty = totals.duty + duty_time
+            block_limit = FTL_BLOCK_LIMITS.get(days)
+            duty_limit = FTL_DUTY_LIMITS.get(days)
+
+            windows.append(
+                {
+                    "days": days,
+                    "block": block / timedelta(hours=1),
+                    "duty": duty / timedelta(hours=1),
+                    "block_limit": _hours(block_limit),
+                    "duty_limit": _hours(duty_limit),
+                    "breach": (block_limit is not None and block > block_limit)
+                    or (duty_limit is not None and duty > duty_limit),
+                }
+            )
+
+        return {
+            "breach": any(window["breach"] for window in windows),
+            "windows": windows,
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "check_flight_time_limits",
+        check_flight_time_limits,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_DEPARTURE): cv.datetime,
+                vol.Required(ATTR_BLOCK_TIME): cv.positive_time_period,
+                vol.Optional(ATTR_DUTY_TIME): cv.positive_time_period,
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def get_pairing(service: ServiceCall) -> JsonObjectType:
+        """Get a pairing of the roster, with its legs and layovers."""
+        data = _get_account(hass, service)
+        pairing_id = service.data[ATTR_PAIRING_ID]
+
+        if (pairing := data.coordinator.pairings.get(pairing_id)) is None:
+            raise ServiceValidationError(f"No pairing {pairing_id} in the roster")
+
+        return pairing.as_dict()
+
+    hass.services.async_register(
+        DOMAIN,
+        "get_pairing",
+        get_pairing,
+        schema=vol.Schema(
+            {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
+                vol.Required(ATTR_PAIRING_ID): vol.Coerce(int),
+            }
+        ),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def generate_roster_ical(service: ServiceCall) -> ServiceResponse:
+        """Generate a roster iCal."""
+        data = _get_account(hass, service)
+        start_date = service.data[ATTR_START_DATE]
+        end_date = service.data[ATTR_END_DATE]
+
+        await data.coordinator.async_fetch_range(start_date, end_date)
+
+        activities = data.coordinator.store.overlapping(
+            start_of_local_day(start_date),
+            start_of_local_day(end_date + timedelta(days=1)),
+        )
+        ical = iCal.from_activities(
+            data.apm.user_id, activities, data.ical_blocks.get
+        )
 
         if service.data[ATTR_SAVE_TO_FILE]:
-            ical.to_file("/config/" + roster.user_id + "_apm_roster.ics")
+            await hass.async_add_executor_job(
+                ical.to_file, "/config/" + data.apm.user_id + "_apm_roster.ics"
+            )
 
         return {
             "ical": ical.to_str(),
@@ -100,6 +422,7 @@ async def async_register_services(hass: HomeAssistant) -> None:
         generate_roster_ical,
         schema=vol.Schema(
             {
+                vol.Optional(ATTR_ACCOUNT): cv.string,
                 vol.Required(ATTR_START_DATE): cv.date,
                 vol.Required(ATTR_END_DATE): cv.date,
                 vol.Required(ATTR_SAVE_TO_FILE, default=False): cv.boolean,
@@ -107,3 +430,65 @@ async def async_register_services(hass: HomeAssistant) -> None:
         ),
         supports_response=SupportsResponse.ONLY,
     )
+
+
+def _hours(duration: timedelta | None) -> float | None:
+    return None if duration is None else duration / timedelta(hours=1)
+
+
+def _page(flights: list, service: ServiceCall) -> list:
+    """Return the page of flights selected by the call's offset and limit."""
+    offset = service.data[ATTR_OFFSET]
+    limit = service.data.get(ATTR_LIMIT)
+
+    return flights[offset : None if limit is None else offset + limit]
+
+
+def _project(flights: list, service: ServiceCall, index: "ScheduleIndex") -> list:
+    """Return the flights, or their records of the call's fields if any."""
+    if fields := service.data.get(ATTR_FIELDS):
+        # Compact records of plain values serialize far faster than whole
+        # flights with their crew lists
+        return [_flight_record(flight, fields, index) for flight in flights]
+
+    return flights
+
+
+def _flight_key(flight: Any) -> str:
+    """Return the key of a schedule flight, the ID of its leg."""
+    return str(flight.leg_id)
+
+
+def _flight_record(
+    flight: Any, fields: list[str], index: "ScheduleIndex"
+) -> JsonObjectType:
+    """Project a flight onto a compact record of the requested fields."""
+    return {field: FLIGHT_FIELDS[field](flight, index) for field in fields}
+
+
+def _get_account(
+    hass: HomeAssistant, service: ServiceCall, any_account: bool = False
+) -> "ApmData":
+    """Return the account selected for a service call.
+
+    The account may be left out when only one is configured, or when any account
+    will do.
+    """
+    accounts = list(hass.data.get(DOMAIN, {}).values())
+
+    if (user_id := service.data.get(ATTR_ACCOUNT)) is not None:
+        for data in accounts:
+            if data.apm.user_id == user_id:
+                return data
+
+        raise ServiceValidationError(f"No APM account is configured for {user_id}")
+
+    if not accounts:
+        raise ServiceValidationError("No APM account is configured")
+
+    if len(accounts) > 1 and not any_account:
+        raise ServiceValidationError(
+            "Several APM accounts are configured, select one with `account`"
+        )
+
+    return accounts[0]
@@ -0,0 +1,319 @@
+"""aiohttp transport for the APM CrewConnect client."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+import logging
+import sys
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import aiohttp
+import requests
+from requests import PreparedRequest, Response, Session
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+
+from .const import DOMAIN
+from .executor import is_overloaded
+
+if TYPE_CHECKING:
+    from apm_crewconnect import Apm
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+DATA_TRANSPORT = f"{DOMAIN}_transport"
+
+DEFAULT_TIMEOUT = 30
+# Connect and read timeouts of each request, well within the deadline of a call
+REQUEST_TIMEOUT = (10, 20)
+RESULT_GRACE = 5
+
+LIBRARY = "apm_crewconnect"
+
+
+class ApmSession(Session):
+    """Session sending the requests of the APM client.
+
+    The library never sets a timeout, which would leave a hung request blocking
+    its executor thread for good, nor checks for errors. Requests get a default
+    timeout, and responses telling APM is overloaded are raised as `HTTPError`
+    so the executor slows down.
+    """
+
+    def __init__(self, adapter: BaseAdapter | None = None) -> None:
+        """Initialize the session, sending every request through the adapter."""
+        super().__init__()
+
+        if adapter is not None:
+            self.mount("https://", adapter)
+            self.mount("http://", adapter)
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> Response:
+        """Send a request with a timeout, raising if APM is overloaded."""
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = REQUEST_TIMEOUT
+
+        response = super().request(method, url, *args, **kwargs)
+
+        if is_overloaded(response.status_code):
+            raise HTTPError(
+                f"{response.status_code} {response.reason} for url: {response.url}",
+                response=response,
+            )
+
+        return response
+
+
+class _Requests:
+    """Stand-in for the `requests` module used by the APM library.
+
+    Module-level calls made while a transport is bound to the running context
+    are sent through a fresh session of that transport, just as `requests` uses
+    a fresh `Session` for each of them. Any other call, and anything else, is
+    handed to the real module, so other users of the library are unaffected.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        """Return the attributes of the real module."""
+        return getattr(requests, name)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        """Send a request through the bound transport, if any."""
+        if (transport := _TRANSPORT.get()) is None:
+            return requests.request(method, url, **kwargs)
+
+        with transport.session() as session:
+            return session.request(method=method, url=url, **kwargs)
+
+    def get(self, url: str, params: Any = None, **kwargs: Any) -> Response:
+        """Send a GET request."""
+        return self.request("get", url, params=params, **kwargs)
+
+    def options(self, url: str, **kwargs: Any) -> Response:
+        """Send an OPTIONS request."""
+        return self.request("options", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> Response:
+        """Send a HEAD request."""
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("head", url, **kwargs)
+
+    def post(
+        self, url: str, data: Any = None, json: Any = None, **kwargs: Any
+    ) -> Response:
+        """Send a POST request."""
+        return self.request("post", url, data=data, json=json, **kwargs)
+
+    def put(self, url: str, data: Any = None, **kwargs: Any) -> Response:
+        """Send a PUT request."""
+        return self.request("put", url, data=data, **kwargs)
+
+    def patch(self, url: str, data: Any = None, **kwargs: Any) -> Response:
+        """Send a PATCH request."""
+        return self.request("patch", url, data=data, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> Response:
+        """Send a DELETE request."""
+        return self.request("delete", url, **kwargs)
+
+
+_REQUESTS = _Requests()
+_TRANSPORT: ContextVar[ApmTransport | None] = ContextVar(
+    "apm_transport", default=None
+)
+
+
+class ApmTransport:
+    """Send the HTTP requests of the APM calls run through it.
+
+    The library's clients call the `requests` module directly rather than a
+    session of their own. Calls run through a transport have those requests sent
+    through its sessions, with the transport's adapter, while the library keeps
+    using plain `requests` everywhere else. Each client's Okta session is an
+    actual `requests` session, so the adapter is mounted on it directly.
+    """
+
+    def __init__(self, adapter: BaseAdapter | None = None) -> None:
+        """Initialize the transport, sending requests through the adapter."""
+        self._adapter = adapter or TimeoutAdapter()
+        _install_stand_in()
+
+    def session(self) -> Session:
+        """Return a new session sending requests through the adapter."""
+        return ApmSession(self._adapter)
+
+    def run(self, job: Callable[..., _T], *args: Any) -> _T:
+        """Run a blocking APM call, sending its requests through the transport."""
+        token = _TRANSPORT.set(self)
+
+        try:
+            return job(*args)
+        finally:
+            _TRANSPORT.reset(token)
+
+    def attach(self, apm: Apm) -> None:
+        """Send the requests of a client's Okta session through the adapter."""
+        session = apm.client.okta_client.session
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """Send requests with `requests` itself, with a default timeout."""
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: float | tuple[float, float] | None = None,
+        verify: bool | str = True,
+        cert: str | tuple[str, str] | None = None,
+        proxies: dict[str, str] | None = None,
+    ) -> Response:
+        """Send a prepared request, timing out if it doesn't say when to."""
+        return super().send(
+            request, stream, timeout or REQUEST_TIMEOUT, verify, cert, proxies
+        )
+
+
+class AiohttpAdapter(BaseAdapter):
+    """Send the requests of a `requests` session over an aiohttp session.
+
+    The APM client is synchronous and keeps running in the executor, but the
+    HTTP exchange itself is handed to the event loop. Requests then share Home
+    Assistant's pooled keep-alive connections instead of opening their own, and
+    time out through aiohttp, which cancels them cleanly. The executor thread
+    stops waiting at the same deadline and cancels the request itself if it is
+    still running. Once the event loop has stopped, requests are sent with
+    `requests` instead.
+    """
+
+    def __init__(self, hass: HomeAssistant, session: aiohttp.ClientSession) -> None:
+        """Initialize the adapter."""
+        super().__init__()
+        self._hass = hass
+        self._session = session
+        self._fallback = TimeoutAdapter()
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: float | tuple[float, float] | None = None,
+        verify: bool | str = True,
+        cert: str | tuple[str, str] | None = None,
+        proxies: dict[str, str] | None = None,
+    ) -> Response:
+        """Send a prepared request from an executor thread."""
+        loop = self._hass.loop
+
+        if _running_loop() is loop:
+            raise RuntimeError("APM requests must not be sent from the event loop")
+
+        if loop.is_closed() or not loop.is_running():
+            return self._fallback.send(request, stream, timeout, verify, cert, proxies)
+
+        if isinstance(timeout, tuple):
+            timeout = sum(part for part in timeout if part is not None)
+
+        timeout = timeout or DEFAULT_TIMEOUT
+        future = asyncio.run_coroutine_threadsafe(
+            self._async_send(request, timeout), loop
+        )
+
+        try:
+            # aiohttp times out on its own, so waiting a little longer only
+            # covers an event loop too busy to notice
+            return future.result(timeout + RESULT_GRACE)
+        except FutureTimeoutError as err:
+            future.cancel()
+            raise Timeout(err, request=request) from err
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """Leave the shared aiohttp session open."""
+        self._fallback.close()
+
+    async def _async_send(self, request: PreparedRequest, timeout: float) -> Response:
+        try:
+            async with self._session.request(
+                request.method,
+                request.url,
+                headers=dict(request.headers),
+                data=request.body,
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+            ) as client_response:
+                content = await client_response.read()
+        except TimeoutError as err:
+            raise Timeout(err, request=request) from err
+        except aiohttp.ClientError as err:
+            raise ConnectionError(err, request=request) from err
+
+        response = Response()
+        response.status_code = client_response.status
+        response.reason = client_response.reason
+        response.headers = CaseInsensitiveDict(client_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = content  # noqa: SLF001
+
+        for name, morsel in client_response.cookies.items():
+            response.cookies.set(name, morsel.value)
+
+        return response
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _install_stand_in() -> None:
+    """Give the library's modules the stand-in for the `requests` module.
+
+    Only the library's own modules are touched, and the stand-in hands every
+    call made outside of a transport to the real module.
+    """
+    for name, module in list(sys.modules.items()):
+        if name != LIBRARY and not name.startswith(f"{LIBRARY}."):
+            continue
+
+        if getattr(module, "requests", None) is requests:
+            _LOGGER.debug("Sending the requests of %s through transports", name)
+            module.requests = _REQUESTS
+
+
+@callback
+def async_get_transport(hass: HomeAssistant) -> ApmTransport:
+    """Return the transport sending APM requests over Home Assistant's aiohttp session.
+
+    The session shares Home Assistant's connection pool. Its cookie jar is left
+    empty: cookies are kept by each `requests` session, as the library expects,
+    rather than shared between accounts.
+    """
+    if (transport := hass.data.get(DATA_TRANSPORT)) is None:
+        session = async_create_clientsession(
+            hass, cookie_jar=aiohttp.DummyCookieJar()
+        )
+        transport = hass.data[DATA_TRANSPORT] = ApmTransport(
+            AiohttpAdapter(hass, session)
+        )
+
+    return transport
@@ -0,0 +1,62 @@
+"""Circuit breaker guarding calls to APM CrewConnect."""
+
+from __future__ import annotations
+
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream which keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused for `reset_timeout` seconds. A single trial call is then let
+    through: success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 300) -> None:
+        """Initialize a closed circuit."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_pending = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether calls are currently being refused."""
+        if self._opened_at is None:
+            return False
+
+        return self._trial_pending or (
+            time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def check(self) -> None:
+        """Raise if a call may not be made right now."""
+        if self.is_open:
+            raise CircuitOpenError
+
+        if self._opened_at is not None:
+            self._trial_pending = True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        self._failures = 0
+        self._opened_at = None
+        self._trial_pending = False
+
+    def release_trial(self) -> None:
+        """Let a new trial call through after one ended without a verdict."""
+        self._trial_pending = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the circuit once the threshold is reached."""
+        self._failures += 1
+        self._trial_pending = False
+
+        if self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,129 @@
+"""Coverage map of the date windows fetched from APM CrewConnect."""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+ONE_DAY = timedelta(days=1)
+
+
+@dataclass(frozen=True, slots=True)
+class CoverageInterval:
+    """An inclusive date interval fetched at a given time."""
+
+    start: date
+    end: date
+    fetched_at: datetime
+
+
+class CoverageMap:
+    """Track the exact date intervals already fetched.
+
+    Intervals are kept sorted and disjoint. Fetching a window which overlaps
+    existing intervals trims them, so each day maps to the time it was last
+    fetched.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty coverage map."""
+        self._intervals: list[CoverageInterval] = []
+
+    def __bool__(self) -> bool:
+        """Return whether anything has been fetched."""
+        return bool(self._intervals)
+
+    @property
+    def intervals(self) -> list[CoverageInterval]:
+        """Return the fetched intervals in date order."""
+        return self._intervals
+
+    def add(self, start: date, end: date, fetched_at: datetime) -> None:
+        """Record the inclusive date window as fetched at the given time."""
+        kept: list[CoverageInterval] = []
+
+        for interval in self._intervals:
+            if interval.end < start or end < interval.start:
+                kept.append(interval)
+                continue
+
+            if interval.start < start:
+                kept.append(
+                    CoverageInterval(
+                        interval.start, start - ONE_DAY, interval.fetched_at
+                    )
+                )
+            if end < interval.end:
+                kept.append(
+                    CoverageInterval(end + ONE_DAY, interval.end, interval.fetched_at)
+                )
+
+        kept.append(CoverageInterval(start, end, fetched_at))
+        kept.sort(key=lambda interval: interval.start)
+
+        self._intervals = self._coalesce(kept)
+
+    def gaps(self, start: date, end: date) -> list[tuple[date, date]]:
+        """Return the inclusive sub-ranges of the window not yet fetched."""
+        gaps: list[tuple[date, date]] = []
+        cursor = start
+
+        for interval in self._overlapping(start, end):
+            if cursor < interval.start:
+                gaps.append((cursor, interval.start - ONE_DAY))
+            cursor = max(cursor, interval.end + ONE_DAY)
+
+        if cursor <= end:
+            gaps.append((cursor, end))
+
+        return gaps
+
+    def stale(
+        self, start: date, end: date, before: datetime
+    ) -> list[tuple[date, date]]:
+        """Return the fetched sub-ranges of the window last fetched before a time."""
+        return [
+            (max(start, interval.start), min(end, interval.end))
+            for interval in self._overlapping(start, end)
+            if interval.fetched_at < before
+        ]
+
+    def covers(self, start: date, end: date) -> bool:
+        """Determine if the whole inclusive window has been fetched."""
+        return not self.gaps(start, end)
+
+    def _overlapping(self, start: date, end: date) -> list[CoverageInterval]:
+        index = max(
+            bisect_right(self._intervals, start, key=lambda interval: interval.start)
+            - 1,
+            0,
+        )
+        overlapping = []
+
+        for interval in self._intervals[index:]:
+            if end < interval.start:
+                break
+            if start <= interval.end:
+                overlapping.append(interval)
+
+        return overlapping
+
+    @staticmethod
+    def _coalesce(intervals: list[CoverageInterval]) -> list[CoverageInterval]:
+        """Join adjacent intervals which were fetched at the same time."""
+        coalesced: list[CoverageInterval] = []
+
+        for interval in intervals:
+            if (
+                coalesced
+                and coalesced[-1].fetched_at == interval.fetched_at
+                and coalesced[-1].end + ONE_DAY >= interval.start
+            ):
+                coalesced[-1] = CoverageInterval(
+                    coalesced[-1].start, interval.end, interval.fetched_at
+                )
+            else:
+                coalesced.append(interval)
+
+        return coalesced
@@ -0,0 +1,201 @@
+"""Rolling flight and duty time totals for APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate, islice
+
+from apm_crewconnect import Activity, FlightActivity
+
+from homeassistant.util.dt import as_local
+
+from .roster_store import MergeResult, activity_key, is_duty
+
+DutyPeriod = tuple[datetime, datetime]
+
+
+@dataclass(frozen=True, slots=True)
+class FlightTimeTotals:
+    """Block and duty time accumulated over a window of days."""
+
+    block: timedelta
+    duty: timedelta
+
+
+class FtlTracker:
+    """Track block and duty time per day, for flight time limitation windows.
+
+    Block time counts towards the day a flight starts on, and duty time towards
+    the day its duty period starts on. Legs sharing a check-in and check-out
+    share one duty period, which is only counted once. Totals over any window of
+    days are the difference of two prefix sums, which are only recomputed from
+    the first day changed by a merge.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty tracker."""
+        self._clear()
+
+    def _clear(self) -> None:
+        self._origin: date | None = None
+        self._block: list[float] = []
+        self._duty: list[float] = []
+        self._block_sums: list[float] = [0.0]
+        self._duty_sums: list[float] = [0.0]
+        self._dirty_from: int | None = None
+        self._contributions: dict[Hashable, tuple[date, float, DutyPeriod]] = {}
+        self._duty_periods: Counter[DutyPeriod] = Counter()
+
+    def reset(self, activities: Iterable[Activity]) -> None:
+        """Replace the tracked activities."""
+        self._clear()
+        self._add(activities)
+
+    def apply(self, result: MergeResult) -> None:
+        """Update the totals with the activities changed by a merge."""
+        self._remove(result.removed)
+        self._remove(result.changed)
+        self._add(result.added)
+        self._add(result.changed)
+
+    def totals(self, day: date, days: int) -> FlightTimeTotals:
+        """Return the totals of the given number of days ending on a day."""
+        return FlightTimeTotals(
+            timedelta(seconds=self._window(self._block_sums, day, days)),
+            timedelta(seconds=self._window(self._duty_sums, day, days)),
+        )
+
+    def peak_totals(self, day: date, days: int) -> FlightTimeTotals:
+        """Return the highest totals of any window of days including a day."""
+        ends = [day + timedelta(days=offset) for offset in range(days)]
+
+        return FlightTimeTotals(
+            timedelta(
+                seconds=max(self._window(self._block_sums, end, days) for end in ends)
+            ),
+            timedelta(
+                seconds=max(self._window(self._duty_sums, end, days) for end in ends)
+            ),
+        )
+
+    def _window(self, sums: list[float], day: date, days: int) -> float:
+        """Return the sum over the days ending on a day, using the prefix sums."""
+        if self._origin is None:
+            return 0.0
+
+        self._refresh()
+
+        end = (day - self._origin).days + 1
+
+        return sums[_clamp(end, len(sums))] - sums[_clamp(end - days, len(sums))]
+
+    def _add(self, activities: Iterable[Activity]) -> None:
+        for activity in activities:
+            if (contribution := _contribution(activity)) is None:
+                continue
+
+            self._contributions[activity_key(activity)] = contribution
+            day, block, period = contribution
+            self._update(day, block, 0.0, 1)
+            self._duty_periods[period] += 1
+
+            if self._duty_periods[period] == 1:
+                self._update_duty(period, 1)
+
+    def _remove(self, activities: Iterable[Activity]) -> None:
+        for activity in activities:
+            if (
+                contribution := self._contributions.pop(activity_key(activity), None)
+            ) is not None:
+                day, block, period = contribution
+                self._update(day, block, 0.0, -1)
+                self._duty_periods[period] -= 1
+
+                if not self._duty_periods[period]:
+                    del self._duty_periods[period]
+                    self._update_duty(period, -1)
+
+    def _update_duty(self, period: DutyPeriod, sign: int) -> None:
+        start, end = period
+        self._update(as_local(start).date(), 0.0, (end - start).total_seconds(), sign)
+
+    def _update(self, day: date, block: float, duty: float, sign: int) -> None:
+        if self._origin is None:
+            self._origin = day
+        elif day < self._origin:
+            # Grow the buckets backwards to start on the earlier day
+            padding = [0.0] * (self._origin - day).days
+            self._block[:0] = padding
+            self._duty[:0] = padding
+            self._origin = day
+            self._dirty_from = 0
+
+        index = (day - self._origin).days
+
+        if index >= len(self._block):
+            padding = [0.0] * (index + 1 - len(self._block))
+            self._block.extend(padding)
+            self._duty.extend(padding)
+
+        self._block[index] += sign * block
+        self._duty[index] += sign * duty
+        self._dirty_from = (
+            index if self._dirty_from is None else min(self._dirty_from, index)
+        )
+
+    def _refresh(self) -> None:
+        """Recompute the prefix sums from the first day changed."""
+        if (dirty_from := self._dirty_from) is None:
+            return
+
+        for sums, values in (
+            (self._block_sums, self._block),
+            (self._duty_sums, self._duty),
+        ):
+            sums[dirty_from + 1 :] = islice(
+                accumulate(values[dirty_from:], initial=sums[dirty_from]), 1, None
+            )
+
+        self._dirty_from = None
+
+
+def _clamp(index: int, length: int) -> int:
+    return min(max(index, 0), length - 1)
+
+
+def _contribution(activity: Activity) -> tuple[date, float, DutyPeriod] | None:
+    """Return the day an activity counts towards, its block time and duty period."""
+    if not is_duty(activity):
+        return None
+
+    return (
+        as_local(activity.start).date(),
+        block_time(activity).total_seconds(),
+        duty_period(activity),
+    )
+
+
+def duty_period(activity: Activity) -> DutyPeriod:
+    """Return the duty period of an activity, from check-in to check-out.
+
+    Activities without check-in or check-out times are on duty for their whole
+    length.
+    """
+    return (
+        getattr(activity, "check_in", None) or activity.start,
+        getattr(activity, "check_out", None) or activity.end,
+    )
+
+
+def block_time(activity: Activity) -> timedelta:
+    """Return the block time of an activity, which only flights accumulate."""
+    if not isinstance(activity, FlightActivity):
+        return timedelta()
+
+    if (value := getattr(activity, "block_time", None)) is not None:
+        return value
+
+    return activity.end - activity.start
@@ -1,4 +1,6 @@
-from datetime import datetime, timezone
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime, timezone
+from functools import lru_cache
 
 from apm_crewconnect import (
     Roster,
@@ -12,173 +14,255 @@ from apm_crewconnect import (
 
 from homeassistant.util.dt import now
 
+CRLF = "\r\n"
+MAX_LINE_OCTETS = 75
+CHUNK_SIZE = 64 * 1024
+
+COCKPIT = "T"
+CABIN = "C"
+CREW_GROUPS = {
+    **dict.fromkeys(["IPL", "CDB", "OPL", "SUPT"], COCKPIT),
+    **dict.fromkeys(["INS", "CC", "CA", "SUPC"], CABIN),
+}
+
 
 class iCal:
     user_id: str
-    _timestamp: datetime = now().astimezone(timezone.utc)
-    _contents: str = ""
+
+    def __init__(
+        self,
+        user_id: str,
+        activities: Iterable[Activity],
+        render: Callable[[Activity], str] | None = None,
+    ) -> None:
+        self.user_id = user_id
+        self._activities = activities
+        self._render = render or (lambda activity: render_event(user_id, activity))
 
     @classmethod
-    def from_roster(cls, roster: Roster) -> str:
-        instance = cls()
+    def from_roster(cls, roster: Roster) -> "iCal":
+        return cls.from_activities(roster.user_id, roster.activities)
 
-        instance.user_id = roster.user_id
+    @classmethod
+    def from_activities(
+        cls,
+        user_id: str,
+        activities: Iterable[Activity],
+        render: Callable[[Activity], str] | None = None,
+    ) -> "iCal":
+        """Build a calendar, optionally rendering VEVENT blocks through a cache."""
+        return cls(user_id, activities, render)
 
-        instance._write_header(roster.user_id)
+    def __str__(self) -> str:
+        return self.to_str()
 
-        for activity in roster.activities:
-            instance._write_event(activity)
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_lines()
 
-        instance._write_footer()
+    def iter_lines(self) -> Iterator[str]:
+        """Yield the folded, CRLF terminated lines of the calendar.
 
-        return instance
+        The lines of each VEVENT are yielded together as one block.
+        """
+        yield from self._header_lines()
 
-    def __str__(self) -> str:
-        return self.to_str
+        for activity in self._activities:
+            if block := self._render(activity):
+                yield block
+
+        yield _line("END", "VCALENDAR")
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Yield the calendar in chunks of roughly the given size."""
+        buffer: list[str] = []
+        buffered = 0
+
+        for line in self.iter_lines():
+            buffer.append(line)
+            buffered += len(line)
+
+            if buffered >= chunk_size:
+                yield "".join(buffer)
+                buffer.clear()
+                buffered = 0
+
+        if buffer:
+            yield "".join(buffer)
 
     def to_str(self) -> str:
-        return self._contents
+        return "".join(self.iter_lines())
 
     def to_file(self, path: str) -> None:
-        with open(path, "w", encoding="utf-8") as file:
-            file.write(self._contents)
-
-    def _add_line(self, key: str = None, value: str = "") -> None:
-        if key:
-            self._contents += key + ":" + value
-
-        self._contents += "\n"
-
-    def _write_header(self, user_id: str) -> None:
-        self._add_line("BEGIN", "VCALENDAR")
-        self._add_line("VERSION", "2.0")
-        self._add_line("METHOD", "PUBLISH")
-        self._add_line("PRODID", "-//Apm Technologies//CrewWebPlus//EN")
-        self._add_line("X-WR-RELCALID", "CrewWebPlusCalendar-" + user_id)
-
-    def _write_event(self, activity: Activity) -> None:
-        if isinstance(activity, HotelActivity):
-            return
-
-        if activity.is_pending:
-            return
-
-        self._add_line()
-        self._add_line("BEGIN", "VEVENT")
-        self._add_line(
-            "UID",
-            self.user_id
-            + "#ActId:"
-            + str(activity.pairing_id or -1)
-            + "#CmpId:"
-            + str(activity.id or -1),
-        )
-        self._add_line(
-            "DTSTAMP",
-            self._timestamp.strftime("%Y%m%dT%H%M%SZ"),
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            for chunk in self.iter_chunks():
+                file.write(chunk)
+
+    def _header_lines(self) -> Iterator[str]:
+        yield _line("BEGIN", "VCALENDAR")
+        yield _line("VERSION", "2.0")
+        yield _line("METHOD", "PUBLISH")
+        yield _line("PRODID", "-//Apm Technologies//CrewWebPlus//EN")
+        yield _line("X-WR-RELCALID", "CrewWebPlusCalendar-" + self.user_id)
+
+
+def render_event(user_id: str, activity: Activity) -> str:
+    """Render the VEVENT block of an activity, or nothing if it isn't exported."""
+    moment = now()
+
+    return "".join(
+        _event_lines(user_id, _format_datetime(moment), moment.date(), activity)
+    )
+
+
+def _event_lines(
+    user_id: str, timestamp: str, today: date, activity: Activity
+) -> Iterator[str]:
+    if isinstance(activity, HotelActivity):
+        return
+
+    if activity.is_pending:
+        return
+
+    yield _line("BEGIN", "VEVENT")
+    yield _line(
+        "UID",
+        user_id
+        + "#ActId:"
+        + str(activity.pairing_id or -1)
+        + "#CmpId:"
+        + str(activity.id or -1),
+    )
+    yield _line("DTSTAMP", timestamp)
+    yield _line("DTSTART;VALUE=DATE-TIME", _format_datetime(activity.start))
+    yield _line("DTEND;VALUE=DATE-TIME", _format_datetime(activity.end))
+    yield _line("STATUS", "CONFIRMED")
+    # Activities the library couldn't type, such as flights without a number,
+    # have no category
+    yield _line("CATEGORIES", getattr(activity, "category", ""))
+
+    if isinstance(activity, FlightActivity):
+        yield _line(
+            "SUMMARY",
+            activity.flight_number
+            + " "
+            + activity.origin_iata_code
+            + "-"
+            + activity.destination_iata_code
+            + "("
+            + _timezone_offset(activity.destination_timezone, today)
+            + ")",
         )
-        self._add_line(
-            "DTSTART;VALUE=DATE-TIME",
-            activity.start.strftime("%Y%m%dT%H%M%SZ"),
+    elif isinstance(activity, DeadheadActivity):
+        yield _line(
+            "SUMMARY",
+            activity.description
+            + " "
+            + activity.origin_iata_code
+            + "*"
+            + activity.destination_iata_code,
         )
-        self._add_line(
-            "DTEND;VALUE=DATE-TIME",
-            activity.end.strftime("%Y%m%dT%H%M%SZ"),
+    elif isinstance(activity, GroundActivity):
+        yield _line("SUMMARY", " " + (activity.description or activity.details))
+    else:
+        yield _line("SUMMARY", " " + activity.details)
+
+    if isinstance(activity, FlightActivity):
+        crew = _crew_codes(activity.crew_members)
+        yield _line(
+            "DESCRIPTION",
+            "FCT : "
+            + activity.role
+            + r"\n"
+            + "A/C : "
+            + activity.aircraft_code
+            + r"\n"
+            + "BLK : "
+            + apm_utils.timedelta_to_str(activity.block_time, "{:02}:{:02}")
+            + r"\n"
+            + "Crew Member : "
+            + "T:"
+            + "-".join(crew[COCKPIT])
+            + r"\n"
+            + "C:"
+            + "-".join(crew[CABIN])
+            + r"\n"
+            + (("Remark : " + activity.remarks) if activity.remarks else ""),
         )
-        # self._add_line("SEQUENCE", "372537477")
-        self._add_line("STATUS", "CONFIRMED")
-        self._add_line("CATEGORIES", activity.category)
-
-        if isinstance(activity, FlightActivity):
-            self._add_line(
-                "SUMMARY",
-                activity.flight_number
-                + " "
-                + activity.origin_iata_code
-                + "-"
-                + activity.destination_iata_code
-                + "("
-                + apm_utils.timezone_to_offset_str(activity.destination_timezone)
-                + ")",
-            )
-        elif isinstance(activity, DeadheadActivity):
-            self._add_line(
-                "SUMMARY",
-                activity.description
-                + " "
-                + activity.origin_iata_code
-                + "*"
-                + activity.destination_iata_code,
-            )
-        elif isinstance(activity, GroundActivity):
-            self._add_line("SUMMARY", " " + activity.description)
-        else:
-            self._add_line("SUMMARY", " " + activity.details)
-
-        if isinstance(activity, FlightActivity):
-            self._add_line(
-                "DESCRIPTION",
-                "FCT : "
-                + activity.role
-                + r"\n"
-                + "A/C : "
-                + activity.aircraft_code
-                + r"\n"
-                + "BLK : "
-                + activity.aircraft_code
-                + r"\n"
-                + "Crew Member : "
-                + "T:"
-                + "-".join(
+    else:
+        yield _line(
+            "DESCRIPTION",
+            r"\n".join(
+                filter(
+                    lambda item: item is not None,
                     [
-                        crew_member.crew_code
-                        for crew_member in activity.crew_members
-                        if crew_member.role_code in ["IPL", "CDB", "OPL", "SUPT"]
-                    ]
-                )
-                + r"\n"
-                + "C:"
-                + "-".join(
-                    [
-                        crew_member.crew_code
-                        for crew_member in activity.crew_members
-                        if crew_member.role_code in ["INS", "CC", "CA", "SUPC"]
-                    ]
-                )
-                + r"\n"
-                + (("Remark : " + activity.remarks) if activity.remarks else ""),
-            )
-        else:
-            self._add_line(
-                "DESCRIPTION",
-                r"\n".join(
-                    filter(
-                        lambda item: item is not None,
-                        [
+                        (
                             (
-                                (
-                                    "BLK : "
-                                    + apm_utils.timedelta_to_str(
-                                        activity.block_time,
-                                        "{:02}:{:02}",
-                                    )
+                                "BLK : "
+                                + apm_utils.timedelta_to_str(
+                                    activity.block_time,
+                                    "{:02}:{:02}",
                                 )
-                                if hasattr(activity, "block_time")
-                                else None
-                            ),
-                            (
-                                ("Remark : " + activity.remarks)
-                                if activity.remarks
-                                else None
-                            ),
-                        ],
-                    )
-                ),
-            )
-
-        self._add_line("END", "VEVENT")
-
-    def _write_footer(self) -> None:
-        self._add_line()
-        self._add_line("END", "VCALENDAR")
-        self._add_line()
+                            )
+                            if hasattr(activity, "block_time")
+                            else None
+                        ),
+                        (
+                            ("Remark : " + activity.remarks)
+                            if activity.remarks
+                            else None
+                        ),
+                    ],
+                )
+            ),
+        )
+
+    yield _line("END", "VEVENT")
+
+
+def _crew_codes(crew_members: Iterable) -> dict[str, list[str]]:
+    """Group crew codes into cockpit and cabin crew in a single pass."""
+    crew: dict[str, list[str]] = {COCKPIT: [], CABIN: []}
+
+    for crew_member in crew_members:
+        if (group := CREW_GROUPS.get(crew_member.role_code)) is not None:
+            crew[group].append(crew_member.crew_code)
+
+    return crew
+
+
+def _line(key: str, value: str) -> str:
+    """Return a content line folded to 75 octets as required by RFC 5545."""
+    line = key + ":" + value
+    encoded = line.encode()
+
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + CRLF
+
+    parts = []
+    start = 0
+    limit = MAX_LINE_OCTETS
+
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+
+        # Never split a multi-byte UTF-8 sequence across lines
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+
+        parts.append(encoded[start:end].decode())
+        start = end
+        # Continuation lines start with a space, which counts towards the limit
+        limit = MAX_LINE_OCTETS - 1
+
+    return (CRLF + " ").join(parts) + CRLF
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+@lru_cache(maxsize=256)
+def _timezone_offset(tz, day: date) -> str:
+    # The offset can change with DST, so cached strings are only reused on the same day
+    return apm_utils.timezone_to_offset_str(tz)
@@ -0,0 +1,63 @@
+"""Matching of open flights against free roster time for APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from apm_crewconnect import Activity
+
+
+def busy_periods(
+    activities: Iterable[Activity], rest: timedelta
+) -> list[tuple[datetime, datetime]]:
+    """Return the disjoint periods blocked by activities and the rest around them.
+
+    Activities must be in start order, so overlapping periods are merged in a
+    single pass.
+    """
+    periods: list[tuple[datetime, datetime]] = []
+
+    for activity in activities:
+        start, end = activity.start - rest, activity.end + rest
+
+        if periods and start <= periods[-1][1]:
+            periods[-1] = (periods[-1][0], max(periods[-1][1], end))
+        else:
+            periods.append((start, end))
+
+    return periods
+
+
+def fitting_flights(
+    activities: Iterable[Activity],
+    flights: Iterable,
+    rest: timedelta,
+    home_base: str | None = None,
+) -> list:
+    """Return the flights which fit into the free time between activities.
+
+    A flight fits when it leaves the given rest both after the previous activity
+    and before the next one. With a home base, only flights departing from it are
+    considered. Activities and flights must both be in time order: a sweep over
+    the two lists finds the fitting flights in linear time.
+    """
+    periods = busy_periods(activities, rest)
+    fitting = []
+    index = 0
+
+    for flight in flights:
+        if (
+            home_base is not None
+            and flight.departure_airport_commercial_code != home_base
+        ):
+            continue
+
+        # Skip the busy periods over before the flight departs
+        while index < len(periods) and periods[index][1] <= flight.departure_time:
+            index += 1
+
+        if index == len(periods) or periods[index][0] >= flight.arrival_time:
+            fitting.append(flight)
+
+    return fitting
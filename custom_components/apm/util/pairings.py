@@ -0,0 +1,208 @@
+"""Pairing index over roster activities for APM CrewConnect."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any
+
+from apm_crewconnect import Activity, DeadheadActivity, FlightActivity, HotelActivity
+
+from .ftl import block_time
+from .roster_store import MergeResult, activity_key
+
+
+@dataclass(frozen=True, slots=True)
+class Pairing:
+    """The activities of a pairing, in start order."""
+
+    pairing_id: Any
+    activities: tuple[Activity, ...]
+
+    @property
+    def report(self) -> datetime:
+        """Return when the pairing starts, at check-in when there is one."""
+        first = self.activities[0]
+
+        return first.check_in or first.start
+
+    @property
+    def release(self) -> datetime:
+        """Return when the pairing ends."""
+        return max(activity.end for activity in self.activities)
+
+    # Pairings are handled like activities by calendars, spanning report to release
+    start = report
+    end = release
+
+    @property
+    def legs(self) -> list[Activity]:
+        """Return the flown and deadheaded legs."""
+        return [
+            activity
+            for activity in self.activities
+            if isinstance(activity, (FlightActivity, DeadheadActivity))
+        ]
+
+    @property
+    def is_trip(self) -> bool:
+        """Return whether the pairing travels anywhere."""
+        return bool(self.legs)
+
+    @property
+    def route(self) -> list[str]:
+        """Return the airports visited, starting with the first departure."""
+        if not (legs := self.legs):
+            return []
+
+        return [legs[0].origin_iata_code] + [
+            leg.destination_iata_code for leg in legs
+        ]
+
+    @property
+    def layovers(self) -> list[tuple[str | None, datetime, datetime]]:
+        """Return the hotel stays with the airport they follow."""
+        layovers = []
+        station = None
+
+        for activity in self.activities:
+            if isinstance(activity, (FlightActivity, DeadheadActivity)):
+                station = activity.destination_iata_code
+            elif isinstance(activity, HotelActivity):
+                layovers.append((station, activity.start, activity.end))
+
+        return layovers
+
+    @property
+    def block_time(self) -> timedelta:
+        """Return the total block time of the flights."""
+        return sum(map(block_time, self.activities), timedelta())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the pairing as plain values."""
+        return {
+            "pairing_id": self.pairing_id,
+            "report": self.report.isoformat(),
+            "release": self.release.isoformat(),
+            "route": self.route,
+            "block_time": self.block_time / timedelta(hours=1),
+            "layovers": [
+                {
+                    "station": station,
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                }
+                for station, start, end in self.layovers
+            ],
+            "activities": [
+                {
+                    "title": activity.title,
+                    "start": activity.start.isoformat(),
+                    "end": activity.end.isoformat(),
+                }
+                for activity in self.activities
+            ],
+        }
+
+
+class PairingIndex:
+    """Group roster activities by pairing, kept up to date with each merge.
+
+    Only the pairings touched by a merge are regrouped. Trips, the pairings with
+    legs, are kept in report order for range lookups.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._members: dict[Any, dict[Hashable, Activity]] = {}
+        self._pairings: dict[Any, Pairing] = {}
+        self._trips: list[Pairing] | None = []
+        self._reports: list[datetime] = []
+        self._max_releases: list[datetime] = []
+
+    def reset(self, activities: Iterable[Activity]) -> None:
+        """Rebuild the index from all activities."""
+        self._members.clear()
+        self._pairings.clear()
+        self._regroup(self._add(activities))
+
+    def apply(self, result: MergeResult) -> None:
+        """Regroup the pairings of the activities changed by a merge."""
+        touched = set()
+
+        for activity in result.removed:
+            if (members := self._members.get(activity.pairing_id)) is not None:
+                members.pop(activity_key(activity), None)
+                touched.add(activity.pairing_id)
+
+        touched |= self._add(result.added)
+        touched |= self._add(result.changed)
+
+        if touched:
+            self._regroup(touched)
+
+    def get(self, pairing_id: Any) -> Pairing | None:
+        """Return a pairing by its ID."""
+        return self._pairings.get(pairing_id)
+
+    def overlapping(self, start: datetime, end: datetime) -> list[Pairing]:
+        """Return the trips overlapping the datetime range."""
+        self._sort()
+        lo = bisect_right(self._max_releases, start)
+        hi = bisect_left(self._reports, end)
+
+        return [trip for trip in self._trips[lo:hi] if trip.release > start]
+
+    def current_or_next(self, moment: datetime) -> Pairing | None:
+        """Return the earliest trip which hasn't been released by the moment."""
+        self._sort()
+        lo = bisect_right(self._max_releases, moment)
+
+        return next(
+            (trip for trip in self._trips[lo:] if trip.release > moment), None
+        )
+
+    def _add(self, activities: Iterable[Activity]) -> set[Any]:
+        touched = set()
+
+        for activity in activities:
+            if activity.pairing_id is None:
+                continue
+
+            self._members.setdefault(activity.pairing_id, {})[
+                activity_key(activity)
+            ] = activity
+            touched.add(activity.pairing_id)
+
+        return touched
+
+    def _regroup(self, pairing_ids: Iterable[Any]) -> None:
+        for pairing_id in pairing_ids:
+            if not (members := self._members.get(pairing_id)):
+                self._members.pop(pairing_id, None)
+                self._pairings.pop(pairing_id, None)
+                continue
+
+            self._pairings[pairing_id] = Pairing(
+                pairing_id,
+                tuple(sorted(members.values(), key=lambda activity: activity.start)),
+            )
+
+        self._trips = None
+
+    def _sort(self) -> None:
+        """Order the trips by report time, once after each change."""
+        if self._trips is not None:
+            return
+
+        self._trips = sorted(
+            (pairing for pairing in self._pairings.values() if pairing.is_trip),
+            key=lambda pairing: pairing.report,
+        )
+        self._reports = [trip.report for trip in self._trips]
+        self._max_releases = list(
+            accumulate((trip.release for trip in self._trips), max)
+        )
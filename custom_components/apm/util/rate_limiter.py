@@ -0,0 +1,69 @@
+"""Adaptive token bucket rate limiter for APM CrewConnect."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Limit the rate of requests, slowing down when the upstream pushes back.
+
+    Tokens refill at `rate` per second up to `capacity`. When the upstream
+    signals overload, the rate is halved (down to `min_rate`) and requests may be
+    paused entirely for a while; each successful request then recovers part of
+    the configured rate.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float) -> None:
+        """Initialize a full bucket."""
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def async_acquire(self) -> None:
+        """Wait until a request may be made."""
+        async with self._lock:
+            while (delay := self._delay()) > 0:
+                await asyncio.sleep(delay)
+
+            self._tokens -= 1
+
+    def configure(self, rate: float) -> None:
+        """Apply a new configured rate, dropping any slowdown."""
+        self.max_rate = rate
+        self.rate = rate
+
+    def backoff(self, retry_after: float | None = None) -> None:
+        """Slow down after the upstream reported being overloaded."""
+        self.rate = max(self.rate / 2, self.min_rate)
+
+        if retry_after:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + retry_after
+            )
+
+    def recover(self) -> None:
+        """Speed back up towards the configured rate after a success."""
+        self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+    def _delay(self) -> float:
+        """Refill the bucket and return how long to wait for a token."""
+        moment = time.monotonic()
+        self._tokens = min(
+            self._tokens + (moment - self._updated_at) * self.rate, self.capacity
+        )
+        self._updated_at = moment
+
+        if moment < self._paused_until:
+            return self._paused_until - moment
+
+        if self._tokens >= 1:
+            return 0
+
+        return (1 - self._tokens) / self.rate
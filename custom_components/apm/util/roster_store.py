@@ -0,0 +1,413 @@
+"""Interval-indexed store of roster activities for APM CrewConnect."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+import hashlib
+from heapq import merge
+from itertools import accumulate
+from typing import Any, Generic, Protocol, TypeVar
+
+from apm_crewconnect import (
+    AbsentActivity,
+    Activity,
+    HotelActivity,
+    OffActivity,
+    Roster,
+    UnfitActivity,
+    VacationActivity,
+)
+
+from .coverage import CoverageInterval, CoverageMap
+
+_T = TypeVar("_T")
+
+# Rest and time off, which are held in the roster but aren't duties
+NON_DUTY_ACTIVITIES = (
+    AbsentActivity,
+    HotelActivity,
+    OffActivity,
+    UnfitActivity,
+    VacationActivity,
+)
+
+
+def activity_key(activity: Activity) -> Hashable:
+    """Return the identity of an activity across roster fetches."""
+    if activity.id is None:
+        return (type(activity).__name__, activity.pairing_id, None, activity.start)
+
+    return (type(activity).__name__, activity.pairing_id, activity.id)
+
+
+def is_duty(activity: Activity) -> bool:
+    """Return whether an activity is a duty, rather than rest or time off."""
+    return not isinstance(activity, NON_DUTY_ACTIVITIES)
+
+
+def activity_fingerprint(activity: Activity) -> str:
+    """Return a hash of the contents of an activity."""
+    return hashlib.blake2b(
+        repr(_freeze(vars(activity))).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _freeze(value: Any) -> Any:
+    """Convert a value into a structure with a stable repr."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(item) for item in value)
+    if hasattr(value, "__dict__"):
+        return (type(value).__name__, _freeze(vars(value)))
+
+    return repr(value)
+
+
+@dataclass(slots=True)
+class RosterWindow:
+    """Activities of a roster over a date window, assembled from several fetches."""
+
+    user_id: str
+    start: date
+    end: date
+    activities: list[Activity]
+
+    @classmethod
+    def combine(cls, rosters: list[Roster]) -> RosterWindow:
+        """Join rosters fetched for consecutive date windows."""
+        activities: dict[Hashable, Activity] = {}
+
+        for roster in rosters:
+            # Activities spanning two windows are returned by both fetches
+            for activity in roster.activities:
+                activities[activity_key(activity)] = activity
+
+        return cls(
+            rosters[0].user_id,
+            rosters[0].start,
+            rosters[-1].end,
+            list(activities.values()),
+        )
+
+
+@dataclass(slots=True)
+class MergeResult:
+    """Activities added, removed or changed by merging a roster window."""
+
+    added: list[Activity] = field(default_factory=list)
+    removed: list[Activity] = field(default_factory=list)
+    changed: list[Activity] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        """Return whether the merge changed anything."""
+        return bool(self.added or self.removed or self.changed)
+
+    def extend(self, other: MergeResult) -> None:
+        """Fold the changes of another merge into this one."""
+        self.added.extend(other.added)
+        self.removed.extend(other.removed)
+        self.changed.extend(other.changed)
+
+
+class RosterObserver(Protocol):
+    """Derived state kept in step with the activities of a roster store."""
+
+    def apply(self, result: MergeResult) -> None:
+        """Update the state with the activities changed by a merge."""
+
+    def reset(self, activities: Iterable[Activity]) -> None:
+        """Rebuild the state from all activities."""
+
+
+class RosterStore:
+    """Hold roster activities sorted by start time.
+
+    Alongside the activities, the store keeps a parallel list of start times and
+    a running maximum of end times. Both are non-decreasing, so range lookups
+    bisect straight to the first candidate and only visit activities which can
+    actually match.
+    """
+
+    def __init__(self, user_id: str | None = None) -> None:
+        """Initialize an empty roster store."""
+        self.user_id = user_id
+        self.start: date | None = None
+        self.end: date | None = None
+        self.changed_at: datetime | None = None
+        self.coverage = CoverageMap()
+        self._activities: list[Activity] = []
+        self._fingerprints: dict[Hashable, str] = {}
+        self._memos: list[ActivityMemo[Any]] = []
+        self._observers: list[RosterObserver] = []
+        self._starts: list[datetime] = []
+        self._max_ends: list[datetime] = []
+
+    def __len__(self) -> int:
+        """Return the number of activities held."""
+        return len(self._activities)
+
+    def __iter__(self) -> Iterator[Activity]:
+        """Iterate over the activities in start order."""
+        return iter(self._activities)
+
+    @property
+    def loaded(self) -> bool:
+        """Return whether any roster window has been loaded."""
+        return self.start is not None and self.end is not None
+
+    @property
+    def activities(self) -> list[Activity]:
+        """Return the activities in start order."""
+        return self._activities
+
+    def merge(
+        self, roster: Roster | RosterWindow, fetched_at: datetime
+    ) -> MergeResult:
+        """Splice a freshly fetched roster window into the store.
+
+        Held activities overlapping the window are replaced by the fetched ones,
+        matched by identity, and those outside it are kept. The surviving and
+        fetched activities are both already in start order, so they are merged
+        in a single linear pass rather than re-sorting the whole roster.
+        """
+        if self.user_id is None:
+            self.user_id = roster.user_id
+
+        self.coverage.add(roster.start, roster.end, fetched_at)
+        self.start = (
+            roster.start if self.start is None else min(self.start, roster.start)
+        )
+        self.end = roster.end if self.end is None else max(self.end, roster.end)
+
+        fetched = sorted(roster.activities, key=lambda activity: activity.start)
+        fetched_fingerprints = {
+            activity_key(activity): activity_fingerprint(activity)
+            for activity in fetched
+        }
+
+        # Activities overlapping the window lie between the first one whose
+        # running max end reaches the window and the first starting after it.
+        lo = bisect_left(
+            self._max_ends, roster.start, key=lambda moment: moment.date()
+        )
+        hi = bisect_right(self._starts, roster.end, key=lambda moment: moment.date())
+
+        kept: list[Activity] = []
+        replaced: dict[Hashable, Activity] = {}
+
+        for index, activity in enumerate(self._activities):
+            key = activity_key(activity)
+
+            if (
+                lo <= index < hi and roster.start <= activity.end.date()
+            ) or key in fetched_fingerprints:
+                replaced[key] = activity
+            else:
+                kept.append(activity)
+
+        result = MergeResult()
+
+        for activity in fetched:
+            key = activity_key(activity)
+
+            if key not in replaced:
+                result.added.append(activity)
+            elif self._fingerprints.get(key) != fetched_fingerprints[key]:
+                result.changed.append(activity)
+
+        for key, activity in replaced.items():
+            if key not in fetched_fingerprints:
+                result.removed.append(activity)
+                self._fingerprints.pop(key, None)
+
+        self._fingerprints.update(fetched_fingerprints)
+        self._activities = list(
+            merge(kept, fetched, key=lambda activity: activity.start)
+        )
+        self._reindex()
+
+        for memo in self._memos:
+            memo.invalidate(result.removed)
+            memo.invalidate(result.changed)
+
+        for observer in self._observers:
+            observer.apply(result)
+
+        if result or self.changed_at is None:
+            self.changed_at = fetched_at
+
+        return result
+
+    def restore(
+        self,
+        user_id: str | None,
+        activities: Iterable[Activity],
+        coverage: Iterable[CoverageInterval],
+    ) -> None:
+        """Restore previously held activities and their fetched coverage."""
+        self.user_id = user_id
+        self._activities = sorted(activities, key=lambda activity: activity.start)
+        self._fingerprints = {
+            activity_key(activity): activity_fingerprint(activity)
+            for activity in self._activities
+        }
+
+        for interval in coverage:
+            self.coverage.add(interval.start, interval.end, interval.fetched_at)
+
+        if self.coverage:
+            self.start = self.coverage.intervals[0].start
+            self.end = self.coverage.intervals[-1].end
+            self.changed_at = max(
+                interval.fetched_at for interval in self.coverage.intervals
+            )
+
+        self._reindex()
+
+        for memo in self._memos:
+            memo.clear()
+
+        for observer in self._observers:
+            observer.reset(self._activities)
+
+    def memo(self, build: Callable[[Activity], _T]) -> ActivityMemo[_T]:
+        """Return a cache of values built from the held activities."""
+        memo = ActivityMemo(self, build)
+        self._memos.append(memo)
+
+        return memo
+
+    def observe(self, observer: RosterObserver) -> None:
+        """Keep derived state up to date with every merge and restore."""
+        observer.reset(self._activities)
+        self._observers.append(observer)
+
+    def fingerprint(self, activity: Activity) -> str:
+        """Return the content fingerprint of a held activity."""
+        key = activity_key(activity)
+
+        if (fingerprint := self._fingerprints.get(key)) is None:
+            fingerprint = self._fingerprints[key] = activity_fingerprint(activity)
+
+        return fingerprint
+
+    def in_range(self, start: datetime, end: datetime) -> list[Activity]:
+        """Return activities contained within the datetime range."""
+        lo = bisect_left(self._starts, start)
+        hi = bisect_right(self._starts, end)
+
+        return [
+            activity for activity in self._activities[lo:hi] if activity.end <= end
+        ]
+
+    def overlapping(self, start: datetime, end: datetime) -> list[Activity]:
+        """Return activities overlapping the datetime range."""
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self._starts, end)
+
+        return [
+            activity for activity in self._activities[lo:hi] if activity.end > start
+        ]
+
+    def has_overlap(
+        self,
+        start: datetime,
+        end: datetime,
+        predicate: Callable[[Activity], bool] | None = None,
+    ) -> bool:
+        """Determine if any activity overlaps the datetime range.
+
+        With a predicate, only the activities matching it are considered.
+        """
+        lo = bisect_right(self._max_ends, start)
+        hi = bisect_left(self._starts, end)
+
+        return any(
+            activity.end > start and (predicate is None or predicate(activity))
+            for activity in self._activities[lo:hi]
+        )
+
+    def current_or_next(self, moment: datetime) -> Activity | None:
+        """Return the earliest activity which hasn't ended by the given moment."""
+        lo = bisect_right(self._max_ends, moment)
+
+        return next(
+            (activity for activity in self._activities[lo:] if activity.end > moment),
+            None,
+        )
+
+    def next_after(
+        self,
+        moment: datetime,
+        predicate: Callable[[Activity], bool] | None = None,
+    ) -> Activity | None:
+        """Return the first activity starting after the given moment.
+
+        With a predicate, only the activities matching it are considered.
+        """
+        index = bisect_right(self._starts, moment)
+
+        return next(
+            (
+                activity
+                for activity in self._activities[index:]
+                if predicate is None or predicate(activity)
+            ),
+            None,
+        )
+
+    def _reindex(self) -> None:
+        self._starts = [activity.start for activity in self._activities]
+        self._max_ends = list(
+            accumulate((activity.end for activity in self._activities), max)
+        )
+
+
+class ActivityMemo(Generic[_T]):
+    """Cache values built from activities, keyed by identity and content.
+
+    Entries are dropped when a merge reports their activity as removed or
+    changed, so repeated lookups hand back the value built the first time.
+    """
+
+    def __init__(self, store: RosterStore, build: Callable[[Activity], _T]) -> None:
+        """Initialize an empty memo for the store."""
+        self._store = store
+        self._build = build
+        self._values: dict[Hashable, tuple[str, _T]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of values held."""
+        return len(self._values)
+
+    def get(self, activity: Activity) -> _T:
+        """Return the value for an activity, building it if needed."""
+        key = activity_key(activity)
+        fingerprint = self._store.fingerprint(activity)
+
+        if (cached := self._values.get(key)) is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        value = self._build(activity)
+        self._values[key] = (fingerprint, value)
+
+        return value
+
+    def invalidate(self, activities: Iterable[Activity]) -> None:
+        """Drop the values built for the given activities."""
+        for activity in activities:
+            self._values.pop(activity_key(activity), None)
+
+    def clear(self) -> None:
+        """Drop every value held."""
+        self._values.clear()
@@ -0,0 +1,150 @@
+"""Day-keyed flight schedule cache for APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from .schedule_columns import ScheduleColumns
+from .schedule_index import ScheduleIndex
+
+ONE_DAY = timedelta(days=1)
+
+
+@dataclass(slots=True)
+class ScheduleDay:
+    """The flights departing on a day, as fetched at a given time."""
+
+    day: date
+    fetched_at: datetime
+    flights: list
+
+
+class FlightScheduleCache:
+    """Cache the flight schedule one departure day at a time.
+
+    A fetched range is split into days, so later requests for any overlapping
+    range only need to fetch the days which are missing or have expired. Cached
+    days are indexed for the given crew roles and aircraft types as they are
+    added.
+    """
+
+    def __init__(
+        self, roles: Iterable[str] = (), aircraft_types: Iterable[str] = ()
+    ) -> None:
+        """Initialize an empty cache."""
+        self._days: dict[date, ScheduleDay] = {}
+        self._columns: dict[date, ScheduleColumns] = {}
+        self.index = ScheduleIndex(roles, aircraft_types)
+
+    def __iter__(self) -> Iterator[ScheduleDay]:
+        """Iterate over the cached days in date order."""
+        return iter(sorted(self._days.values(), key=lambda day: day.day))
+
+    def missing(
+        self, start: date, end: date, before: datetime
+    ) -> list[tuple[date, date]]:
+        """Return the runs of days not cached or fetched before the given time."""
+        return _runs(
+            day
+            for day in _days_between(start, end)
+            if (cached := self._days.get(day)) is None or cached.fetched_at < before
+        )
+
+    def covers(self, start: date, end: date) -> bool:
+        """Determine if every day of the range is cached, however old."""
+        return all(day in self._days for day in _days_between(start, end))
+
+    def oldest(self, start: date, end: date) -> datetime | None:
+        """Return when the least recently fetched day of the range was fetched."""
+        return min(
+            (
+                self._days[day].fetched_at
+                for day in _days_between(start, end)
+                if day in self._days
+            ),
+            default=None,
+        )
+
+    def add(self, start: date, end: date, flights: list, fetched_at: datetime) -> None:
+        """Cache the flights fetched for a range, replacing its days."""
+        days = {
+            day: ScheduleDay(day, fetched_at, []) for day in _days_between(start, end)
+        }
+
+        for flight in flights:
+            # Flights reported just outside the range stay with its nearest day
+            day = min(max(flight.departure_time.date(), start), end)
+            days[day].flights.append(flight)
+
+        self.restore(days.values())
+
+    def restore(self, days: Iterable[ScheduleDay]) -> None:
+        """Restore previously cached days."""
+        for day in days:
+            self._days[day.day] = day
+            self._columns.pop(day.day, None)
+            self.index.add_day(day.day, day.flights)
+
+    def flights(self, start: date, end: date) -> list:
+        """Return the cached flights departing within the range, in order."""
+        return self.index.departing(start, end)
+
+    def columns(self, start: date, end: date) -> ScheduleColumns:
+        """Return the cached flights departing within the range as columns.
+
+        The columns of each day are built once and reused until it's replaced.
+        """
+        columns = []
+
+        for day in _days_between(start, end):
+            if (cached := self._days.get(day)) is None:
+                continue
+
+            if (day_columns := self._columns.get(day)) is None:
+                day_columns = self._columns[day] = ScheduleColumns.from_flights(
+                    day,
+                    cached.flights,
+                    self.index.roles,
+                    self.index.aircraft_types,
+                )
+
+            columns.append(day_columns)
+
+        return ScheduleColumns.concatenate(columns, self.index.roles)
+
+    def prune(self, before: date, fetched_before: datetime) -> None:
+        """Drop the days before a date which were fetched before a time.
+
+        Days fetched since are kept, so a range just fetched can still be read.
+        """
+        for day in [
+            cached.day
+            for cached in self._days.values()
+            if cached.day < before and cached.fetched_at < fetched_before
+        ]:
+            del self._days[day]
+            self._columns.pop(day, None)
+            self.index.remove_day(day)
+
+
+def _days_between(start: date, end: date) -> Iterator[date]:
+    day = start
+
+    while day <= end:
+        yield day
+        day += ONE_DAY
+
+
+def _runs(days: Iterable[date]) -> list[tuple[date, date]]:
+    """Group ordered days into inclusive runs of consecutive days."""
+    runs: list[tuple[date, date]] = []
+
+    for day in days:
+        if runs and runs[-1][1] + ONE_DAY == day:
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+
+    return runs
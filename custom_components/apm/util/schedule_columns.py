@@ -0,0 +1,192 @@
+"""Columnar flight schedule analytics for APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+# Crew members filling the seat of another role: an instructor pilot sits as
+# first officer
+SEAT_ROLES = {"IPL": "OPL"}
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleColumns:
+    """Flights of the schedule as NumPy columns, one row per flight.
+
+    `required` and `assigned` hold one column per role: how many crew members
+    the flight requires for the role, and how many are assigned to it.
+    """
+
+    roles: tuple[str, ...]
+    day: np.ndarray
+    departure: np.ndarray
+    aircraft_type: np.ndarray
+    required: np.ndarray
+    assigned: np.ndarray
+
+    @classmethod
+    def from_flights(
+        cls,
+        day: date,
+        flights: Sequence,
+        roles: tuple[str, ...],
+        aircraft_types: Collection[str],
+    ) -> ScheduleColumns:
+        """Build the columns of the flights departing on a day.
+
+        Crew requirements are only known for the given aircraft types; flights of
+        other types require no crew.
+        """
+        role_columns = {role: column for column, role in enumerate(roles)}
+        required = np.zeros((len(flights), len(roles)), dtype=np.int16)
+        assigned = np.zeros((len(flights), len(roles)), dtype=np.int16)
+
+        for row, flight in enumerate(flights):
+            if flight.aircraft_type in aircraft_types:
+                for role, count in flight.required_crew_members().items():
+                    if (column := role_columns.get(role)) is not None:
+                        required[row, column] = count
+
+            for crew_member in flight.crew_members:
+                role = SEAT_ROLES.get(crew_member.role_code, crew_member.role_code)
+
+                if (column := role_columns.get(role)) is not None:
+                    assigned[row, column] += 1
+
+        return cls(
+            roles,
+            np.full(len(flights), day.toordinal(), dtype=np.int32),
+            np.array(
+                [flight.departure_time.timestamp() for flight in flights],
+                dtype=np.int64,
+            ),
+            np.array([flight.aircraft_type for flight in flights], dtype=str),
+            required,
+            assigned,
+        )
+
+    @classmethod
+    def concatenate(
+        cls, columns: Sequence[ScheduleColumns], roles: tuple[str, ...]
+    ) -> ScheduleColumns:
+        """Join the columns of several days."""
+        if not columns:
+            return cls(
+                roles,
+                np.empty(0, dtype=np.int32),
+                np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=str),
+                np.empty((0, len(roles)), dtype=np.int16),
+                np.empty((0, len(roles)), dtype=np.int16),
+            )
+
+        return cls(
+            roles,
+            *(
+                np.concatenate([getattr(part, name) for part in columns])
+                for name in (
+                    "day",
+                    "departure",
+                    "aircraft_type",
+                    "required",
+                    "assigned",
+                )
+            ),
+        )
+
+    def __len__(self) -> int:
+        """Return the number of flights."""
+        return len(self.day)
+
+    @property
+    def missing(self) -> np.ndarray:
+        """Return the number of seats left to fill for each flight and role."""
+        return np.maximum(self.required - self.assigned, 0)
+
+
+@dataclass(frozen=True, slots=True)
+class StaffingHeatmap:
+    """Flight and crew counts per day, aircraft type and role."""
+
+    days: list[date]
+    aircraft_types: list[str]
+    roles: list[str]
+    flights: np.ndarray
+    required: np.ndarray
+    assigned: np.ndarray
+    missing: np.ndarray
+
+    def as_dict(self) -> dict:
+        """Return the heatmap as plain values."""
+        return {
+            "days": [day.isoformat() for day in self.days],
+            "aircraft_types": self.aircraft_types,
+            "roles": self.roles,
+            "flights": self.flights.tolist(),
+            "required": self.required.tolist(),
+            "assigned": self.assigned.tolist(),
+            "missing": self.missing.tolist(),
+        }
+
+
+def staffing_heatmap(
+    columns: ScheduleColumns,
+    start: date,
+    end: date,
+    aircraft_types: Sequence[str] | None = None,
+    roles: Sequence[str] | None = None,
+) -> StaffingHeatmap:
+    """Aggregate the schedule into a day × aircraft type × role heatmap.
+
+    `flights` counts flights per day and aircraft type. `required`, `assigned`
+    and `missing` sum the seats required, the crew members assigned and the
+    seats left to fill, each per day, aircraft type and role.
+    """
+    roles = list(columns.roles if roles is None else roles)
+    role_columns = [columns.roles.index(role) for role in roles]
+    day_count = (end - start).days + 1
+
+    rows = columns.day - start.toordinal()
+    mask = (rows >= 0) & (rows < day_count)
+
+    if aircraft_types is None:
+        aircraft_types = np.unique(columns.aircraft_type[mask]).tolist()
+    else:
+        aircraft_types = list(aircraft_types)
+        mask &= np.isin(columns.aircraft_type, aircraft_types)
+
+    # Map each flight's aircraft type to its position in the heatmap
+    type_order = np.argsort(aircraft_types)
+    type_rows = type_order[
+        np.searchsorted(
+            np.asarray(aircraft_types, dtype=str)[type_order],
+            columns.aircraft_type[mask],
+        )
+    ]
+
+    # Each flight falls into one cell of the day × aircraft type grid
+    cells = rows[mask] * len(aircraft_types) + type_rows
+    shape = (day_count, len(aircraft_types))
+    size = day_count * len(aircraft_types)
+
+    def _count(weights: np.ndarray | None = None) -> np.ndarray:
+        return np.bincount(cells, weights, minlength=size).astype(np.int32)
+
+    def _sum(values: np.ndarray) -> np.ndarray:
+        return np.stack(
+            [_count(values[mask, column]) for column in role_columns], -1
+        ).reshape(*shape, len(roles))
+
+    return StaffingHeatmap(
+        [start + timedelta(days=offset) for offset in range(day_count)],
+        aircraft_types,
+        roles,
+        _count().reshape(shape),
+        _sum(columns.required),
+        _sum(columns.assigned),
+        _sum(columns.missing),
+    )
@@ -0,0 +1,111 @@
+"""Inverted indexes over the flight schedule of APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections.abc import Hashable, Iterable
+from datetime import date
+
+
+class ScheduleIndex:
+    """Index cached flights by crew member, missing role and departure day.
+
+    Each departure day is indexed once when it's fetched, so lookups only touch
+    the matching flights instead of walking every crew list of the schedule.
+    Flights missing crew are indexed under the aircraft type and each of the
+    given roles, with `None` standing for any aircraft type or any role. Only
+    flights of the given aircraft types are checked for missing crew, as the
+    library can't tell the crew required for any other type.
+    """
+
+    def __init__(
+        self, roles: Iterable[str] = (), aircraft_types: Iterable[str] = ()
+    ) -> None:
+        """Initialize an empty index for the given crew roles and aircraft types."""
+        self.roles = tuple(roles)
+        self.aircraft_types = frozenset(aircraft_types)
+        self._by_day: dict[date, list] = {}
+        self._by_crew: dict[str, dict[date, list]] = {}
+        self._by_gap: dict[tuple[str | None, str | None], dict[date, list]] = {}
+        self._missing_roles: dict[int, tuple[str, ...]] = {}
+
+    def add_day(self, day: date, flights: list) -> None:
+        """Index the flights of a departure day, replacing any indexed before."""
+        self.remove_day(day)
+        self._by_day[day] = flights
+
+        for flight in flights:
+            for crew_code in {member.crew_code for member in flight.crew_members}:
+                _append(self._by_crew, crew_code, day, flight)
+
+            if flight.aircraft_type not in self.aircraft_types:
+                continue
+
+            # Checking the roles one by one lets an instructor pilot fill the first
+            # officer's seat, which checking the whole flight doesn't
+            if not (
+                roles := tuple(
+                    role for role in self.roles if flight.is_missing_crew_members(role)
+                )
+            ):
+                continue
+
+            self._missing_roles[id(flight)] = roles
+
+            for aircraft_type in (flight.aircraft_type, None):
+                for role in (*roles, None):
+                    _append(self._by_gap, (aircraft_type, role), day, flight)
+
+    def remove_day(self, day: date) -> None:
+        """Drop the flights of a departure day from the index."""
+        if (flights := self._by_day.pop(day, None)) is None:
+            return
+
+        for flight in flights:
+            self._missing_roles.pop(id(flight), None)
+
+        for index in (self._by_crew, self._by_gap):
+            for key in [key for key, days in index.items() if day in days]:
+                del index[key][day]
+
+                if not index[key]:
+                    del index[key]
+
+    def departing(self, start: date, end: date) -> list:
+        """Return the flights departing within the range, in order."""
+        return _collect(self._by_day, start, end)
+
+    def crew_member(self, crew_code: str, start: date, end: date) -> list:
+        """Return the flights of a crew member within the range, in order."""
+        return _collect(self._by_crew.get(crew_code, {}), start, end)
+
+    def missing_roles(self, flight) -> tuple[str, ...]:
+        """Return the roles an indexed flight is missing crew members for."""
+        return self._missing_roles.get(id(flight), ())
+
+    def missing(
+        self, aircraft_type: str | None, role: str | None, start: date, end: date
+    ) -> list:
+        """Return the flights missing a role within the range, in order.
+
+        Without an aircraft type or a role, flights of any aircraft type or
+        missing crew members of any role are returned.
+        """
+        return _collect(self._by_gap.get((aircraft_type, role), {}), start, end)
+
+
+def _append(
+    index: dict[Hashable, dict[date, list]], key: Hashable, day: date, flight
+) -> None:
+    index.setdefault(key, {}).setdefault(day, []).append(flight)
+
+
+def _collect(days: dict[date, list], start: date, end: date) -> list:
+    flights = [
+        flight
+        for day, day_flights in days.items()
+        if start <= day <= end
+        for flight in day_flights
+    ]
+    flights.sort(key=lambda flight: flight.departure_time)
+
+    return flights
@@ -0,0 +1,135 @@
+"""JSON encoding of APM CrewConnect library objects."""
+
+from __future__ import annotations
+
+import dataclasses
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+import importlib
+from typing import Any
+
+LIBRARY = "apm_crewconnect"
+
+
+def encode(value: Any) -> Any:
+    """Convert library objects into plain JSON values.
+
+    Objects are stored as their class path and attributes, with dates, times,
+    durations and time zones tagged so they can be told apart from strings and numbers.
+    """
+    if isinstance(value, Enum):
+        return {"__enum__": _class_path(type(value)), "value": encode(value.value)}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"__timedelta__": value.total_seconds()}
+    if isinstance(value, timezone):
+        return {
+            "__timezone__": value.utcoffset(None).total_seconds(),
+            "name": value.tzname(None),
+        }
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            "__dict__": [[encode(key), encode(item)] for key, item in value.items()]
+        }
+
+    return {
+        "__object__": _class_path(type(value)),
+        "fields": {name: encode(item) for name, item in _fields(value).items()},
+    }
+
+
+def decode(value: Any) -> Any:
+    """Rebuild the library objects encoded by `encode`.
+
+    Only classes of the library are rebuilt, without calling their constructors.
+    Dataclass fields added to the library since the value was encoded are given
+    their defaults.
+    """
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    if "__timedelta__" in value:
+        return timedelta(seconds=value["__timedelta__"])
+    if "__timezone__" in value:
+        return timezone(timedelta(seconds=value["__timezone__"]), value["name"])
+    if "__dict__" in value:
+        return {
+            _hashable(decode(key)): decode(item) for key, item in value["__dict__"]
+        }
+    if "__enum__" in value:
+        return _library_class(value["__enum__"])(decode(value["value"]))
+    if "__object__" in value:
+        return _rebuild(
+            _library_class(value["__object__"]),
+            {name: decode(item) for name, item in value["fields"].items()},
+        )
+
+    raise ValueError(f"Unknown encoded value: {value!r}")
+
+
+def _fields(value: Any) -> dict[str, Any]:
+    if dataclasses.is_dataclass(value):
+        return {
+            field.name: getattr(value, field.name)
+            for field in dataclasses.fields(value)
+        }
+    if hasattr(value, "__dict__"):
+        return vars(value)
+
+    raise TypeError(f"Can't encode {type(value).__name__}")
+
+
+def _rebuild(cls: type, fields: dict[str, Any]) -> Any:
+    instance = object.__new__(cls)
+
+    if dataclasses.is_dataclass(cls):
+        for field in dataclasses.fields(cls):
+            if field.name in fields:
+                continue
+            if field.default is not dataclasses.MISSING:
+                fields[field.name] = field.default
+            elif field.default_factory is not dataclasses.MISSING:
+                fields[field.name] = field.default_factory()
+
+    for name, item in fields.items():
+        object.__setattr__(instance, name, item)
+
+    return instance
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _library_class(path: str) -> type:
+    """Return a class of the library from its path, refusing any other class."""
+    module_name, _, qualname = path.partition(":")
+
+    if module_name != LIBRARY and not module_name.startswith(f"{LIBRARY}."):
+        raise ValueError(f"Refusing to rebuild {path}")
+
+    value: Any = importlib.import_module(module_name)
+
+    for name in qualname.split("."):
+        value = getattr(value, name)
+
+    if not isinstance(value, type):
+        raise ValueError(f"{path} is not a class")
+
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
@@ -0,0 +1,59 @@
+"""Coalescing of concurrent date range requests for APM CrewConnect."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Generic, TypeVar
+
+_T = TypeVar("_T")
+
+
+@dataclass(slots=True)
+class _InFlightRequest:
+    start: date
+    end: date | None
+    future: asyncio.Future[Any]
+
+    def covers(self, start: date, end: date | None) -> bool:
+        if end is None or self.end is None:
+            return self.start == start and self.end == end
+
+        return self.start <= start and end <= self.end
+
+
+class SingleFlight(Generic[_T]):
+    """Share one in-flight request between callers with covered ranges.
+
+    A caller whose date range lies within the range of a request already in
+    flight awaits that request's result instead of issuing its own.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with no requests in flight."""
+        self._in_flight: list[_InFlightRequest] = []
+
+    async def async_run(
+        self,
+        start: date,
+        end: date | None,
+        request: Callable[[], Awaitable[_T]],
+    ) -> tuple[_T, bool]:
+        """Run or join a request for the date range.
+
+        Return the result along with whether it was shared from a wider
+        request already in flight.
+        """
+        for in_flight in self._in_flight:
+            if in_flight.covers(start, end):
+                return await asyncio.shield(in_flight.future), True
+
+        in_flight = _InFlightRequest(start, end, asyncio.ensure_future(request()))
+        self._in_flight.append(in_flight)
+        in_flight.future.add_done_callback(
+            lambda _: self._in_flight.remove(in_flight)
+        )
+
+        return await asyncio.shield(in_flight.future), False
@@ -0,0 +1,123 @@
+"""HTTP views for APM CrewConnect."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+from http import HTTPStatus
+import logging
+
+from aiohttp import hdrs, web
+
+from homeassistant.components.http import KEY_HASS, HomeAssistantView
+from homeassistant.util.dt import now, start_of_local_day
+
+from .const import APM_ERRORS, DOMAIN
+from .util.ical import iCal
+
+_LOGGER = logging.getLogger(__name__)
+
+FEED_PAST = timedelta(days=30)
+FEED_FUTURE = timedelta(days=90)
+
+
+class ApmRosterFeedView(HomeAssistantView):
+    """Serve the roster as a subscribable iCal feed.
+
+    Responses carry a weak ETag derived from the exported activities, so polling
+    clients get a bodiless 304 until something actually changes. It is weak as
+    the same feed is served both compressed and not, and its DTSTAMPs record when
+    each event was rendered rather than anything about the roster.
+    """
+
+    url = "/api/apm/{user_id}/roster.ics"
+    name = "api:apm:roster_feed"
+    requires_auth = True
+
+    async def get(self, request: web.Request, user_id: str) -> web.StreamResponse:
+        """Return the roster feed of a user."""
+        accounts = request.app[KEY_HASS].data.get(DOMAIN, {}).values()
+        data = next((data for data in accounts if data.apm.user_id == user_id), None)
+
+        if data is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+
+        start_date = now().date() - FEED_PAST
+        end_date = now().date() + FEED_FUTURE
+
+        try:
+            await data.coordinator.async_fetch_range(start_date, end_date)
+        except APM_ERRORS as err:
+            _LOGGER.warning("Unable to fetch roster, serving cached feed: %r", err)
+
+        store = data.coordinator.store
+        activities = store.overlapping(
+            start_of_local_day(start_date),
+            start_of_local_day(end_date + timedelta(days=1)),
+        )
+
+        etag = _etag(user_id, map(store.fingerprint, activities))
+        headers = {
+            hdrs.ETAG: etag,
+            hdrs.CACHE_CONTROL: "private, no-cache",
+        }
+        if store.changed_at is not None:
+            headers[hdrs.LAST_MODIFIED] = format_datetime(
+                store.changed_at.astimezone(UTC), usegmt=True
+            )
+
+        if _not_modified(request, etag, store.changed_at):
+            return web.Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+        response = web.StreamResponse(headers=headers)
+        response.content_type = "text/calendar"
+        response.charset = "utf-8"
+        response.enable_compression()
+        await response.prepare(request)
+
+        for chunk in iCal.from_activities(
+            user_id, activities, data.ical_blocks.get
+        ).iter_chunks():
+            await response.write(chunk.encode())
+
+        await response.write_eof()
+
+        return response
+
+
+def _etag(user_id: str, fingerprints: Iterable[str]) -> str:
+    digest = hashlib.blake2b(user_id.encode(), digest_size=16)
+
+    for fingerprint in fingerprints:
+        digest.update(fingerprint.encode())
+
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _not_modified(
+    request: web.Request, etag: str, changed_at: datetime | None
+) -> bool:
+    """Evaluate the conditional request headers as described in RFC 9110."""
+    if (if_none_match := request.headers.get(hdrs.IF_NONE_MATCH)) is not None:
+        # If-None-Match uses the weak comparison, ignoring the weakness indicator
+        return if_none_match.strip() == "*" or etag.removeprefix("W/") in (
+            candidate.strip().removeprefix("W/")
+            for candidate in if_none_match.split(",")
+        )
+
+    if_modified_since = request.headers.get(hdrs.IF_MODIFIED_SINCE)
+
+    if if_modified_since is None or changed_at is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+
+    return changed_at.replace(microsecond=0) <= since
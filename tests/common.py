@@ -0,0 +1,226 @@
+"""Helpers shared by the APM CrewConnect tests."""
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock
+
+from apm_crewconnect import Activity, Flight, FlightActivity, Roster
+from custom_components.apm import ApmData
+from custom_components.apm.const import DOMAIN
+from custom_components.apm.coordinator import ApmRosterCoordinator
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+from homeassistant.util.dt import utcnow
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(day: int, hour: int = 0) -> datetime:
+    """Return the UTC moment of an hour of a day of January 2024."""
+    return BASE + timedelta(days=day - 1, hours=hour)
+
+
+def roster_activity(
+    activity_type: str,
+    start: datetime,
+    end: datetime,
+    id: int | None = None,
+    pairing_id: int | None = None,
+    check_in: datetime | None = None,
+    check_out: datetime | None = None,
+    **payload: Any,
+) -> Activity:
+    """Parse an activity from the roster payload APM sends for it."""
+    return Activity.from_roster(
+        {
+            "activityType": activity_type,
+            "pendingRequest": False,
+            "details": "",
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "checkIn": check_in and check_in.isoformat(),
+            "checkOut": check_out and check_out.isoformat(),
+            "crewPairingId": pairing_id,
+            **({} if id is None else {"opsLegCrewId": id}),
+            **payload,
+        }
+    )
+
+
+def flight_activity(
+    start: datetime,
+    end: datetime,
+    origin: str = "CDG",
+    destination: str = "NCE",
+    block_time: timedelta | None = None,
+    **fields: Any,
+) -> FlightActivity:
+    """Parse a flight of the roster."""
+    return roster_activity(
+        "F",
+        start,
+        end,
+        flightNumber="AF7700",
+        flightAircraftVersion="737-800",
+        flightAircraftRegistration="F-GZHA",
+        departureAirportCode=origin,
+        departureAirportIcaoCode=f"L{origin}",
+        departureAirportName=origin,
+        departureCountryName="France",
+        departureAirportTimeZone="+01:00",
+        arrivalAirportCode=destination,
+        arrivalAirportIcaoCode=f"L{destination}",
+        arrivalAirportName=destination,
+        arrivalCountryName="France",
+        arrivalAirportTimeZone="+01:00",
+        flightBlockTime=_duration(block_time or end - start)[:5],
+        flightDutyPeriod=_duration(end - start),
+        maxFlightDutyPeriod="13:00:00",
+        flightDutyType="Standard",
+        flightRole="OPL",
+        flightSerieType="S",
+        **fields,
+    )
+
+
+def deadhead_activity(
+    start: datetime,
+    end: datetime,
+    origin: str = "CDG",
+    destination: str = "NCE",
+    **fields: Any,
+) -> Activity:
+    """Parse a deadheading leg of the roster."""
+    return roster_activity(
+        "O",
+        start,
+        end,
+        deadheadDescription="AF1234",
+        departureAirportCode=origin,
+        departureAirportName=origin,
+        departureCountryName="France",
+        arrivalAirportCode=destination,
+        arrivalAirportName=destination,
+        arrivalCountryName="France",
+        duration=_duration(end - start),
+        **fields,
+    )
+
+
+def hotel_activity(start: datetime, end: datetime, **fields: Any) -> Activity:
+    """Parse a hotel stay of the roster."""
+    return roster_activity("H", start, end, hotelName="Airport Hotel", **fields)
+
+
+def ground_activity(
+    start: datetime,
+    end: datetime,
+    ground_type: str = "G",
+    ground_code: str = "OFFICE",
+    **fields: Any,
+) -> Activity:
+    """Parse a ground activity of the roster, such as a day off or leave."""
+    return roster_activity(
+        "G", start, end, groundType=ground_type, groundCode=ground_code, **fields
+    )
+
+
+def crew_member(crew_code: str, role_code: str) -> dict[str, Any]:
+    """Return the payload of a crew member assigned to a schedule flight."""
+    return {
+        "crewCode": crew_code,
+        "roleCode": role_code,
+        "firstName": crew_code,
+        "lastName": crew_code,
+        "photoThumbnail": "",
+        "deadHeading": False,
+        "groundStaffOnBoard": False,
+    }
+
+
+def schedule_flight(
+    departure_time: datetime,
+    aircraft_type: str = "73H",
+    crew_members: Iterable[dict[str, Any]] = (),
+    hours: float = 2,
+    origin: str = "CDG",
+    destination: str = "NCE",
+    flight_number: str = "AF7700",
+    leg_id: int = 1,
+) -> Flight:
+    """Parse a flight of the schedule from the payload APM sends for it."""
+    arrival_time = departure_time + timedelta(hours=hours)
+
+    return Flight.from_dict(
+        {
+            "legId": leg_id,
+            "serieId": 1,
+            "aircraftRegistration": "F-GZHA",
+            "aircraftCode": aircraft_type,
+            "aircraftType": aircraft_type,
+            "commercialFlightNumber": flight_number,
+            "airlineDesignator": "AF",
+            "flightNumber": flight_number,
+            "departureAirportCommercialCode": origin,
+            "departureAirportName": origin,
+            "arrivalAirportCommercialCode": destination,
+            "arrivalAirportName": destination,
+            "departureTime": departure_time.isoformat(),
+            "arrivalTime": arrival_time.isoformat(),
+            "scheduledDepartureTime": departure_time.isoformat(),
+            "scheduledArrivalTime": arrival_time.isoformat(),
+            "numberOfPassengers": 0,
+            "numberOfInfants": 0,
+            "passengerInfoDto": {},
+            "freightInfoDto": {"freightTotal": 0.0},
+            "flightTimes": {"departureEstimated": False, "arrivalEstimated": False},
+            "departureColor": "",
+            "arrivalColor": "",
+            "delays": [],
+            "blockTime": _duration(arrival_time - departure_time)[:5],
+            "crewMembers": list(crew_members),
+            "icaoDepartureAirport": f"L{origin}",
+            "icaoArrivalAirport": f"L{destination}",
+            "departureHatched": False,
+            "arrivalHatched": False,
+            "paxOverbooking": False,
+            "paxUnderbooking": False,
+            "_links": {},
+        }
+    )
+
+
+def mock_apm_data(hass: HomeAssistant) -> ApmData:
+    """Set up the data of an account with an empty roster and no APM client."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "apm.example.com"})
+    entry.add_to_hass(hass)
+    data = ApmData(hass, entry, "apm.example.com")
+    data.apm = SimpleNamespace(user_id="123")
+    data.cache = MagicMock()
+    data.coordinator = ApmRosterCoordinator(hass, data)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = data
+
+    return data
+
+
+def merge_roster(
+    data: ApmData,
+    activities: Iterable[Activity],
+    start: date = date(2024, 1, 1),
+    end: date = date(2024, 1, 31),
+) -> None:
+    """Merge a freshly fetched roster window and notify the entities."""
+    coordinator = data.coordinator
+    coordinator.last_merge = coordinator.store.merge(
+        Roster("123", start, end, list(activities)), utcnow()
+    )
+    coordinator.async_set_updated_data(coordinator.store)
+
+
+def _duration(value: timedelta) -> str:
+    minutes, seconds = divmod(int(value.total_seconds()), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
@@ -1,9 +0,0 @@
-"""Constants for APM CrewConnect tests."""
-from custom_components.apm.const import (
-    CONF_PASSWORD,
-)
-from custom_components.apm.const import (
-    CONF_USERNAME,
-)
-
-MOCK_CONFIG = {CONF_USERNAME: "test_username", CONF_PASSWORD: "test_password"}
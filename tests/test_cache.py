@@ -0,0 +1,124 @@
+"""Test the persistent roster cache."""
+from datetime import date, timedelta
+import json
+
+from apm_crewconnect import Roster
+from custom_components.apm.cache import (
+    SAVE_DELAY,
+    ApmCache,
+    ApmScheduleCache,
+    async_remove_cache,
+)
+from custom_components.apm.util.roster_store import RosterStore
+from homeassistant.util.dt import utcnow
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from .common import (
+    at,
+    flight_activity,
+    ground_activity,
+    hotel_activity,
+    schedule_flight,
+)
+
+SCHEDULE_KEY = "apm.schedule.apm_example_com"
+
+
+def _stored(key, data):
+    return {"version": 1, "minor_version": 1, "key": key, "data": data}
+
+
+async def test_roster_survives_restart(hass, hass_storage):
+    """Test a cached roster with flights is saved and restored."""
+    store = RosterStore()
+    activities = [
+        flight_activity(at(1, 8), at(1, 10), id=1, pairing_id=10),
+        hotel_activity(at(1, 12), at(2, 6), id=2, pairing_id=10),
+        ground_activity(at(3), at(4), "O", "OFF", id=3),
+    ]
+    store.merge(Roster("123", date(2024, 1, 1), date(2024, 1, 5), activities), at(1))
+
+    hass_storage["apm.entry"] = {
+        "version": 1,
+        "minor_version": 1,
+        "key": "apm.entry",
+        "data": json.loads(json.dumps(ApmCache(hass, "entry", store)._data_to_save())),
+    }
+    restored = RosterStore()
+
+    assert await ApmCache(hass, "entry", restored).async_load()
+    assert restored.user_id == "123"
+    assert restored.activities == activities
+    assert restored.coverage.covers(date(2024, 1, 1), date(2024, 1, 5))
+
+
+async def test_unreadable_cache_is_discarded(hass, hass_storage):
+    """Test a cache which can't be rebuilt is ignored."""
+    hass_storage["apm.entry"] = _stored(
+        "apm.entry", {"format": 4, "user_id": "123", "roster": {}}
+    )
+
+    assert not await ApmCache(hass, "entry", RosterStore()).async_load()
+
+
+async def test_missing_or_outdated_cache(hass, hass_storage):
+    """Test nothing is loaded without a cache of the current format."""
+    assert not await ApmCache(hass, "entry", RosterStore()).async_load()
+
+    hass_storage["apm.entry"] = _stored("apm.entry", {"format": 1})
+
+    assert not await ApmCache(hass, "entry", RosterStore()).async_load()
+
+
+async def test_roster_is_saved_and_removed(hass, hass_storage):
+    """Test the roster is saved once writes settle, and removed with its entry."""
+    store = RosterStore()
+    store.merge(Roster("123", date(2024, 1, 1), date(2024, 1, 5), []), at(1))
+
+    ApmCache(hass, "entry", store).async_schedule_save()
+    async_fire_time_changed(hass, utcnow() + timedelta(seconds=SAVE_DELAY + 1))
+    await hass.async_block_till_done()
+
+    assert hass_storage["apm.entry"]["data"]["user_id"] == "123"
+
+    await async_remove_cache(hass, "entry")
+
+    assert "apm.entry" not in hass_storage
+
+
+async def test_schedule_survives_restart(hass, hass_storage, freezer):
+    """Test the flight schedule is saved and restored, without past days."""
+    freezer.move_to(at(3, 12))
+    await hass.config.async_set_time_zone("UTC")
+    cache = ApmScheduleCache(hass, "apm.example.com")
+    flight = schedule_flight(at(3, 8))
+    cache.schedules.add(date(2024, 1, 1), date(2024, 1, 1), [], at(1))
+    cache.schedules.add(date(2024, 1, 3), date(2024, 1, 3), [flight], at(3))
+
+    cache.async_schedule_save()
+    async_fire_time_changed(hass, utcnow() + timedelta(seconds=SAVE_DELAY + 1))
+    await hass.async_block_till_done()
+    hass_storage[SCHEDULE_KEY] = json.loads(json.dumps(hass_storage[SCHEDULE_KEY]))
+    restored = ApmScheduleCache(hass, "apm.example.com")
+    await restored.async_load()
+
+    assert [day.day for day in restored.schedules] == [date(2024, 1, 3)]
+    assert restored.schedules.flights(date(2024, 1, 3), date(2024, 1, 3)) == [flight]
+
+
+async def test_unusable_schedule_cache_is_discarded(hass, hass_storage, caplog):
+    """Test a flight schedule cache of another format or unreadable is ignored."""
+    for stored in (
+        None,
+        {"format": 1},
+        {"format": 4, "schedules": [{"day": "soon"}]},
+    ):
+        if stored is not None:
+            hass_storage[SCHEDULE_KEY] = _stored(SCHEDULE_KEY, stored)
+
+        cache = ApmScheduleCache(hass, "apm.example.com")
+        await cache.async_load()
+
+        assert not list(cache.schedules)
+
+    assert "Discarding flight schedule cache" in caplog.text
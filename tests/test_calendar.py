@@ -0,0 +1,213 @@
+"""Test the APM roster calendars."""
+from unittest.mock import AsyncMock
+
+from custom_components.apm.calendar import (
+    ApmCalendar,
+    ApmTripCalendar,
+    async_setup_entry,
+)
+from custom_components.apm.util.roster_store import MergeResult
+from pytest_homeassistant_custom_component.common import (
+    MockEntityPlatform,
+    async_fire_time_changed,
+)
+
+from .common import at, flight_activity, hotel_activity, merge_roster, mock_apm_data
+
+
+async def _add_calendar(hass, data, calendar_class=ApmCalendar):
+    calendar = calendar_class(hass, data.entry)
+    platform = MockEntityPlatform(hass, domain="calendar", platform_name="apm")
+    await platform.async_add_entities([calendar])
+
+    return calendar, platform
+
+
+async def test_event_is_current_or_next(hass, freezer):
+    """Test the calendar shows the activity under way, or else the next one."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=1, details="First"),
+            flight_activity(at(1, 12), at(1, 14), id=2, details="Second"),
+        ],
+    )
+    calendar, platform = await _add_calendar(hass, data)
+
+    assert calendar.event.description == "First"
+    assert hass.states.get(calendar.entity_id).state == "off"
+
+    await platform.async_reset()
+
+
+async def test_boundary_moves_to_next_event(hass, freezer):
+    """Test the calendar follows activities as they start and end."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=1, details="First"),
+            flight_activity(at(1, 12), at(1, 14), id=2, details="Second"),
+        ],
+    )
+    calendar, platform = await _add_calendar(hass, data)
+
+    freezer.move_to(at(1, 8))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(calendar.entity_id).state == "on"
+    assert calendar.event.description == "First"
+
+    freezer.move_to(at(1, 10))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert hass.states.get(calendar.entity_id).state == "off"
+    assert calendar.event.description == "Second"
+
+    await platform.async_reset()
+
+
+async def test_reading_the_event_leaves_timers_alone(hass, freezer):
+    """Test the event is only moved on by its boundary timer, never by a read."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(data, [flight_activity(at(1, 8), at(1, 10), id=1)])
+    calendar, platform = await _add_calendar(hass, data)
+    unsub_boundary = calendar._unsub_boundary
+
+    freezer.move_to(at(1, 11))
+
+    assert calendar.event is not None
+    assert calendar._unsub_boundary is unsub_boundary
+
+    await platform.async_reset()
+
+
+async def test_merge_tracks_new_activities(hass, freezer):
+    """Test an activity merged ahead of the tracked one becomes the event."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(data, [flight_activity(at(2, 8), at(2, 10), id=1, details="Later")])
+    calendar, platform = await _add_calendar(hass, data)
+
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=2, details="Sooner"),
+            flight_activity(at(2, 8), at(2, 10), id=1, details="Later"),
+        ],
+    )
+    await hass.async_block_till_done()
+
+    assert calendar.event.description == "Sooner"
+    assert hass.states.get(calendar.entity_id).attributes["description"] == "Sooner"
+
+    await platform.async_reset()
+
+
+async def test_events_in_range(hass, freezer):
+    """Test events are listed from the store, even when APM can't be reached."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=1, details="First"),
+            flight_activity(at(3, 8), at(3, 10), id=2, details="Second"),
+        ],
+    )
+    calendar, platform = await _add_calendar(hass, data)
+
+    events = await calendar.async_get_events(hass, at(1), at(2))
+
+    assert [event.description for event in events] == ["First"]
+    assert events[0] is calendar._event(data.coordinator.store.activities[0])
+
+    data.coordinator.async_fetch_range = AsyncMock(side_effect=TimeoutError)
+    events = await calendar.async_get_events(hass, at(1), at(4))
+
+    assert [event.description for event in events] == ["First", "Second"]
+
+    await platform.async_reset()
+
+
+async def test_trip_events(hass, freezer):
+    """Test the trip calendar shows one event per trip, from report to release."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(
+        data,
+        [
+            flight_activity(
+                at(1, 8), at(1, 10), "CDG", "NCE", id=1, pairing_id=7, check_in=at(1, 7)
+            ),
+            hotel_activity(at(1, 11), at(2, 7), id=2, pairing_id=7),
+            flight_activity(at(2, 8), at(2, 10), "NCE", "CDG", id=3, pairing_id=7),
+        ],
+    )
+    calendar, platform = await _add_calendar(hass, data, ApmTripCalendar)
+
+    assert not data.coordinator.store._memos
+    assert calendar.event.summary == "Trip CDG-NCE-CDG"
+    assert (calendar.event.start, calendar.event.end) == (at(1, 7), at(2, 10))
+    assert calendar.event.description == "BLK : 04:00\nLayover : NCE 20:00"
+
+    await platform.async_reset()
+
+
+async def test_removed_trips_are_forgotten(hass, freezer):
+    """Test the events of trips dropped from the roster aren't kept."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=1, pairing_id=7),
+            flight_activity(at(3, 8), at(3, 10), id=2, pairing_id=8),
+        ],
+    )
+    calendar, platform = await _add_calendar(hass, data, ApmTripCalendar)
+    await calendar.async_get_events(hass, at(1), at(4))
+
+    assert set(calendar._trip_events) == {7, 8}
+
+    merge_roster(data, [flight_activity(at(3, 8), at(3, 10), id=2, pairing_id=8)])
+    await hass.async_block_till_done()
+
+    assert set(calendar._trip_events) == {8}
+
+    await platform.async_reset()
+
+
+async def test_setup_adds_both_calendars(hass):
+    """Test the roster and trip calendars are added for an account."""
+    data = mock_apm_data(hass)
+    entities = []
+
+    await async_setup_entry(hass, data.entry, entities.extend)
+
+    assert [type(entity) for entity in entities] == [ApmCalendar, ApmTripCalendar]
+
+
+async def test_empty_roster(hass, freezer):
+    """Test the calendar has no event, and isn't rewritten until the roster changes."""
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    calendar, platform = await _add_calendar(hass, data)
+    state = hass.states.get(calendar.entity_id)
+
+    assert calendar.event is None
+    assert state.state == "off"
+
+    data.coordinator.last_merge = MergeResult()
+    data.coordinator.async_update_listeners()
+    await hass.async_block_till_done()
+
+    assert hass.states.get(calendar.entity_id) is state
+
+    await platform.async_reset()
@@ -0,0 +1,63 @@
+"""Test the circuit breaker guarding APM calls."""
+import pytest
+
+from custom_components.apm.util.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+)
+
+
+def test_opens_after_threshold():
+    """Test the circuit opens after consecutive failures only."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=300)
+
+    breaker.check()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert not breaker.is_open
+
+    breaker.record_failure()
+
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_trial_call_closes_circuit():
+    """Test a single trial call is let through once the timeout has passed."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    breaker.check()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.record_success()
+    breaker.check()
+    breaker.check()
+
+
+def test_failed_trial_reopens_circuit():
+    """Test a failed trial call opens the circuit again."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.check()
+
+    breaker.record_failure()
+
+    breaker.reset_timeout = 300
+    assert breaker.is_open
+
+
+def test_released_trial_lets_next_call_through():
+    """Test a trial ended without a verdict doesn't keep the circuit open."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.check()
+
+    breaker.release_trial()
+
+    breaker.check()
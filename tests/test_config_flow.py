@@ -1,117 +1,212 @@
-"""Test APM CrewConnect config flow."""
+"""Test the APM CrewConnect config and options flows."""
+from types import SimpleNamespace
 from unittest.mock import patch
 
-import pytest
-from custom_components.apm.const import (
-    BINARY_SENSOR,
-)
+from apm_crewconnect.exceptions import InvalidAuthRedirectException
+from requests import Session
+from requests.exceptions import ConnectionError
+
 from custom_components.apm.const import (
+    CONF_APM_TOKEN,
+    CONF_AUTH_REDIRECT,
+    CONF_MAX_WORKERS,
+    CONF_OKTA_TOKEN,
+    CONF_REQUESTS_PER_MINUTE,
     DOMAIN,
 )
-from custom_components.apm.const import (
-    PLATFORMS,
-)
-from custom_components.apm.const import (
-    SENSOR,
-)
-from custom_components.apm.const import (
-    SWITCH,
-)
+from custom_components.apm.executor import DEFAULT_MAX_WORKERS
 from homeassistant import config_entries
-from homeassistant import data_entry_flow
+from homeassistant.const import CONF_HOST
+from homeassistant.data_entry_flow import FlowResultType
+import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
+import voluptuous as vol
+
+HOST = "apm.example.com"
+REDIRECT = "com.apm.crewconnect:/callback?code=abc&state=xyz"
+
+
+class FakeApm:
+    """APM client authorizing a single account from its redirect URL."""
+
+    user_id = "123"
 
-from .const import MOCK_CONFIG
+    def __init__(self, host, manual_auth=False):
+        """Initialize the client, failing for unreachable hosts."""
+        if host != HOST:
+            raise ConnectionError
 
+        self.host = host
+        self.client = SimpleNamespace(
+            token=None, okta_client=SimpleNamespace(token=None, session=Session())
+        )
 
-# This fixture bypasses the actual setup of the integration
-# since we only want to test the config flow. We test the
-# actual functionality of the integration in other test modules.
-@pytest.fixture(autouse=True)
-def bypass_setup_fixture():
-    """Prevent setup."""
-    with patch("custom_components.apm.async_setup", return_value=True,), patch(
-        "custom_components.apm.async_setup_entry",
-        return_value=True,
-    ):
+    def generate_auth_url(self):
+        """Return the Okta authorization URL."""
+        return "https://okta.example.com/authorize"
+
+    def authenticate_from_redirect(self, redirect):
+        """Obtain tokens from the redirect URL."""
+        if redirect != REDIRECT:
+            raise InvalidAuthRedirectException
+
+        self.client.token = {"access_token": "apm"}
+        self.client.okta_client.token = {"access_token": "okta"}
+
+
+@pytest.fixture(name="entry")
+def entry_fixture(hass, enable_custom_integrations):
+    """Add a config entry without setting it up."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, unique_id=f"{HOST}_123", data={CONF_HOST: HOST}
+    )
+    entry.add_to_hass(hass)
+
+    return entry
+
+
+@pytest.fixture(name="fake_apm")
+def fake_apm_fixture(enable_custom_integrations):
+    """Authorize with a fake client, without setting up entries."""
+    with patch("custom_components.apm.config_flow.Apm", FakeApm), patch(
+        "custom_components.apm.async_setup", return_value=True
+    ), patch("custom_components.apm.async_setup_entry", return_value=True):
         yield
 
 
-# Here we simiulate a successful config flow from the backend.
-# Note that we use the `bypass_get_data` fixture here because
-# we want the config flow validation to succeed during the test.
-async def test_successful_config_flow(hass, bypass_get_data):
-    """Test a successful config flow."""
-    # Initialize a config flow
+async def test_user_flow(hass, fake_apm):
+    """Test an account is added once authorized from a redirect URL."""
     result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
     )
 
-    # Check that the config flow shows the user form as the first step
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert result["type"] is FlowResultType.FORM
     assert result["step_id"] == "user"
 
-    # If a user were to enter `test_username` for username and `test_password`
-    # for password, it would result in this function call
     result = await hass.config_entries.flow.async_configure(
-        result["flow_id"], user_input=MOCK_CONFIG
+        result["flow_id"], user_input={CONF_HOST: HOST}
+    )
+
+    assert result["step_id"] == "authorize"
+    assert result["description_placeholders"] == {
+        "auth_url": "https://okta.example.com/authorize"
+    }
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={CONF_AUTH_REDIRECT: "wrong"}
+    )
+
+    assert result["errors"] == {"base": "invalid_auth_redirect"}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={CONF_AUTH_REDIRECT: REDIRECT}
     )
 
-    # Check that the config flow is complete and a new entry is created with
-    # the input data
-    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
-    assert result["title"] == "test_username"
-    assert result["data"] == MOCK_CONFIG
-    assert result["result"]
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["title"] == "123"
+    assert result["data"] == {
+        CONF_HOST: HOST,
+        CONF_APM_TOKEN: {"access_token": "apm"},
+        CONF_OKTA_TOKEN: {"access_token": "okta"},
+    }
+    assert result["result"].unique_id == f"{HOST}_123"
+
+
+async def test_user_flow_cannot_connect(hass, fake_apm):
+    """Test an unreachable host is reported."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_USER},
+        data={CONF_HOST: "down.example.com"},
+    )
 
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {"base": "cannot_connect"}
 
-# In this case, we want to simulate a failure during the config flow.
-# We use the `error_on_get_data` mock instead of `bypass_get_data`
-# (note the function parameters) to raise an Exception during
-# validation of the input config.
-async def test_failed_config_flow(hass, error_on_get_data):
-    """Test a failed config flow due to credential validation failure."""
 
+async def test_account_is_only_added_once(hass, entry, fake_apm):
+    """Test an account already configured on the host is refused."""
     result = await hass.config_entries.flow.async_init(
-        DOMAIN, context={"source": config_entries.SOURCE_USER}
+        DOMAIN, context={"source": config_entries.SOURCE_USER}, data={CONF_HOST: HOST}
+    )
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input={CONF_AUTH_REDIRECT: REDIRECT}
     )
 
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["step_id"] == "user"
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "already_configured"
+
+
+async def test_reauth_flow(hass, entry, fake_apm):
+    """Test reauthenticating replaces the tokens of the entry."""
+    entry.async_start_reauth(hass)
+    await hass.async_block_till_done()
+    [flow] = hass.config_entries.flow.async_progress()
+
+    assert flow["step_id"] == "authorize"
 
     result = await hass.config_entries.flow.async_configure(
-        result["flow_id"], user_input=MOCK_CONFIG
+        flow["flow_id"], user_input={CONF_AUTH_REDIRECT: REDIRECT}
     )
 
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["errors"] == {"base": "auth"}
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "reauth_successful"
+    assert entry.data[CONF_APM_TOKEN] == {"access_token": "apm"}
 
 
-# Our config flow also has an options flow, so we must test it as well.
-async def test_options_flow(hass):
-    """Test an options flow."""
-    # Create a new MockConfigEntry and add to HASS (we're bypassing config
-    # flow entirely)
-    entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
-    entry.add_to_hass(hass)
+async def test_reauth_flow_wrong_account(hass, entry, fake_apm):
+    """Test the tokens of another account can't replace those of the entry."""
+    hass.config_entries.async_update_entry(entry, unique_id=f"{HOST}_456")
+    entry.async_start_reauth(hass)
+    await hass.async_block_till_done()
+    [flow] = hass.config_entries.flow.async_progress()
+
+    result = await hass.config_entries.flow.async_configure(
+        flow["flow_id"], user_input={CONF_AUTH_REDIRECT: REDIRECT}
+    )
+
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "wrong_account"
+    assert CONF_APM_TOKEN not in entry.data
+
 
-    # Initialize an options flow
-    await hass.config_entries.async_setup(entry.entry_id)
+async def test_options_flow(hass, entry):
+    """Test the request limits are stored as options."""
     result = await hass.config_entries.options.async_init(entry.entry_id)
 
-    # Verify that the first options step is a user form
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["step_id"] == "user"
+    assert result["type"] is FlowResultType.FORM
+    assert result["step_id"] == "init"
+    assert result["data_schema"]({})[CONF_MAX_WORKERS] == DEFAULT_MAX_WORKERS
 
-    # Enter some fake data into the form
     result = await hass.config_entries.options.async_configure(
         result["flow_id"],
-        user_input={platform: platform != SENSOR for platform in PLATFORMS},
+        user_input={CONF_MAX_WORKERS: 8, CONF_REQUESTS_PER_MINUTE: 120},
     )
 
-    # Verify that the flow finishes
-    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
-    assert result["title"] == "test_username"
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert entry.options == {CONF_MAX_WORKERS: 8, CONF_REQUESTS_PER_MINUTE: 120}
+
+
+async def test_options_flow_defaults_to_current_options(hass, entry):
+    """Test the form starts from the options already set."""
+    hass.config_entries.async_update_entry(
+        entry, options={CONF_MAX_WORKERS: 2, CONF_REQUESTS_PER_MINUTE: 10}
+    )
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+
+    assert result["data_schema"]({}) == {
+        CONF_MAX_WORKERS: 2,
+        CONF_REQUESTS_PER_MINUTE: 10,
+    }
+
+
+async def test_options_flow_bounds_limits(hass, entry):
+    """Test limits beyond what the executor supports are refused."""
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+
+    with pytest.raises(vol.Invalid):
+        result["data_schema"]({CONF_MAX_WORKERS: 17})
 
-    # Verify that the options were updated
-    assert entry.options == {BINARY_SENSOR: True, SENSOR: False, SWITCH: True}
+    with pytest.raises(vol.Invalid):
+        result["data_schema"]({CONF_REQUESTS_PER_MINUTE: 0})
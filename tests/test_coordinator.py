@@ -0,0 +1,139 @@
+"""Test the roster update coordinator."""
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock, call
+
+from apm_crewconnect import Roster
+from custom_components.apm.coordinator import (
+    UPDATE_INTERVAL_DAYS_OFF,
+    UPDATE_INTERVAL_DEFAULT,
+    UPDATE_INTERVAL_DUTY_SOON,
+    UPDATE_INTERVAL_ON_DUTY,
+)
+import pytest
+
+from .common import at, flight_activity, ground_activity, merge_roster, mock_apm_data
+
+
+@pytest.fixture(name="data")
+async def data_fixture(hass, freezer):
+    """Set up an account whose roster holds a single flight on the 2nd."""
+    await hass.config.async_set_time_zone("UTC")
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    flight = flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=1)
+
+    async def async_get_roster(start_date, end_date):
+        activities = [flight] if start_date <= date(2024, 1, 2) <= end_date else []
+
+        return Roster("123", start_date, end_date, activities)
+
+    data.async_get_roster = AsyncMock(side_effect=async_get_roster)
+
+    return data
+
+
+async def test_refresh_fetches_upcoming_window(hass, data):
+    """Test a refresh fetches the coming month and polls according to it."""
+    coordinator = data.coordinator
+
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    data.async_get_roster.assert_awaited_once_with(
+        date(2024, 1, 1), date(2024, 1, 31)
+    )
+    assert [activity.id for activity in coordinator.store] == [1]
+    assert coordinator.last_merge.added == list(coordinator.store)
+    assert coordinator.update_interval == UPDATE_INTERVAL_DEFAULT
+    data.cache.async_schedule_save.assert_called_once()
+
+
+async def test_refresh_failure(hass, data):
+    """Test the roster is kept when it can't be refreshed."""
+    data.async_get_roster.side_effect = TimeoutError
+
+    await data.coordinator.async_refresh()
+
+    assert not data.coordinator.last_update_success
+    assert not data.coordinator.last_merge
+
+
+@pytest.mark.parametrize(
+    ("start", "interval"),
+    [
+        (at(1, 8), UPDATE_INTERVAL_ON_DUTY),
+        (at(1, 20), UPDATE_INTERVAL_DUTY_SOON),
+        (at(2, 8), UPDATE_INTERVAL_DEFAULT),
+        (at(4, 8), UPDATE_INTERVAL_DAYS_OFF),
+    ],
+)
+async def test_polling_follows_duties(hass, data, start, interval):
+    """Test the roster is polled more often as the next duty gets closer."""
+    merge_roster(
+        data,
+        [
+            ground_activity(at(1), at(1, 7), "O", "OFF", id=1),
+            flight_activity(start, start + timedelta(hours=2), id=2, pairing_id=1),
+        ],
+    )
+
+    assert data.coordinator._adaptive_interval() == interval
+
+
+async def test_polling_without_duties(hass, data):
+    """Test the roster is polled least often without any upcoming duty."""
+    merge_roster(data, [ground_activity(at(1), at(3), "O", "OFF", id=1)])
+
+    assert data.coordinator._adaptive_interval() == UPDATE_INTERVAL_DAYS_OFF
+
+
+async def test_fetch_range_fetches_missing_parts(hass, data):
+    """Test only the parts of a range which weren't fetched yet are fetched."""
+    coordinator = data.coordinator
+    listener = MagicMock()
+    remove_listener = coordinator.async_add_listener(listener)
+
+    result = await coordinator.async_fetch_range(date(2024, 1, 1), date(2024, 1, 5))
+
+    assert [activity.id for activity in result.added] == [1]
+    assert coordinator.last_merge is result
+    listener.assert_called_once()
+
+    result = await coordinator.async_fetch_range(date(2024, 1, 3), date(2024, 1, 7))
+
+    assert not result
+    assert data.async_get_roster.await_args_list == [
+        call(date(2024, 1, 1), date(2024, 1, 5)),
+        call(date(2024, 1, 6), date(2024, 1, 7)),
+    ]
+    listener.assert_called_once()
+
+    remove_listener()
+
+
+async def test_stale_parts_are_revalidated(hass, data, freezer):
+    """Test stale parts are served and refreshed in the background.
+
+    Upcoming days go stale after an hour, past days only after a week.
+    """
+    coordinator = data.coordinator
+    await coordinator.async_fetch_range(date(2023, 12, 25), date(2024, 1, 5))
+    data.async_get_roster.reset_mock()
+
+    freezer.move_to(at(1, 8))
+    await coordinator.async_fetch_range(date(2023, 12, 25), date(2024, 1, 5))
+    await hass.async_block_till_done()
+
+    assert data.async_get_roster.await_args_list == [
+        call(date(2024, 1, 1), date(2024, 1, 5))
+    ]
+
+    freezer.move_to(at(9, 8))
+    data.async_get_roster.reset_mock()
+    data.async_get_roster.side_effect = TimeoutError
+    await coordinator.async_fetch_range(date(2023, 12, 25), date(2023, 12, 31))
+    await hass.async_block_till_done()
+
+    assert data.async_get_roster.await_args_list == [
+        call(date(2023, 12, 25), date(2023, 12, 31))
+    ]
@@ -0,0 +1,69 @@
+"""Test the coverage map of fetched date windows."""
+from datetime import date, datetime, timezone
+
+from custom_components.apm.util.coverage import CoverageInterval, CoverageMap
+
+EARLY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+LATE = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def test_gaps_of_empty_map():
+    """Test an empty map reports the whole window as a gap."""
+    coverage = CoverageMap()
+
+    assert not coverage
+    assert coverage.gaps(date(2024, 1, 1), date(2024, 1, 31)) == [
+        (date(2024, 1, 1), date(2024, 1, 31))
+    ]
+    assert not coverage.covers(date(2024, 1, 1), date(2024, 1, 1))
+
+
+def test_gaps_between_intervals():
+    """Test only the days not fetched are reported as gaps."""
+    coverage = CoverageMap()
+    coverage.add(date(2024, 1, 5), date(2024, 1, 10), EARLY)
+    coverage.add(date(2024, 1, 15), date(2024, 1, 20), EARLY)
+
+    assert coverage.gaps(date(2024, 1, 1), date(2024, 1, 31)) == [
+        (date(2024, 1, 1), date(2024, 1, 4)),
+        (date(2024, 1, 11), date(2024, 1, 14)),
+        (date(2024, 1, 21), date(2024, 1, 31)),
+    ]
+    assert coverage.covers(date(2024, 1, 6), date(2024, 1, 9))
+    assert not coverage.covers(date(2024, 1, 9), date(2024, 1, 16))
+
+
+def test_add_trims_older_intervals():
+    """Test a new fetch replaces the fetch time of the days it overlaps."""
+    coverage = CoverageMap()
+    coverage.add(date(2024, 1, 1), date(2024, 1, 31), EARLY)
+    coverage.add(date(2024, 1, 10), date(2024, 1, 20), LATE)
+
+    assert coverage.intervals == [
+        CoverageInterval(date(2024, 1, 1), date(2024, 1, 9), EARLY),
+        CoverageInterval(date(2024, 1, 10), date(2024, 1, 20), LATE),
+        CoverageInterval(date(2024, 1, 21), date(2024, 1, 31), EARLY),
+    ]
+
+
+def test_add_coalesces_adjacent_intervals():
+    """Test adjacent intervals fetched at the same time are joined."""
+    coverage = CoverageMap()
+    coverage.add(date(2024, 1, 1), date(2024, 1, 9), EARLY)
+    coverage.add(date(2024, 1, 10), date(2024, 1, 20), EARLY)
+
+    assert coverage.intervals == [
+        CoverageInterval(date(2024, 1, 1), date(2024, 1, 20), EARLY)
+    ]
+
+
+def test_stale():
+    """Test the days fetched before a time are reported, clipped to the window."""
+    coverage = CoverageMap()
+    coverage.add(date(2024, 1, 1), date(2024, 1, 9), EARLY)
+    coverage.add(date(2024, 1, 10), date(2024, 1, 20), LATE)
+
+    assert coverage.stale(date(2024, 1, 5), date(2024, 1, 15), LATE) == [
+        (date(2024, 1, 5), date(2024, 1, 9))
+    ]
+    assert coverage.stale(date(2024, 1, 12), date(2024, 1, 15), LATE) == []
@@ -0,0 +1,126 @@
+"""Test the executor running blocking APM calls."""
+import asyncio
+import threading
+
+import pytest
+from requests import Response
+from requests.exceptions import HTTPError
+
+from custom_components.apm.executor import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_REQUESTS_PER_MINUTE,
+    ApmExecutor,
+)
+
+
+def _overloaded():
+    response = Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "0"
+    raise HTTPError(response=response)
+
+
+async def test_runs_calls():
+    """Test calls run in the pool and speed the limiter back up."""
+    executor = ApmExecutor(2, 60)
+    executor.limiter.rate = 0.5
+
+    try:
+        assert await executor.async_run(lambda a, b: a + b, 1, 2) == 3
+    finally:
+        executor.shutdown()
+
+    assert executor.limiter.rate == 0.6
+
+
+async def test_overloaded_response_slows_down():
+    """Test an overloaded response halves the request rate."""
+    executor = ApmExecutor(2, 60)
+
+    try:
+        with pytest.raises(HTTPError):
+            await executor.async_run(_overloaded)
+    finally:
+        executor.shutdown()
+
+    assert executor.limiter.rate == 0.5
+
+
+async def test_limits_combine_across_entries():
+    """Test the most generous limits of any entry apply until it's released."""
+    executor = ApmExecutor(DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_MINUTE)
+    pool = executor._pool
+
+    executor.configure("first", 2, 30)
+    executor.configure("second", 8, 10)
+
+    assert executor._max_workers == 8
+    assert executor.limiter.max_rate == 0.5
+
+    executor.release("second")
+
+    assert executor._max_workers == 2
+    assert executor.limiter.max_rate == 0.5
+
+    executor.release("first")
+
+    assert executor._max_workers == DEFAULT_MAX_WORKERS
+    assert executor._pool is pool
+    executor.shutdown()
+
+
+async def test_reconfigure_with_calls_in_flight():
+    """Test changing the limits leaves running calls to finish on the same pool."""
+    executor = ApmExecutor(1, 600)
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    try:
+        call = asyncio.ensure_future(executor.async_run(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+
+        executor.configure("entry", 2, 600)
+        assert await executor.async_run(lambda: "next") == "next"
+
+        release.set()
+        assert await call == "done"
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+async def test_rate_follows_entries():
+    """Test the request rate is raised and lowered with the entries' limits."""
+    executor = ApmExecutor(DEFAULT_MAX_WORKERS, DEFAULT_REQUESTS_PER_MINUTE)
+
+    executor.configure("entry", DEFAULT_MAX_WORKERS, 120)
+
+    assert executor.limiter.max_rate == 2
+
+    executor.release("entry")
+
+    assert executor.limiter.max_rate == DEFAULT_REQUESTS_PER_MINUTE / 60
+    executor.shutdown()
+
+
+async def test_overloaded_without_retry_after():
+    """Test an overloaded response without a usable Retry-After still slows down."""
+    executor = ApmExecutor(2, 60)
+
+    def overloaded():
+        response = Response()
+        response.status_code = 503
+        response.headers["Retry-After"] = "tomorrow"
+        raise HTTPError(response=response)
+
+    try:
+        with pytest.raises(HTTPError):
+            await executor.async_run(overloaded)
+    finally:
+        executor.shutdown()
+
+    assert executor.limiter.rate == 0.5
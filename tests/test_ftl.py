@@ -0,0 +1,104 @@
+"""Test the rolling flight and duty time totals."""
+from datetime import date, timedelta
+
+from custom_components.apm.util.ftl import FlightTimeTotals, FtlTracker
+from custom_components.apm.util.roster_store import MergeResult
+
+from .common import at, flight_activity, ground_activity, hotel_activity
+
+
+def _flight(id, day, hour=8, hours=2, **fields):
+    return flight_activity(
+        at(day, hour), at(day, hour + hours), id=id, pairing_id=1, **fields
+    )
+
+
+def _hours(block, duty):
+    return FlightTimeTotals(timedelta(hours=block), timedelta(hours=duty))
+
+
+def test_totals_over_windows():
+    """Test totals only include the days of the window."""
+    ftl = FtlTracker()
+    ftl.reset([_flight(1, 1), _flight(2, 3, hours=3), _flight(3, 8)])
+
+    assert ftl.totals(date(2024, 1, 3), 1) == _hours(3, 3)
+    assert ftl.totals(date(2024, 1, 7), 7) == _hours(5, 5)
+    assert ftl.totals(date(2024, 1, 8), 7) == _hours(5, 5)
+    assert ftl.totals(date(2024, 1, 28), 28) == _hours(7, 7)
+    assert ftl.totals(date(2023, 12, 31), 7) == _hours(0, 0)
+
+
+def test_time_off_is_not_duty():
+    """Test days off, leave and layovers add neither block nor duty time."""
+    ftl = FtlTracker()
+    ftl.reset(
+        [
+            ground_activity(at(1), at(3), "O", "OFF", id=1),
+            ground_activity(at(3), at(5), "V", "CA", id=2),
+            hotel_activity(at(5, 12), at(6, 6), id=3),
+            ground_activity(at(6, 9), at(6, 17), id=4),
+        ]
+    )
+
+    assert ftl.totals(date(2024, 1, 7), 7) == _hours(0, 8)
+
+
+def test_duty_runs_from_check_in_to_check_out():
+    """Test legs sharing a duty period only count it once."""
+    ftl = FtlTracker()
+    check_in, check_out = at(2, 7), at(2, 15)
+    first = _flight(1, 2, hour=8, check_in=check_in, check_out=check_out)
+    second = _flight(2, 2, hour=11, check_in=check_in, check_out=check_out)
+    ftl.reset([first, second])
+
+    assert ftl.totals(date(2024, 1, 2), 1) == _hours(4, 8)
+
+    ftl.apply(MergeResult(removed=[first]))
+
+    assert ftl.totals(date(2024, 1, 2), 1) == _hours(2, 8)
+
+    ftl.apply(MergeResult(removed=[second]))
+
+    assert ftl.totals(date(2024, 1, 2), 1) == _hours(0, 0)
+
+
+def test_apply_updates_prefix_sums():
+    """Test merges update the totals, including days before the first one."""
+    ftl = FtlTracker()
+    original = _flight(1, 10)
+    ftl.reset([original])
+    ftl.totals(date(2024, 1, 10), 7)
+
+    changed = _flight(1, 10, hours=4)
+    ftl.apply(MergeResult(added=[_flight(2, 5)], changed=[changed]))
+
+    assert ftl.totals(date(2024, 1, 10), 7) == _hours(6, 6)
+    assert ftl.totals(date(2024, 1, 5), 1) == _hours(2, 2)
+
+
+def test_peak_totals():
+    """Test the peak totals cover every window including the day."""
+    ftl = FtlTracker()
+    ftl.reset([_flight(1, 1), _flight(2, 7, hours=5)])
+
+    assert ftl.peak_totals(date(2024, 1, 1), 7) == _hours(7, 7)
+    assert ftl.peak_totals(date(2024, 1, 8), 7) == _hours(5, 5)
+
+
+def test_empty_totals():
+    """Test totals are zero before any activity is known."""
+    ftl = FtlTracker()
+    ftl.reset([])
+
+    assert ftl.totals(date(2024, 1, 1), 7) == _hours(0, 0)
+
+
+def test_block_time_defaults_to_flight_time():
+    """Test flights without a block time count their scheduled time."""
+    flight = _flight(1, 1, hours=3)
+    flight.block_time = None
+    ftl = FtlTracker()
+    ftl.reset([flight])
+
+    assert ftl.totals(date(2024, 1, 1), 1) == _hours(3, 3)
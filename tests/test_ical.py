@@ -0,0 +1,152 @@
+"""Test the iCal export of the roster."""
+from datetime import date
+
+from apm_crewconnect import Roster
+from custom_components.apm.util.ical import (
+    CRLF,
+    MAX_LINE_OCTETS,
+    _line,
+    iCal,
+    render_event,
+)
+
+from .common import (
+    at,
+    deadhead_activity,
+    flight_activity,
+    ground_activity,
+    hotel_activity,
+    roster_activity,
+)
+
+
+def _crew(crew_code, role):
+    return {
+        "crewCode": crew_code,
+        "firstName": crew_code,
+        "lastName": crew_code,
+        "photoThumbnail": "",
+        "contractRoles": role,
+        "commander": False,
+    }
+
+
+def _unfold(text):
+    return text.replace(CRLF + " ", "")
+
+
+def test_short_line_is_not_folded():
+    """Test a line within the limit is returned as it is."""
+    assert _line("SUMMARY", "AF123") == "SUMMARY:AF123" + CRLF
+
+
+def test_long_line_is_folded():
+    """Test long lines are folded into lines of at most 75 octets."""
+    value = "x" * 200
+
+    line = _line("DESCRIPTION", value)
+
+    assert all(
+        len(part.encode()) <= MAX_LINE_OCTETS for part in line.split(CRLF)[:-1]
+    )
+    assert line.split(CRLF)[1].startswith(" ")
+    assert _unfold(line) == "DESCRIPTION:" + value + CRLF
+
+
+def test_folding_keeps_multibyte_characters_whole():
+    """Test folding never splits a UTF-8 sequence."""
+    value = "é" * 100
+
+    line = _line("SUMMARY", value)
+
+    assert all(
+        len(part.encode()) <= MAX_LINE_OCTETS for part in line.split(CRLF)[:-1]
+    )
+    assert _unfold(line) == "SUMMARY:" + value + CRLF
+
+
+def test_calendar_lines_and_chunks():
+    """Test the calendar wraps rendered events and chunks them in order."""
+    calendar = iCal.from_activities(
+        "123", [1, 2, 3], lambda activity: "" if activity == 2 else f"EV{activity}"
+    )
+
+    lines = list(calendar)
+
+    assert lines[0] == "BEGIN:VCALENDAR" + CRLF
+    assert lines[4] == "X-WR-RELCALID:CrewWebPlusCalendar-123" + CRLF
+    assert lines[5:] == ["EV1", "EV3", "END:VCALENDAR" + CRLF]
+    assert "".join(calendar.iter_chunks(chunk_size=10)) == calendar.to_str()
+    assert len(list(calendar.iter_chunks(chunk_size=10))) > 1
+
+
+def test_flight_event(freezer):
+    """Test a flight is exported with its route, role, aircraft and crew."""
+    freezer.move_to(at(1, 6))
+    flight = flight_activity(
+        at(2, 8),
+        at(2, 10),
+        id=2,
+        pairing_id=1,
+        remarks="Snacks",
+        crews=[_crew("AAA", "CDB"), _crew("BBB", "OPL"), _crew("CCC", "CC")],
+    )
+
+    assert _unfold(render_event("123", flight)).split(CRLF) == [
+        "BEGIN:VEVENT",
+        "UID:123#ActId:1#CmpId:2",
+        "DTSTAMP:20240101T060000Z",
+        "DTSTART;VALUE=DATE-TIME:20240102T080000Z",
+        "DTEND;VALUE=DATE-TIME:20240102T100000Z",
+        "STATUS:CONFIRMED",
+        "CATEGORIES:FLT",
+        "SUMMARY:AF7700 CDG-NCE(+0100)",
+        r"DESCRIPTION:FCT : OPL\nA/C : 73H\nBLK : 02:00\nCrew Member : "
+        r"T:AAA-BBB\nC:CCC\nRemark : Snacks",
+        "END:VEVENT",
+        "",
+    ]
+
+
+def test_other_events(freezer):
+    """Test deadheads and ground activities are exported with their summary."""
+    freezer.move_to(at(1, 6))
+    deadhead = deadhead_activity(at(2, 8), at(2, 10), id=3, remarks="Seat 1A")
+    office = ground_activity(at(3, 8), at(3, 12), id=4, description="Meeting")
+    simulator = ground_activity(at(4, 8), at(4, 12), "S", "SIM", details="Sim")
+    untyped = roster_activity("F", at(5, 8), at(5, 10), id=5, details="Positioning")
+
+    assert "SUMMARY:AF1234 CDG*NCE" + CRLF in render_event("123", deadhead)
+    assert r"DESCRIPTION:Remark : Seat 1A" + CRLF in render_event("123", deadhead)
+    assert "CATEGORIES:OFFI" + CRLF in render_event("123", office)
+    assert "SUMMARY: Meeting" + CRLF in render_event("123", office)
+    assert "SUMMARY: Sim" + CRLF in render_event("123", simulator)
+    assert "UID:123#ActId:-1#CmpId:5" + CRLF in render_event("123", untyped)
+    assert "CATEGORIES:" + CRLF in render_event("123", untyped)
+    assert "SUMMARY: Positioning" + CRLF in render_event("123", untyped)
+
+
+def test_hotels_and_requests_are_not_exported():
+    """Test hotel stays and pending requests have no event."""
+    hotel = hotel_activity(at(1, 12), at(2, 6), id=1)
+    request = ground_activity(at(3), at(4), "V", "CA", id=2, pendingRequest=True)
+
+    assert render_event("123", hotel) == ""
+    assert render_event("123", request) == ""
+
+
+def test_calendar_from_roster(tmp_path):
+    """Test a whole roster is exported, and saved to a file as it is."""
+    roster = Roster(
+        "123",
+        date(2024, 1, 1),
+        date(2024, 1, 2),
+        [flight_activity(at(1, 8), at(1, 10), id=1)],
+    )
+    calendar = iCal.from_roster(roster)
+    path = tmp_path / "roster.ics"
+
+    calendar.to_file(str(path))
+
+    assert "SUMMARY:AF7700 CDG-NCE(+0100)" + CRLF in str(calendar)
+    assert path.read_bytes().decode() == calendar.to_str()
@@ -1,63 +1,316 @@
-"""Test APM CrewConnect setup process."""
-import pytest
-from custom_components.apm import (
-    async_reload_entry,
-)
-from custom_components.apm import (
-    async_setup_entry,
-)
-from custom_components.apm import (
-    async_unload_entry,
-)
-from custom_components.apm import (
-    ApmDataUpdateCoordinator,
-)
+"""Test the setup of APM CrewConnect accounts and their APM calls."""
+from datetime import date, timedelta
+from functools import partial
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from apm_crewconnect import Roster
+from requests import Session
+from requests.exceptions import ConnectionError
+
+from custom_components.apm import SCHEDULE_HARD_TTL, SCHEDULE_SOFT_TTL
+from custom_components.apm.cache import ApmCache
 from custom_components.apm.const import (
+    CONF_APM_TOKEN,
+    CONF_MAX_WORKERS,
+    CONF_OKTA_TOKEN,
     DOMAIN,
 )
-from homeassistant.exceptions import ConfigEntryNotReady
-from pytest_homeassistant_custom_component.common import MockConfigEntry
-
-from .const import MOCK_CONFIG
-
-
-# We can pass fixtures as defined in conftest.py to tell pytest to use the fixture
-# for a given test. We can also leverage fixtures and mocks that are available in
-# Home Assistant using the pytest_homeassistant_custom_component plugin.
-# Assertions allow you to verify that the return value of whatever is on the left
-# side of the assertion matches with the right side.
-async def test_setup_unload_and_reload_entry(hass, bypass_get_data):
-    """Test entry setup and unload."""
-    # Create a mock entry so we don't have to go through config flow
-    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
-
-    # Set up the entry and assert that the values set during setup are where we expect
-    # them to be. Because we have patched the ApmDataUpdateCoordinator.async_get_data
-    # call, no code from custom_components/apm/api.py actually runs.
-    assert await async_setup_entry(hass, config_entry)
-    assert DOMAIN in hass.data and config_entry.entry_id in hass.data[DOMAIN]
-    assert (
-        type(hass.data[DOMAIN][config_entry.entry_id]) == ApmDataUpdateCoordinator
+from custom_components.apm.util.circuit_breaker import CircuitOpenError
+from custom_components.apm.util.roster_store import RosterStore
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_HOST, EVENT_HOMEASSISTANT_STOP
+from homeassistant.util.dt import utcnow
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from .common import at, flight_activity, schedule_flight
+
+HOST = "apm.example.com"
+
+
+def _token(name, expires_at):
+    return {"access_token": name, "expires_at": expires_at.timestamp()}
+
+
+class FakeApm:
+    """APM client serving a flight on the 2nd and the schedule of every day."""
+
+    user_id = "123"
+
+    def __init__(self, host, token_manager):
+        """Initialize the client with the tokens of the account."""
+        self.host = host
+        self.token_manager = token_manager
+        self.client = SimpleNamespace(
+            okta_client=SimpleNamespace(session=Session()),
+            refresh_token=MagicMock(),
+        )
+        self.get_roster = MagicMock(side_effect=self._roster)
+        self.get_flight_schedule = MagicMock(side_effect=self._flight_schedule)
+
+    def _roster(self, start_date, end_date):
+        flight = flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=1)
+        activities = [flight] if start_date <= date(2024, 1, 2) <= end_date else []
+
+        return Roster(self.user_id, start_date, end_date, activities)
+
+    def _flight_schedule(self, start_date, end_date):
+        return [
+            schedule_flight(at(day.day, 8), leg_id=day.day)
+            for day in (
+                start_date + timedelta(days=offset)
+                for offset in range((end_date - start_date).days + 1)
+            )
+        ]
+
+
+@pytest.fixture(name="entry")
+async def entry_fixture(hass, enable_custom_integrations, freezer):
+    """Add an account with tokens valid until noon on the 1st."""
+    await hass.config.async_set_time_zone("UTC")
+    freezer.move_to(at(1, 6))
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=f"{HOST}_123",
+        data={
+            CONF_HOST: HOST,
+            CONF_APM_TOKEN: _token("apm", at(1, 12)),
+            CONF_OKTA_TOKEN: _token("okta", at(1, 18)),
+        },
+    )
+    entry.add_to_hass(hass)
+
+    # The roster history of the sensors is fetched without waiting on the limiter
+    with patch("custom_components.apm.Apm", FakeApm), patch(
+        "custom_components.apm.CHUNK_RETRY_DELAY", 0
+    ), patch("custom_components.apm.executor.REQUEST_BURST", 100):
+        yield entry
+
+
+async def _setup(hass, entry):
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    return hass.data[DOMAIN][entry.entry_id]
+
+
+async def test_setup_and_unload(hass, entry):
+    """Test an account is set up with its entities, and fully unloaded."""
+    data = await _setup(hass, entry)
+
+    assert entry.state is ConfigEntryState.LOADED
+    assert isinstance(data.apm, FakeApm)
+    assert [activity.id for activity in data.coordinator.store] == [1]
+    assert hass.states.get("calendar.apm_roster_123") is not None
+    assert hass.states.get("sensor.apm_block_time_28d_123") is not None
+    assert hass.services.has_service(DOMAIN, "find_unstaffed_flights")
+    assert data._unsub_token_refresh is not None
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+    assert entry.state is ConfigEntryState.NOT_LOADED
+    assert entry.entry_id not in hass.data[DOMAIN]
+    assert data._unsub_token_refresh is None
+
+
+async def test_setup_from_cache(hass, hass_storage, entry):
+    """Test a cached roster is served straight away and refreshed after."""
+    store = RosterStore()
+    store.merge(
+        Roster(
+            "123",
+            date(2024, 1, 1),
+            date(2024, 1, 31),
+            [flight_activity(at(3, 8), at(3, 10), id=2, pairing_id=2)],
+        ),
+        at(1),
+    )
+    hass_storage[f"apm.{entry.entry_id}"] = {
+        "version": 1,
+        "minor_version": 1,
+        "key": f"apm.{entry.entry_id}",
+        "data": ApmCache(hass, entry.entry_id, store)._data_to_save(),
+    }
+
+    data = await _setup(hass, entry)
+
+    assert [activity.id for activity in data.coordinator.store] == [1]
+    data.apm.get_roster.assert_any_call(date(2024, 1, 1), date(2024, 1, 31))
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_no_token_refresh_without_tokens(hass, entry):
+    """Test no refresh is scheduled for an account without any token."""
+    hass.config_entries.async_update_entry(entry, data={CONF_HOST: HOST})
+
+    data = await _setup(hass, entry)
+
+    assert data.token_manager.expires_at() is None
+    assert data._unsub_token_refresh is None
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_options_reload_the_entry(hass, entry):
+    """Test changed options reload the entry, while token writes don't."""
+    data = await _setup(hass, entry)
+
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CONF_APM_TOKEN: _token("new", at(1, 12))}
+    )
+    await hass.async_block_till_done()
+
+    assert hass.data[DOMAIN][entry.entry_id] is data
+
+    hass.config_entries.async_update_entry(entry, options={CONF_MAX_WORKERS: 2})
+    await hass.async_block_till_done()
+
+    assert hass.data[DOMAIN][entry.entry_id] is not data
+    assert hass.data[DOMAIN][entry.entry_id].options == {CONF_MAX_WORKERS: 2}
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_remove_entry_removes_cache(hass, hass_storage, entry):
+    """Test the cached roster of an account is removed along with it."""
+    await _setup(hass, entry)
+    hass_storage[f"apm.{entry.entry_id}"] = {"version": 1, "data": {}}
+
+    await hass.config_entries.async_remove(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert f"apm.{entry.entry_id}" not in hass_storage
+
+
+async def test_tokens_are_saved(hass, entry):
+    """Test tokens written by the client are saved once, or flushed on stop."""
+    data = await _setup(hass, entry)
+    token_manager = data.token_manager
+    apm_token = _token("apm2", at(1, 14))
+
+    assert token_manager.has("apm")
+    assert token_manager.expires_at() == at(1, 12)
+
+    await hass.async_add_executor_job(
+        partial(token_manager.set, key="apm", value=apm_token)
     )
+    await hass.async_block_till_done()
+
+    assert token_manager.get("apm") == apm_token
+    assert entry.data[CONF_APM_TOKEN]["access_token"] == "apm"
+
+    async_fire_time_changed(hass, utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
 
-    # Reload the entry and assert that the data from above is still there
-    assert await async_reload_entry(hass, config_entry) is None
-    assert DOMAIN in hass.data and config_entry.entry_id in hass.data[DOMAIN]
-    assert (
-        type(hass.data[DOMAIN][config_entry.entry_id]) == ApmDataUpdateCoordinator
+    assert entry.data[CONF_APM_TOKEN] == apm_token
+
+    okta_token = _token("okta2", at(1, 20))
+    await hass.async_add_executor_job(
+        partial(token_manager.set, value={"apm": apm_token, "okta": okta_token})
     )
+    await hass.async_block_till_done()
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+
+    assert entry.data[CONF_OKTA_TOKEN] == okta_token
+    assert token_manager.get() == {"apm": apm_token, "okta": okta_token}
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_long_roster_is_fetched_in_chunks(hass, entry):
+    """Test long ranges are fetched as chunks, each retried on its own."""
+    data = await _setup(hass, entry)
+    get_roster = data.apm.get_roster
+    get_roster.reset_mock()
+    failures = iter([ConnectionError])
+
+    def flaky_roster(start_date, end_date):
+        if start_date == date(2024, 2, 1) and (error := next(failures, None)):
+            raise error
+
+        return data.apm._roster(start_date, end_date)
+
+    get_roster.side_effect = flaky_roster
+
+    roster = await data.async_get_roster(date(2024, 1, 1), date(2024, 3, 15))
+
+    assert (roster.start, roster.end) == (date(2024, 1, 1), date(2024, 3, 15))
+    assert [activity.id for activity in roster.activities] == [1]
+    assert get_roster.call_count == 4
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_failing_chunk_gives_up(hass, entry):
+    """Test a chunk failing every retry fails the whole fetch."""
+    data = await _setup(hass, entry)
+    data.apm.get_roster.reset_mock()
+    data.apm.get_roster.side_effect = ConnectionError
+
+    with pytest.raises(ConnectionError):
+        await data.async_get_roster(date(2024, 2, 1), date(2024, 2, 5))
+
+    assert data.apm.get_roster.call_count == 3
+
+    with pytest.raises(CircuitOpenError):
+        await data.async_get_roster(date(2024, 2, 1), date(2024, 2, 5))
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_errors_of_responses_leave_the_circuit_closed(hass, entry):
+    """Test errors telling nothing about APM's health don't open the circuit."""
+    data = await _setup(hass, entry)
+    data.apm.get_roster.side_effect = ValueError
+
+    for _ in range(4):
+        with pytest.raises(ValueError):
+            await data.async_get_roster(date(2024, 2, 1), date(2024, 2, 5))
+
+    await hass.config_entries.async_unload(entry.entry_id)
+
+
+async def test_flight_schedule_is_cached(hass, entry, freezer, caplog):
+    """Test the flight schedule is served from cache, refreshed as it ages."""
+    data = await _setup(hass, entry)
+    get_flight_schedule = data.apm.get_flight_schedule
+
+    flights = await data.async_get_flight_schedule(date(2024, 1, 1))
+    index = await data.async_get_schedule_index(date(2024, 1, 1), date(2024, 1, 2))
+    columns = await data.async_get_schedule_columns(date(2024, 1, 1), date(2024, 1, 2))
+
+    assert [flight.leg_id for flight in flights] == [1]
+    assert len(index.departing(date(2024, 1, 1), date(2024, 1, 2))) == 2
+    assert len(columns) == 2
+    assert get_flight_schedule.call_args_list == [
+        ((date(2024, 1, 1), date(2024, 1, 1)),),
+        ((date(2024, 1, 2), date(2024, 1, 2)),),
+    ]
+
+    # Stale days are served while they're refreshed in the background
+    freezer.tick(SCHEDULE_SOFT_TTL + timedelta(seconds=1))
+    get_flight_schedule.side_effect = ConnectionError
+    await data.async_get_flight_schedule(date(2024, 1, 1))
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert get_flight_schedule.call_count == 5
+    assert "Unable to revalidate flight schedule" in caplog.text
 
-    # Unload the entry and verify that the data has been removed
-    assert await async_unload_entry(hass, config_entry)
-    assert config_entry.entry_id not in hass.data[DOMAIN]
+    # Expired days are served when APM can't be reached, missing ones can't be
+    freezer.tick(SCHEDULE_HARD_TTL)
+    data._breaker.record_success()
+    flights = await data.async_get_flight_schedule(date(2024, 1, 1))
 
+    assert [flight.leg_id for flight in flights] == [1]
+    assert "using flight schedule fetched at" in caplog.text
 
-async def test_setup_entry_exception(hass, error_on_get_data):
-    """Test ConfigEntryNotReady when API raises an exception during entry setup."""
-    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_CONFIG, entry_id="test")
+    with pytest.raises(CircuitOpenError):
+        await data.async_get_flight_schedule(date(2024, 1, 5))
 
-    # In this case we are testing the condition where async_setup_entry raises
-    # ConfigEntryNotReady using the `error_on_get_data` fixture which simulates
-    # an error.
-    with pytest.raises(ConfigEntryNotReady):
-        assert await async_setup_entry(hass, config_entry)
+    await hass.config_entries.async_unload(entry.entry_id)
@@ -0,0 +1,41 @@
+"""Test the matching of open flights against free roster time."""
+from datetime import timedelta
+
+from custom_components.apm.util.open_time import busy_periods, fitting_flights
+
+from .common import at, flight_activity, schedule_flight
+
+REST = timedelta(hours=2)
+
+
+def _activity(day, hour, hours=2):
+    return flight_activity(at(day, hour), at(day, hour + hours))
+
+
+def test_busy_periods_merge_overlapping_rest():
+    """Test activities closer than twice the rest form one busy period."""
+    periods = busy_periods([_activity(1, 8), _activity(1, 13), _activity(2, 8)], REST)
+
+    assert periods == [(at(1, 6), at(1, 17)), (at(2, 6), at(2, 12))]
+
+
+def test_fitting_flights():
+    """Test only flights leaving the rest around activities fit."""
+    activities = [_activity(1, 10), _activity(2, 10)]
+    too_close = schedule_flight(at(1, 6), hours=3)
+    before = schedule_flight(at(1, 5))
+    after = schedule_flight(at(1, 14))
+    overlapping = schedule_flight(at(2, 9))
+    later = schedule_flight(at(3, 9))
+
+    assert fitting_flights(
+        activities, [before, too_close, after, overlapping, later], REST
+    ) == [before, after, later]
+
+
+def test_fitting_flights_from_home_base():
+    """Test a home base only keeps the flights departing from it."""
+    home = schedule_flight(at(1, 8), origin="ORY")
+    away = schedule_flight(at(1, 12))
+
+    assert fitting_flights([], [home, away], REST, "ORY") == [home]
@@ -0,0 +1,109 @@
+"""Test the pairing index over roster activities."""
+from datetime import timedelta
+
+from custom_components.apm.util.pairings import PairingIndex
+from custom_components.apm.util.roster_store import MergeResult
+
+from .common import (
+    at,
+    deadhead_activity,
+    flight_activity,
+    ground_activity,
+    hotel_activity,
+)
+
+
+def _leg(
+    id, pairing_id, day, hour, origin, destination, parse=flight_activity, **fields
+):
+    return parse(
+        at(day, hour),
+        at(day, hour + 2),
+        origin,
+        destination,
+        id=id,
+        pairing_id=pairing_id,
+        **fields,
+    )
+
+
+def _hotel(id, pairing_id, day):
+    return hotel_activity(at(day, 12), at(day + 1, 6), id=id, pairing_id=pairing_id)
+
+
+def test_pairing_route_layovers_and_block_time():
+    """Test a trip reports its route, layovers and flown block time."""
+    index = PairingIndex()
+    index.reset(
+        [
+            _leg(1, 7, 1, 8, "CDG", "NCE"),
+            _hotel(2, 7, 1),
+            _leg(3, 7, 2, 8, "NCE", "ORY", block_time=timedelta(hours=1)),
+            _leg(4, 7, 2, 12, "ORY", "CDG", deadhead_activity),
+        ]
+    )
+
+    pairing = index.get(7)
+
+    assert pairing.is_trip
+    assert pairing.route == ["CDG", "NCE", "ORY", "CDG"]
+    assert pairing.layovers == [("NCE", at(1, 12), at(2, 6))]
+    assert pairing.block_time == timedelta(hours=3)
+    assert (pairing.report, pairing.release) == (at(1, 8), at(2, 14))
+    assert pairing.as_dict()["route"] == ["CDG", "NCE", "ORY", "CDG"]
+
+
+def test_pairing_reports_at_check_in():
+    """Test a trip starts when the crew checks in for its first leg."""
+    index = PairingIndex()
+    index.reset(
+        [
+            _leg(1, 7, 1, 8, "CDG", "NCE", check_in=at(1, 7)),
+            _leg(2, 7, 1, 12, "NCE", "CDG"),
+        ]
+    )
+
+    assert index.get(7).report == at(1, 7)
+    assert index.current_or_next(at(1, 7)).pairing_id == 7
+
+
+def test_apply_regroups_touched_pairings():
+    """Test merges add to, change and remove pairings."""
+    index = PairingIndex()
+    first, second = _leg(1, 7, 1, 8, "CDG", "NCE"), _leg(2, 7, 1, 12, "NCE", "CDG")
+    other = _leg(3, 8, 3, 8, "CDG", "LYS")
+    index.reset([first, other])
+
+    index.apply(MergeResult(added=[second]))
+
+    assert index.get(7).activities == (first, second)
+
+    changed = _leg(2, 7, 1, 12, "NCE", "ORY")
+    index.apply(MergeResult(changed=[changed]))
+
+    assert index.get(7).route == ["CDG", "NCE", "ORY"]
+
+    index.apply(MergeResult(removed=[other]))
+
+    assert index.get(8) is None
+    assert index.get(7).activities == (first, changed)
+
+
+def test_trip_lookups():
+    """Test range lookups only return trips, in report order."""
+    index = PairingIndex()
+    long = _leg(1, 1, 1, 8, "CDG", "NCE")
+    long_return = _leg(2, 1, 4, 8, "NCE", "CDG")
+    short = _leg(3, 2, 2, 8, "ORY", "LYS")
+    later = _leg(4, 3, 6, 8, "CDG", "NCE")
+    ground = ground_activity(at(3, 9), at(3, 17), id=5, pairing_id=4)
+    index.reset([later, long, short, long_return, ground])
+
+    assert [trip.pairing_id for trip in index.overlapping(at(3), at(7))] == [1, 3]
+    assert [trip.pairing_id for trip in index.overlapping(at(2), at(3))] == [1, 2]
+    assert index.current_or_next(at(2, 12)).pairing_id == 1
+    assert index.current_or_next(at(4, 12)).pairing_id == 3
+    assert index.current_or_next(at(7)) is None
+    assert not index.get(4).is_trip
+
+    assert index.get(4).route == []
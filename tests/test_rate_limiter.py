@@ -0,0 +1,61 @@
+"""Test the adaptive token bucket rate limiter."""
+from unittest.mock import patch
+
+from custom_components.apm.util.rate_limiter import TokenBucket
+
+
+def test_backoff_and_recover():
+    """Test the rate halves on overload and recovers in steps."""
+    bucket = TokenBucket(rate=1, capacity=5, min_rate=0.2)
+
+    bucket.backoff()
+    bucket.backoff()
+    bucket.backoff()
+
+    assert bucket.rate == 0.2
+
+    for _ in range(20):
+        bucket.recover()
+
+    assert bucket.rate == 1
+
+
+def test_configure_applies_new_rate():
+    """Test a new configured rate replaces any slowdown."""
+    bucket = TokenBucket(rate=1, capacity=5, min_rate=0.2)
+    bucket.backoff()
+
+    bucket.configure(2)
+
+    assert (bucket.rate, bucket.max_rate) == (2, 2)
+
+
+def test_delay_follows_tokens_and_pause():
+    """Test requests wait for a token, or for a pause to end."""
+    with patch("custom_components.apm.util.rate_limiter.time.monotonic") as clock:
+        clock.return_value = 100
+        bucket = TokenBucket(rate=1, capacity=1, min_rate=0.1)
+
+        assert bucket._delay() == 0
+
+        bucket._tokens = 0
+
+        assert bucket._delay() == 1
+
+        bucket.backoff(retry_after=30)
+
+        assert bucket._delay() == 30
+
+        clock.return_value = 131
+
+        assert bucket._delay() == 0
+
+
+async def test_acquire_takes_token():
+    """Test acquiring uses up a token."""
+    bucket = TokenBucket(rate=1, capacity=2, min_rate=0.1)
+
+    await bucket.async_acquire()
+    await bucket.async_acquire()
+
+    assert bucket._tokens < 1
@@ -0,0 +1,252 @@
+"""Test the roster store and its merge engine."""
+from datetime import date
+
+from custom_components.apm.util.roster_store import (
+    MergeResult,
+    RosterStore,
+    RosterWindow,
+    activity_fingerprint,
+    activity_key,
+    is_duty,
+)
+
+from .common import at, flight_activity, ground_activity, hotel_activity
+
+FETCHED_AT = at(1)
+REFETCHED_AT = at(2)
+
+
+def _window(start_day, end_day, activities):
+    return RosterWindow(
+        "123", date(2024, 1, start_day), date(2024, 1, end_day), activities
+    )
+
+
+def _flight(id, day, hour=8, hours=2, **fields):
+    return flight_activity(
+        at(day, hour), at(day, hour + hours), id=id, pairing_id=1, **fields
+    )
+
+
+def test_merge_into_empty_store():
+    """Test a first merge adds every activity, in start order."""
+    store = RosterStore()
+    later, earlier = _flight(2, 3), _flight(1, 2)
+
+    result = store.merge(_window(1, 5, [later, earlier]), FETCHED_AT)
+
+    assert result.added == [earlier, later]
+    assert not result.removed and not result.changed
+    assert store.activities == [earlier, later]
+    assert store.user_id == "123"
+    assert (store.start, store.end) == (date(2024, 1, 1), date(2024, 1, 5))
+    assert store.coverage.covers(date(2024, 1, 1), date(2024, 1, 5))
+    assert store.changed_at == FETCHED_AT
+
+
+def test_merge_reports_changes_and_removals():
+    """Test a refetched window replaces the activities it overlaps."""
+    store = RosterStore()
+    kept, changed, removed = _flight(1, 2), _flight(2, 3), _flight(3, 4)
+    store.merge(_window(1, 5, [kept, changed, removed]), FETCHED_AT)
+
+    unchanged = _flight(1, 2)
+    updated = _flight(2, 3, details="Delayed")
+    added = _flight(4, 5)
+    result = store.merge(_window(1, 5, [unchanged, updated, added]), REFETCHED_AT)
+
+    assert result.added == [added]
+    assert result.changed == [updated]
+    assert result.removed == [removed]
+    assert store.activities == [unchanged, updated, added]
+    assert store.changed_at == REFETCHED_AT
+
+
+def test_merge_keeps_activities_outside_window():
+    """Test activities outside a refetched window are left untouched."""
+    store = RosterStore()
+    before, inside, after = _flight(1, 1), _flight(2, 10), _flight(3, 20)
+    store.merge(_window(1, 31, [before, inside, after]), FETCHED_AT)
+
+    result = store.merge(_window(5, 15, []), REFETCHED_AT)
+
+    assert result.removed == [inside]
+    assert store.activities == [before, after]
+
+
+def test_merge_replaces_activity_spanning_window_start():
+    """Test an activity starting before the window but ending in it is replaced."""
+    store = RosterStore()
+    spanning = _flight(1, 4, hour=20, hours=10)
+    store.merge(_window(1, 10, [spanning]), FETCHED_AT)
+
+    result = store.merge(_window(5, 10, []), REFETCHED_AT)
+
+    assert result.removed == [spanning]
+    assert not store.activities
+
+
+def test_merge_without_changes_keeps_changed_at():
+    """Test a merge changing nothing doesn't move the change time."""
+    store = RosterStore()
+    store.merge(_window(1, 5, [_flight(1, 2)]), FETCHED_AT)
+
+    result = store.merge(_window(1, 5, [_flight(1, 2)]), REFETCHED_AT)
+
+    assert not result
+    assert store.changed_at == FETCHED_AT
+
+
+def test_merge_result_extend():
+    """Test merge results are folded together."""
+    first, second = _flight(1, 1), _flight(2, 2)
+    result = MergeResult(added=[first])
+
+    result.extend(MergeResult(removed=[second], changed=[first]))
+
+    assert result
+    assert result == MergeResult(added=[first], removed=[second], changed=[first])
+    assert not MergeResult()
+
+
+def test_range_lookups():
+    """Test range lookups only return the matching activities."""
+    store = RosterStore()
+    long = _flight(1, 1, hour=0, hours=72)
+    short = _flight(2, 2, hour=8)
+    late = _flight(3, 5, hour=8)
+    store.merge(_window(1, 5, [long, short, late]), FETCHED_AT)
+
+    assert store.in_range(at(2), at(3)) == [short]
+    assert store.overlapping(at(3, 12), at(5)) == [long]
+    assert store.has_overlap(at(2, 9), at(2, 10))
+    assert not store.has_overlap(at(4), at(5))
+    assert store.current_or_next(at(4)) == late
+    assert store.next_after(at(1, 12)) == short
+    assert store.next_after(at(6)) is None
+
+
+def test_duty_lookups_skip_time_off():
+    """Test days off and layovers are skipped when looking for duties."""
+    store = RosterStore()
+    hotel = hotel_activity(at(1, 12), at(2, 6), id=1)
+    off = ground_activity(at(2), at(5), "O", "OFF", id=2)
+    ground = ground_activity(at(5, 9), at(5, 17), id=3)
+    store.merge(_window(1, 5, [hotel, off, ground]), FETCHED_AT)
+
+    assert [is_duty(activity) for activity in store] == [False, False, True]
+    assert store.has_overlap(at(3), at(4))
+    assert not store.has_overlap(at(3), at(4), is_duty)
+    assert store.next_after(at(1, 18)) == off
+    assert store.next_after(at(1, 18), is_duty) == ground
+    assert store.next_after(at(5, 10), is_duty) is None
+
+
+def test_observers_follow_merges_and_restores():
+    """Test observers are reset on restore and applied each merge."""
+
+    class Observer:
+        def __init__(self):
+            self.activities = None
+            self.results = []
+
+        def reset(self, activities):
+            self.activities = list(activities)
+
+        def apply(self, result):
+            self.results.append(result)
+
+    store = RosterStore()
+    observer = Observer()
+    store.observe(observer)
+    flight = _flight(1, 2)
+
+    result = store.merge(_window(1, 5, [flight]), FETCHED_AT)
+
+    assert observer.activities == []
+    assert observer.results == [result]
+
+    restored = RosterStore()
+    restored.observe(observer)
+    restored.restore("123", [flight], store.coverage.intervals)
+
+    assert observer.activities == [flight]
+    assert restored.coverage.covers(date(2024, 1, 1), date(2024, 1, 5))
+
+
+def test_memo_invalidated_by_changes():
+    """Test memoized values are rebuilt only for changed activities."""
+    store = RosterStore()
+    built = []
+    memo = store.memo(lambda activity: built.append(activity) or activity.details)
+    store.merge(_window(1, 5, [_flight(1, 2), _flight(2, 3)]), FETCHED_AT)
+
+    for activity in store:
+        memo.get(activity)
+    for activity in store:
+        memo.get(activity)
+
+    assert len(built) == 2
+
+    store.merge(
+        _window(1, 5, [_flight(1, 2), _flight(2, 3, details="Delayed")]), REFETCHED_AT
+    )
+
+    assert [memo.get(activity) for activity in store] == ["", "Delayed"]
+    assert len(built) == 3
+
+
+def test_restore_clears_memos():
+    """Test memoized values are dropped when the store is restored."""
+    store = RosterStore()
+    memo = store.memo(lambda activity: activity.details)
+    flight = _flight(1, 2)
+    store.merge(_window(1, 5, [flight]), FETCHED_AT)
+    memo.get(flight)
+
+    assert len(memo) == 1
+
+    store.restore("123", [flight], store.coverage.intervals)
+
+    assert len(memo) == 0
+    assert len(store) == 1
+    assert store.loaded
+
+
+def test_fingerprints_and_keys():
+    """Test activities are told apart by ID, and fingerprinted with their crew."""
+    crew = {
+        "crewCode": "AAA",
+        "firstName": "A",
+        "lastName": "A",
+        "photoThumbnail": "",
+        "contractRoles": "CDB",
+        "commander": True,
+    }
+    flight = _flight(1, 2, crews=[crew])
+    other_crew = _flight(1, 2, crews=[{**crew, "crewCode": "BBB"}])
+    store = RosterStore()
+
+    assert not store.loaded
+    assert store.fingerprint(flight) == activity_fingerprint(flight)
+    assert store.fingerprint(flight) != activity_fingerprint(other_crew)
+    assert activity_key(flight) == activity_key(other_crew)
+
+    # Activities without an ID are told apart by their type, pairing and start
+    flight.id = None
+
+    assert activity_key(flight) == ("FlightActivity", 1, None, at(2, 8))
+
+
+def test_roster_window_combine():
+    """Test rosters of consecutive windows are joined without duplicates."""
+    spanning = _flight(2, 5, hour=22, hours=4)
+    combined = RosterWindow.combine(
+        [
+            _window(1, 5, [_flight(1, 1), spanning]),
+            _window(6, 10, [_flight(2, 5, hour=22, hours=4), _flight(3, 8)]),
+        ]
+    )
+
+    assert (combined.start, combined.end) == (date(2024, 1, 1), date(2024, 1, 10))
+    assert [activity.id for activity in combined.activities] == [1, 2, 3]
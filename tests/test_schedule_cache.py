@@ -0,0 +1,91 @@
+"""Test the day-keyed flight schedule cache."""
+from datetime import date, timedelta
+
+from custom_components.apm.cache import ApmScheduleCache
+from custom_components.apm.util.schedule_cache import FlightScheduleCache
+from homeassistant.util.dt import now
+
+from .common import at, schedule_flight
+
+ROLES = ("CDB", "OPL", "CC", "CA")
+ACFT_TYPES = ("73H", "32N")
+
+
+def test_add_splits_range_into_days():
+    """Test a fetched range is cached day by day, empty days included."""
+    cache = FlightScheduleCache(ROLES, ACFT_TYPES)
+    first, second = schedule_flight(at(1, 8)), schedule_flight(at(3, 8))
+
+    cache.add(date(2024, 1, 1), date(2024, 1, 3), [second, first], at(1))
+
+    assert [day.day for day in cache] == [
+        date(2024, 1, 1),
+        date(2024, 1, 2),
+        date(2024, 1, 3),
+    ]
+    assert cache.flights(date(2024, 1, 1), date(2024, 1, 3)) == [first, second]
+    assert cache.flights(date(2024, 1, 2), date(2024, 1, 2)) == []
+    assert cache.covers(date(2024, 1, 1), date(2024, 1, 3))
+    assert not cache.covers(date(2024, 1, 1), date(2024, 1, 4))
+
+
+def test_missing_and_oldest():
+    """Test days missing or fetched before a time are reported as runs."""
+    cache = FlightScheduleCache(ROLES, ACFT_TYPES)
+    cache.add(date(2024, 1, 1), date(2024, 1, 2), [], at(1))
+    cache.add(date(2024, 1, 4), date(2024, 1, 4), [], at(2))
+
+    assert cache.missing(date(2024, 1, 1), date(2024, 1, 5), at(2)) == [
+        (date(2024, 1, 1), date(2024, 1, 3)),
+        (date(2024, 1, 5), date(2024, 1, 5)),
+    ]
+    assert cache.oldest(date(2024, 1, 1), date(2024, 1, 5)) == at(1)
+    assert cache.oldest(date(2024, 1, 5), date(2024, 1, 6)) is None
+
+
+def test_refetch_replaces_day():
+    """Test a refetched day replaces the flights cached for it."""
+    cache = FlightScheduleCache(ROLES, ACFT_TYPES)
+    cache.add(date(2024, 1, 1), date(2024, 1, 1), [schedule_flight(at(1, 8))], at(1))
+    flight = schedule_flight(at(1, 9))
+
+    cache.add(date(2024, 1, 1), date(2024, 1, 1), [flight], at(2))
+
+    assert cache.flights(date(2024, 1, 1), date(2024, 1, 1)) == [flight]
+
+
+def test_prune_drops_expired_past_days():
+    """Test only past days fetched before the given time are dropped."""
+    cache = FlightScheduleCache(ROLES, ACFT_TYPES)
+    cache.add(date(2024, 1, 1), date(2024, 1, 1), [schedule_flight(at(1, 8))], at(1))
+    fresh = schedule_flight(at(2, 8))
+    cache.add(date(2024, 1, 2), date(2024, 1, 2), [fresh], at(5))
+    upcoming = schedule_flight(at(9, 8))
+    cache.add(date(2024, 1, 9), date(2024, 1, 9), [upcoming], at(1))
+    cache.columns(date(2024, 1, 1), date(2024, 1, 9))
+
+    cache.prune(date(2024, 1, 5), at(3))
+
+    assert [day.day for day in cache] == [date(2024, 1, 2), date(2024, 1, 9)]
+    assert cache.flights(date(2024, 1, 1), date(2024, 1, 9)) == [fresh, upcoming]
+    assert len(cache.columns(date(2024, 1, 1), date(2024, 1, 9))) == 2
+
+
+async def test_only_recent_days_are_persisted(hass):
+    """Test past days are kept in memory but not written to storage."""
+    cache = ApmScheduleCache(hass, "apm.example.com")
+    today = now().date()
+    past = schedule_flight(now() - timedelta(days=10))
+    cache.schedules.add(
+        today - timedelta(days=10), today, [past], now() - timedelta(hours=1)
+    )
+
+    saved = cache._data_to_save()
+
+    assert [day["day"] for day in saved["schedules"]] == [
+        (today - timedelta(days=1)).isoformat(),
+        today.isoformat(),
+    ]
+    assert cache.schedules.flights(
+        today - timedelta(days=10), today - timedelta(days=10)
+    ) == [past]
@@ -0,0 +1,99 @@
+"""Test the columnar staffing analytics of the flight schedule."""
+from datetime import date
+
+import numpy as np
+
+from custom_components.apm.util.schedule_columns import (
+    ScheduleColumns,
+    staffing_heatmap,
+)
+
+from .common import at, crew_member, schedule_flight
+
+ROLES = ("CDB", "OPL", "CA")
+ACFT_TYPES = ("73H", "32N")
+
+
+def _columns(day, flights):
+    return ScheduleColumns.from_flights(
+        date(2024, 1, day), flights, ROLES, ACFT_TYPES
+    )
+
+
+def test_columns_count_required_and_assigned_seats():
+    """Test each flight's required and assigned crew are counted per role."""
+    flight = schedule_flight(
+        at(1, 6),
+        crew_members=[
+            crew_member("AAA", "CDB"),
+            crew_member("III", "IPL"),
+            crew_member("CCC", "CA"),
+            crew_member("SSS", "SOL"),
+        ],
+    )
+    other = schedule_flight(at(1, 8), "359", crew_members=[crew_member("AAA", "CDB")])
+
+    columns = _columns(1, [flight, other])
+
+    assert len(columns) == 2
+    assert columns.required.tolist() == [[1, 1, 3], [0, 0, 0]]
+    assert columns.assigned.tolist() == [[1, 1, 1], [1, 0, 0]]
+    assert columns.missing.tolist() == [[0, 0, 2], [0, 0, 0]]
+
+
+def test_heatmap_sums_per_day_type_and_role():
+    """Test the heatmap sums seats per day, aircraft type and role."""
+    columns = ScheduleColumns.concatenate(
+        [
+            _columns(1, [schedule_flight(at(1, 6))]),
+            _columns(
+                2,
+                [
+                    schedule_flight(at(2, 6), "32N"),
+                    schedule_flight(
+                        at(2, 9),
+                        crew_members=[crew_member("AAA", "CDB")],
+                    ),
+                ],
+            ),
+        ],
+        ROLES,
+    )
+
+    heatmap = staffing_heatmap(columns, date(2024, 1, 1), date(2024, 1, 3))
+
+    assert heatmap.aircraft_types == ["32N", "73H"]
+    assert heatmap.flights.tolist() == [[0, 1], [1, 1], [0, 0]]
+    assert heatmap.required[1].tolist() == [[1, 1, 3], [1, 1, 3]]
+    assert heatmap.assigned[1].tolist() == [[0, 0, 0], [1, 0, 0]]
+    assert heatmap.missing[1].tolist() == [[1, 1, 3], [0, 1, 3]]
+    assert heatmap.as_dict()["days"] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+
+
+def test_heatmap_filters_types_and_roles():
+    """Test the heatmap only covers the requested aircraft types and roles."""
+    columns = _columns(
+        1,
+        [
+            schedule_flight(at(1, 6)),
+            schedule_flight(at(1, 7), "32N"),
+        ],
+    )
+
+    heatmap = staffing_heatmap(
+        columns, date(2024, 1, 1), date(2024, 1, 1), ["73H"], ["CA"]
+    )
+
+    assert heatmap.flights.tolist() == [[1]]
+    assert heatmap.missing.tolist() == [[[3]]]
+
+
+def test_empty_columns():
+    """Test an empty schedule gives an empty heatmap."""
+    columns = ScheduleColumns.concatenate([], ROLES)
+
+    heatmap = staffing_heatmap(columns, date(2024, 1, 1), date(2024, 1, 2))
+
+    assert len(columns) == 0
+    assert heatmap.aircraft_types == []
+    assert np.asarray(heatmap.missing).shape == (2, 0, 3)
@@ -0,0 +1,88 @@
+"""Test the inverted indexes over the flight schedule."""
+from datetime import date
+
+from custom_components.apm.util.schedule_index import ScheduleIndex
+
+from .common import at, crew_member, schedule_flight
+
+ROLES = ("CDB", "OPL", "CC", "CA")
+ACFT_TYPES = ("73H", "32N")
+DAY = date(2024, 1, 1)
+
+STAFFED = [
+    crew_member("AAA", "CDB"),
+    crew_member("BBB", "OPL"),
+    crew_member("CCC", "CC"),
+    crew_member("DDD", "CA"),
+    crew_member("EEE", "CA"),
+    crew_member("FFF", "CA"),
+]
+
+
+def _index(flights, day=DAY):
+    index = ScheduleIndex(ROLES, ACFT_TYPES)
+    index.add_day(day, flights)
+
+    return index
+
+
+def test_missing_by_aircraft_type_and_role():
+    """Test flights missing crew are found by aircraft type and role."""
+    staffed = schedule_flight(at(1, 6), crew_members=STAFFED)
+    no_captain = schedule_flight(at(1, 8), crew_members=STAFFED[1:])
+    no_cabin = schedule_flight(at(1, 7), "32N", crew_members=STAFFED[:2])
+    index = _index([staffed, no_captain, no_cabin])
+
+    assert index.missing("73H", "CDB", DAY, DAY) == [no_captain]
+    assert index.missing("73H", None, DAY, DAY) == [no_captain]
+    assert index.missing(None, "CA", DAY, DAY) == [no_cabin]
+    assert index.missing(None, None, DAY, DAY) == [no_cabin, no_captain]
+    assert index.missing("73H", "OPL", DAY, DAY) == []
+    assert index.missing_roles(no_cabin) == ("CC", "CA")
+    assert index.missing_roles(staffed) == ()
+
+
+def test_instructor_fills_first_officer_seat():
+    """Test an instructor pilot counts towards the first officer's seat."""
+    flight = schedule_flight(
+        at(1, 6), crew_members=[crew_member("III", "IPL"), *STAFFED[:1], *STAFFED[2:]]
+    )
+
+    assert _index([flight]).missing(None, None, DAY, DAY) == []
+
+
+def test_unhandled_aircraft_type_is_not_checked():
+    """Test flights of other aircraft types are indexed without their gaps."""
+    other = schedule_flight(at(1, 6), "359", crew_members=STAFFED[:1])
+    index = _index([other])
+
+    assert index.missing(None, None, DAY, DAY) == []
+    assert index.departing(DAY, DAY) == [other]
+    assert index.crew_member("AAA", DAY, DAY) == [other]
+
+
+def test_crew_member_and_departing_lookups():
+    """Test flights are found by crew member and departure day, in order."""
+    later = schedule_flight(at(2, 6), crew_members=STAFFED[:1])
+    earlier = schedule_flight(at(1, 6), crew_members=STAFFED[:2])
+    index = ScheduleIndex(ROLES, ACFT_TYPES)
+    index.add_day(date(2024, 1, 2), [later])
+    index.add_day(DAY, [earlier])
+
+    assert index.crew_member("AAA", DAY, date(2024, 1, 2)) == [earlier, later]
+    assert index.crew_member("BBB", date(2024, 1, 2), date(2024, 1, 2)) == []
+    assert index.departing(DAY, date(2024, 1, 2)) == [earlier, later]
+
+
+def test_add_day_replaces_day():
+    """Test reindexing a day drops the flights indexed for it before."""
+    old = schedule_flight(at(1, 6), crew_members=STAFFED[:1])
+    index = _index([old])
+    new = schedule_flight(at(1, 7), crew_members=STAFFED)
+
+    index.add_day(DAY, [new])
+
+    assert index.departing(DAY, DAY) == [new]
+    assert index.crew_member("AAA", DAY, DAY) == [new]
+    assert index.missing(None, None, DAY, DAY) == []
+    assert index.missing_roles(old) == ()
@@ -0,0 +1,107 @@
+"""Test the flight time limitation sensors."""
+from datetime import date
+from unittest.mock import AsyncMock
+
+from custom_components.apm.sensor import async_setup_entry
+from custom_components.apm.util.roster_store import MergeResult
+from pytest_homeassistant_custom_component.common import (
+    MockEntityPlatform,
+    async_fire_time_changed,
+)
+import pytest
+
+from .common import at, flight_activity, ground_activity, merge_roster, mock_apm_data
+
+
+@pytest.fixture(name="sensors")
+async def sensors_fixture(hass, freezer):
+    """Set up the sensors of an account with flights on the 2nd and the 7th."""
+    await hass.config.async_set_time_zone("UTC")
+    freezer.move_to(at(8, 12))
+    data = mock_apm_data(hass)
+    data.coordinator.async_fetch_range = AsyncMock(return_value=MergeResult())
+    merge_roster(
+        data,
+        [
+            flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=1),
+            ground_activity(at(3), at(7), "O", "OFF", id=2),
+            flight_activity(at(7, 8), at(7, 11), id=3, pairing_id=2),
+        ],
+    )
+
+    entities = []
+    await async_setup_entry(hass, data.entry, entities.extend)
+    await hass.async_block_till_done()
+    platform = MockEntityPlatform(hass, domain="sensor", platform_name="apm")
+    await platform.async_add_entities(entities)
+
+    yield data
+
+    await platform.async_reset()
+
+
+def _state(hass, metric, days):
+    return hass.states.get(f"sensor.apm_{metric}_time_{days}d_123")
+
+
+async def test_sensors(hass, sensors):
+    """Test each window reports its total, limit and time remaining."""
+    block_28 = _state(hass, "block", 28)
+    duty_7 = _state(hass, "duty", 7)
+
+    assert float(_state(hass, "block", 7).state) == 5
+    assert _state(hass, "block", 7).attributes.get("limit") is None
+    assert float(block_28.state) == 5
+    assert block_28.attributes["limit"] == 100
+    assert block_28.attributes["remaining"] == 95
+    assert _state(hass, "block", 365).attributes["limit"] == 1000
+    assert float(duty_7.state) == 5
+    assert duty_7.attributes["remaining"] == 55
+    assert _state(hass, "duty", 28).attributes["limit"] == 190
+    assert float(_state(hass, "duty", 365).state) == 5
+
+
+async def test_history_is_fetched(hass, sensors):
+    """Test the roster of the past year is fetched in the background."""
+    sensors.coordinator.async_fetch_range.assert_awaited_once_with(
+        date(2023, 1, 9), date(2024, 1, 8)
+    )
+
+
+async def test_sensors_after_merge(hass, sensors):
+    """Test the totals follow the roster merged by the coordinator."""
+    merge_roster(
+        sensors,
+        [
+            flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=1),
+            flight_activity(at(7, 8), at(7, 11), id=3, pairing_id=2),
+            flight_activity(at(8, 6), at(8, 10), id=4, pairing_id=3),
+        ],
+    )
+    await hass.async_block_till_done()
+
+    assert float(_state(hass, "block", 7).state) == 9
+    assert _state(hass, "block", 28).attributes["remaining"] == 91
+
+
+async def test_window_rolls_over_at_midnight(hass, sensors, freezer):
+    """Test days leave the window at midnight, without any roster change."""
+    freezer.move_to(at(9))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+    assert float(_state(hass, "block", 7).state) == 3
+    assert float(_state(hass, "block", 28).state) == 5
+
+
+async def test_history_fetch_failure(hass, caplog):
+    """Test the sensors are set up even when the history can't be fetched."""
+    data = mock_apm_data(hass)
+    data.coordinator.async_fetch_range = AsyncMock(side_effect=TimeoutError)
+
+    entities = []
+    await async_setup_entry(hass, data.entry, entities.extend)
+    await hass.async_block_till_done()
+
+    assert len(entities) == 6
+    assert "Unable to fetch roster history" in caplog.text
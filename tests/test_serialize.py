@@ -0,0 +1,113 @@
+"""Test the JSON encoding of library objects."""
+from dataclasses import dataclass, field
+from datetime import date, timedelta, timezone
+from http import HTTPStatus
+import json
+from types import SimpleNamespace
+
+from apm_crewconnect import CrewMember
+import pytest
+
+from custom_components.apm.util.serialize import decode, encode
+
+from .common import (
+    at,
+    deadhead_activity,
+    flight_activity,
+    ground_activity,
+    hotel_activity,
+)
+
+
+@dataclass
+class Leg:
+    """Stand-in for a library dataclass which gained fields since it was encoded."""
+
+    number: str
+    remarks: str = ""
+    crew: list = field(default_factory=list)
+
+
+def _round_trip(value):
+    return decode(json.loads(json.dumps(encode(value))))
+
+
+def test_round_trip():
+    """Test roster activities survive a JSON round trip unchanged."""
+    activities = [
+        flight_activity(
+            at(1, 8),
+            at(1, 10),
+            id=1,
+            pairing_id=10,
+            check_in=at(1, 7),
+            check_out=at(1, 11),
+            block_time=timedelta(hours=1, minutes=55),
+        ),
+        hotel_activity(at(1, 12), at(2, 6), id=2, pairing_id=10),
+        deadhead_activity(at(2, 8), at(2, 10), id=3, pairing_id=10),
+        ground_activity(at(3), at(4), "O", "OFF", id=4),
+    ]
+
+    restored = _round_trip(activities)
+
+    assert restored == activities
+    assert [type(activity) for activity in restored] == [
+        type(activity) for activity in activities
+    ]
+    assert restored[0].origin_timezone == timezone(timedelta(hours=1))
+
+
+def test_round_trip_values():
+    """Test values without a JSON equivalent are tagged and rebuilt."""
+    value = {
+        "day": date(2024, 1, 1),
+        "zone": timezone(timedelta(hours=-3, minutes=-30), "NST"),
+        "utc": timezone.utc,
+        (1, 2): [timedelta(minutes=5)],
+    }
+
+    restored = _round_trip(value)
+
+    assert restored == value
+    assert restored["zone"].tzname(None) == "NST"
+
+
+def test_refuses_classes_outside_library():
+    """Test only classes of the library are rebuilt."""
+    with pytest.raises(ValueError):
+        decode({"__object__": "os:PathLike", "fields": {}})
+
+    with pytest.raises(ValueError):
+        decode({"__object__": "apm_crewconnect_evil:Activity", "fields": {}})
+
+    with pytest.raises(ValueError):
+        decode({"unknown": 1})
+
+
+def test_new_fields_get_defaults(monkeypatch):
+    """Test fields added to a dataclass since it was encoded get their defaults."""
+    monkeypatch.setattr("custom_components.apm.util.serialize.LIBRARY", __name__)
+    encoded = encode(Leg("AF7700", "Late", ["AAA"]))
+    del encoded["fields"]["remarks"], encoded["fields"]["crew"]
+
+    assert decode(encoded) == Leg("AF7700")
+
+
+def test_encode_other_values():
+    """Test plain objects and enums are tagged, and other values refused."""
+    member = CrewMember("A", "B", "", False, False, crew_code="AAA")
+    encoded = encode(SimpleNamespace(member=member))
+
+    assert encoded["__object__"] == "types:SimpleNamespace"
+    assert _round_trip(member) == member
+    assert encode(HTTPStatus.OK) == {"__enum__": "http:HTTPStatus", "value": 200}
+
+    with pytest.raises(ValueError):
+        decode(encode(HTTPStatus.OK))
+
+    with pytest.raises(ValueError):
+        decode({"__object__": "apm_crewconnect:utils", "fields": {}})
+
+    with pytest.raises(TypeError):
+        encode(object())
@@ -0,0 +1,340 @@
+"""Test the helpers of the APM CrewConnect services."""
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from custom_components.apm.const import DOMAIN
+from custom_components.apm.services import (
+    FLIGHT_FIELDS,
+    _flight_record,
+    async_register_services,
+)
+from custom_components.apm.util.roster_store import MergeResult
+from custom_components.apm.util.schedule_cache import FlightScheduleCache
+from custom_components.apm.util.schedule_index import ScheduleIndex
+from homeassistant.exceptions import ServiceValidationError
+import pytest
+
+from .common import (
+    at,
+    crew_member,
+    flight_activity,
+    ground_activity,
+    hotel_activity,
+    merge_roster,
+    mock_apm_data,
+    schedule_flight,
+)
+
+
+@pytest.fixture(name="schedule")
+async def schedule_fixture(hass):
+    """Serve a schedule with a flight missing a captain and a first officer."""
+    data = mock_apm_data(hass)
+    schedule = FlightScheduleCache(("CDB", "OPL"), ("73H", "32N"))
+    schedule.add(
+        date(2024, 1, 1),
+        date(2024, 1, 1),
+        [
+            schedule_flight(at(1, 6), leg_id=1),
+            schedule_flight(at(1, 9), leg_id=2, crew_members=[crew_member("A", "CDB")]),
+            schedule_flight(at(1, 12), "32N", leg_id=3),
+        ],
+        at(1),
+    )
+    data.async_get_schedule_index = AsyncMock(return_value=schedule.index)
+    data.async_get_schedule_columns = AsyncMock(side_effect=schedule.columns)
+    await async_register_services(hass)
+
+    return schedule
+
+
+def test_flight_record_projects_every_field():
+    """Test schedule flights are projected onto each of the fields."""
+    flight = schedule_flight(at(1, 6), origin="ORY", destination="BIA")
+    index = ScheduleIndex(("CDB", "OPL"), ("73H",))
+    index.add_day(at(1).date(), [flight])
+
+    record = _flight_record(flight, list(FLIGHT_FIELDS), index)
+
+    assert record == {
+        "flight_number": "AF7700",
+        "departure_time": at(1, 6).isoformat(),
+        "arrival_time": at(1, 8).isoformat(),
+        "origin": "ORY",
+        "destination": "BIA",
+        "aircraft_type": "73H",
+        "missing_roles": ["CDB", "OPL"],
+    }
+
+
+async def test_staffing_gaps_list_each_flight_once(hass, schedule):
+    """Test gaps refer to their flights by key, each flight being returned once."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "find_staffing_gaps",
+        {"start_date": "2024-01-01", "aircraft_types": ["73H"]},
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response["gaps"]["73H"]["CDB"] == {
+        "count": 1,
+        "offset": 0,
+        "data": ["1"],
+    }
+    assert response["gaps"]["73H"]["OPL"]["data"] == ["1", "2"]
+    assert list(response["flights"]) == ["1", "2"]
+    assert response["flights"]["1"].leg_id == 1
+
+
+async def test_staffing_gaps_pages_and_records(hass, schedule):
+    """Test gaps are paged through and flights projected like unstaffed flights."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "find_staffing_gaps",
+        {
+            "start_date": "2024-01-01",
+            "roles": ["OPL"],
+            "offset": 1,
+            "limit": 1,
+            "fields": ["flight_number", "missing_roles"],
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response["gaps"]["73H"]["OPL"] == {
+        "count": 2,
+        "offset": 1,
+        "data": ["2"],
+    }
+    assert response["gaps"]["32N"]["OPL"]["data"] == []
+    assert response["flights"] == {
+        "2": {"flight_number": "AF7700", "missing_roles": ["OPL"]},
+    }
+
+
+async def test_unstaffed_flights_are_paged(hass, schedule):
+    """Test unstaffed flights are paged through and projected onto fields."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "find_unstaffed_flights",
+        {
+            "start_date": "2024-01-01",
+            "aircraft_type": "73H",
+            "limit": 1,
+            "fields": ["departure_time"],
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response == {
+        "count": 2,
+        "offset": 0,
+        "data": [{"departure_time": at(1, 6).isoformat()}],
+    }
+
+
+async def test_flight_time_limits_fetch_published_roster(hass, freezer):
+    """Test checking limits doesn't fetch the roster beyond its publication."""
+    await hass.config.async_set_time_zone("UTC")
+    freezer.move_to(at(1, 6))
+    data = mock_apm_data(hass)
+    data.coordinator.async_fetch_range = AsyncMock(return_value=MergeResult())
+    merge_roster(data, [flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=1)])
+    await async_register_services(hass)
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        "check_flight_time_limits",
+        {"departure": at(3, 8).isoformat(), "block_time": "03:00"},
+        blocking=True,
+        return_response=True,
+    )
+
+    data.coordinator.async_fetch_range.assert_awaited_once_with(
+        date(2023, 1, 4), date(2024, 1, 31)
+    )
+    assert not response["breach"]
+    assert response["windows"][0] == {
+        "days": 7,
+        "block": 5,
+        "duty": 5,
+        "block_limit": None,
+        "duty_limit": 60,
+        "breach": False,
+    }
+
+
+async def test_open_time_fills_days_off(hass, schedule):
+    """Test flights on days off fit, while those near a duty don't."""
+    data = next(iter(hass.data[DOMAIN].values()))
+    data.coordinator.async_fetch_range = AsyncMock(return_value=MergeResult())
+    merge_roster(
+        data,
+        [
+            ground_activity(at(1), at(1, 10), "O", "OFF", id=1),
+            flight_activity(at(1, 15), at(1, 17), id=2, pairing_id=1),
+        ],
+    )
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        "find_open_time",
+        {
+            "start_date": "2024-01-01",
+            "role": "OPL",
+            "rest": "02:00",
+            "fields": ["departure_time"],
+        },
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response == {
+        "count": 2,
+        "data": [
+            {"departure_time": at(1, 6).isoformat()},
+            {"departure_time": at(1, 9).isoformat()},
+        ],
+    }
+
+
+async def test_staffing_heatmap(hass, schedule):
+    """Test the heatmap counts the flights and seats of each day."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "staffing_heatmap",
+        {"start_date": "2024-01-01", "end_date": "2024-01-02", "roles": ["CDB"]},
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response["days"] == ["2024-01-01", "2024-01-02"]
+    assert response["roles"] == ["CDB"]
+
+
+async def test_crew_member_flights(hass, schedule):
+    """Test the flights a crew member is assigned to are found."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "find_crew_member_flights",
+        {"crew_code": "A", "start_date": "2024-01-01"},
+        blocking=True,
+        return_response=True,
+    )
+
+    assert response["count"] == 1
+    assert response["data"][0].leg_id == 2
+
+
+async def test_get_pairing(hass, schedule):
+    """Test a pairing of the roster is returned with its legs and layovers."""
+    data = next(iter(hass.data[DOMAIN].values()))
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), "CDG", "NCE", id=1, pairing_id=7),
+            hotel_activity(at(1, 11), at(2, 7), id=2, pairing_id=7),
+        ],
+    )
+
+    response = await hass.services.async_call(
+        DOMAIN, "get_pairing", {"pairing_id": 7}, blocking=True, return_response=True
+    )
+
+    assert response["route"] == ["CDG", "NCE"]
+    assert response["layovers"][0]["station"] == "NCE"
+
+    with pytest.raises(ServiceValidationError):
+        await hass.services.async_call(
+            DOMAIN,
+            "get_pairing",
+            {"pairing_id": 8},
+            blocking=True,
+            return_response=True,
+        )
+
+
+async def test_generate_roster_ical(hass, schedule):
+    """Test the roster of a range is exported, and saved on request."""
+    data = next(iter(hass.data[DOMAIN].values()))
+    data.ical_blocks = data.coordinator.store.memo(
+        lambda activity: f"EV{activity.id}"
+    )
+    data.coordinator.async_fetch_range = AsyncMock(return_value=MergeResult())
+    merge_roster(
+        data,
+        [
+            flight_activity(at(1, 8), at(1, 10), id=1),
+            flight_activity(at(3, 8), at(3, 10), id=2),
+        ],
+    )
+
+    with patch("custom_components.apm.services.iCal.to_file") as to_file:
+        response = await hass.services.async_call(
+            DOMAIN,
+            "generate_roster_ical",
+            {"start_date": "2024-01-01", "end_date": "2024-01-01"},
+            blocking=True,
+            return_response=True,
+        )
+
+        to_file.assert_not_called()
+
+        await hass.services.async_call(
+            DOMAIN,
+            "generate_roster_ical",
+            {
+                "start_date": "2024-01-01",
+                "end_date": "2024-01-01",
+                "save_to_file": True,
+            },
+            blocking=True,
+            return_response=True,
+        )
+
+    data.coordinator.async_fetch_range.assert_awaited_with(
+        date(2024, 1, 1), date(2024, 1, 1)
+    )
+    assert "EV1" in response["ical"]
+    assert "EV2" not in response["ical"]
+    to_file.assert_called_once_with("/config/123_apm_roster.ics")
+
+
+async def test_account_selection(hass, schedule):
+    """Test an account must be selected once several are configured."""
+    get_pairing = {"pairing_id": 7}
+
+    with pytest.raises(ServiceValidationError, match="No APM account"):
+        await hass.services.async_call(
+            DOMAIN,
+            "get_pairing",
+            {**get_pairing, "account": "456"},
+            blocking=True,
+            return_response=True,
+        )
+
+    mock_apm_data(hass)
+
+    with pytest.raises(ServiceValidationError, match="Several APM accounts"):
+        await hass.services.async_call(
+            DOMAIN, "get_pairing", get_pairing, blocking=True, return_response=True
+        )
+
+    with pytest.raises(ServiceValidationError, match="No pairing"):
+        await hass.services.async_call(
+            DOMAIN,
+            "get_pairing",
+            {**get_pairing, "account": "123"},
+            blocking=True,
+            return_response=True,
+        )
+
+    hass.data[DOMAIN].clear()
+
+    with pytest.raises(ServiceValidationError, match="No APM account is configured"):
+        await hass.services.async_call(
+            DOMAIN, "get_pairing", get_pairing, blocking=True, return_response=True
+        )
@@ -0,0 +1,105 @@
+"""Test the coalescing of concurrent date range requests."""
+import asyncio
+from datetime import date
+
+import pytest
+
+from custom_components.apm.util.single_flight import SingleFlight
+
+
+async def test_covered_request_joins_in_flight_request():
+    """Test a request within a wider one in flight shares its result."""
+    single_flight = SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def request(name):
+        calls.append(name)
+        await release.wait()
+        return name
+
+    wide = asyncio.create_task(
+        single_flight.async_run(
+            date(2024, 1, 1), date(2024, 1, 31), lambda: request("wide")
+        )
+    )
+    await asyncio.sleep(0)
+    narrow = asyncio.create_task(
+        single_flight.async_run(
+            date(2024, 1, 5), date(2024, 1, 10), lambda: request("narrow")
+        )
+    )
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await wide == ("wide", False)
+    assert await narrow == ("wide", True)
+    assert calls == ["wide"]
+
+
+async def test_uncovered_request_runs_on_its_own():
+    """Test a request reaching outside the ones in flight is issued."""
+    single_flight = SingleFlight()
+
+    async def request(name):
+        await asyncio.sleep(0)
+        return name
+
+    results = await asyncio.gather(
+        single_flight.async_run(
+            date(2024, 1, 1), date(2024, 1, 10), lambda: request("first")
+        ),
+        single_flight.async_run(
+            date(2024, 1, 5), date(2024, 1, 15), lambda: request("second")
+        ),
+    )
+
+    assert results == [("first", False), ("second", False)]
+
+
+async def test_open_ended_requests_only_join_identical_ones():
+    """Test a request without an end only joins the same request."""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def request(name):
+        calls.append(name)
+        await asyncio.sleep(0)
+        return name
+
+    await asyncio.gather(
+        single_flight.async_run(date(2024, 1, 1), None, lambda: request("day")),
+        single_flight.async_run(date(2024, 1, 1), None, lambda: request("same")),
+        single_flight.async_run(
+            date(2024, 1, 1), date(2024, 1, 2), lambda: request("range")
+        ),
+    )
+
+    assert calls == ["day", "range"]
+
+
+async def test_failure_is_shared_and_cleared():
+    """Test joined callers see the failure and later requests run again."""
+    single_flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise ValueError
+
+    async def succeeding():
+        return "ok"
+
+    results = await asyncio.gather(
+        single_flight.async_run(date(2024, 1, 1), date(2024, 1, 31), failing),
+        single_flight.async_run(date(2024, 1, 2), date(2024, 1, 3), failing),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+    with pytest.raises(ValueError):
+        await single_flight.async_run(date(2024, 1, 1), date(2024, 1, 31), failing)
+
+    assert await single_flight.async_run(
+        date(2024, 1, 1), date(2024, 1, 31), succeeding
+    ) == ("ok", False)
@@ -0,0 +1,124 @@
+"""Test the background refresh of APM tokens."""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from apm_crewconnect.exceptions import (
+    ApmClientException,
+    InvalidTokenException,
+    OktaClientException,
+)
+from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
+import pytest
+
+from custom_components.apm import TOKEN_REFRESH_RETRY, ApmData
+from custom_components.apm.const import DOMAIN
+from homeassistant.util.dt import utcnow
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from requests.exceptions import ConnectionError
+
+
+class FakeTokenManager:
+    """Token manager holding a single token expiry."""
+
+    def __init__(self, expires_at):
+        """Initialize the token manager."""
+        self.expires_at_value = expires_at
+
+    def expires_at(self):
+        """Return when the token expires."""
+        return self.expires_at_value
+
+
+def _data(hass, expires_at, refresh_token):
+    data = ApmData(hass, MockConfigEntry(domain=DOMAIN), "apm.example.com")
+    data.token_manager = FakeTokenManager(expires_at)
+    data.apm = SimpleNamespace(client=SimpleNamespace(refresh_token=refresh_token))
+
+    return data
+
+
+async def test_refresh_renews_tokens_and_reschedules(hass):
+    """Test a refresh goes through the client and waits for the new expiry."""
+    data = _data(hass, utcnow() - timedelta(minutes=1), None)
+
+    def refresh_token():
+        data.token_manager.expires_at_value = utcnow() + timedelta(hours=1)
+
+    data.apm.client.refresh_token = MagicMock(side_effect=refresh_token)
+
+    await data._async_refresh_tokens(utcnow())
+
+    data.apm.client.refresh_token.assert_called_once_with()
+    assert data._unsub_token_refresh is not None
+    data._async_cancel_token_refresh()
+
+
+async def test_refresh_without_renewal_is_retried_later(hass, monkeypatch):
+    """Test tokens left unchanged by a refresh are refreshed again after a delay."""
+    data = _data(hass, utcnow() - timedelta(minutes=1), MagicMock())
+    scheduled = _track_scheduled(monkeypatch)
+
+    await data._async_refresh_tokens(utcnow())
+
+    assert scheduled[0] >= utcnow() + TOKEN_REFRESH_RETRY - timedelta(seconds=5)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [ConnectionError, ApmClientException, OktaClientException, InvalidTokenException],
+)
+async def test_failed_refresh_is_retried_later(hass, monkeypatch, error):
+    """Test a failed refresh is retried after a delay, not straight away."""
+    data = _data(hass, utcnow() - timedelta(minutes=1), MagicMock())
+    data.apm.client.refresh_token.side_effect = error
+    scheduled = _track_scheduled(monkeypatch)
+
+    await data._async_refresh_tokens(utcnow())
+
+    assert scheduled[0] >= utcnow() + TOKEN_REFRESH_RETRY - timedelta(seconds=5)
+
+
+async def test_retries_back_off(hass, monkeypatch):
+    """Test each failure doubles the delay, up to a maximum, until a success."""
+    data = _data(hass, utcnow() - timedelta(minutes=1), MagicMock())
+    data.apm.client.refresh_token.side_effect = ApmClientException
+    scheduled = _track_scheduled(monkeypatch)
+
+    for _ in range(8):
+        await data._async_refresh_tokens(utcnow())
+
+    delays = [round((point - utcnow()) / TOKEN_REFRESH_RETRY) for point in scheduled]
+
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
+
+    def refresh_token():
+        data.token_manager.expires_at_value = utcnow() + timedelta(hours=1)
+
+    data.apm.client.refresh_token.side_effect = refresh_token
+    await data._async_refresh_tokens(utcnow())
+
+    assert data._token_refresh_failures == 0
+
+
+async def test_rejected_refresh_token_starts_reauth(hass, monkeypatch):
+    """Test a refresh token APM rejects asks the user to authorize again."""
+    data = _data(hass, utcnow() - timedelta(minutes=1), MagicMock())
+    data.apm.client.refresh_token.side_effect = InvalidGrantError
+    scheduled = _track_scheduled(monkeypatch)
+
+    with patch.object(data.entry, "async_start_reauth") as start_reauth:
+        await data._async_refresh_tokens(utcnow())
+
+    start_reauth.assert_called_once_with(hass)
+    assert not scheduled
+
+
+def _track_scheduled(monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(
+        "custom_components.apm.async_track_point_in_utc_time",
+        lambda hass, action, point: scheduled.append(point) or (lambda: None),
+    )
+
+    return scheduled
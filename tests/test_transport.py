@@ -0,0 +1,259 @@
+"""Test the transport of the APM client's requests."""
+import asyncio
+import sys
+from types import ModuleType, SimpleNamespace
+from unittest.mock import patch
+
+import aiohttp
+import pytest
+import requests
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+import requests_mock
+from pytest_homeassistant_custom_component.test_util.aiohttp import (
+    AiohttpClientMockResponse,
+)
+
+from custom_components.apm.transport import (
+    REQUEST_TIMEOUT,
+    AiohttpAdapter,
+    ApmTransport,
+    async_get_transport,
+)
+
+URL = "https://apm.example.com/api/crews/123/roster-calendars"
+
+
+@pytest.fixture(name="library_module")
+def library_module_fixture():
+    """Register a library module calling the requests module like the client."""
+    module = ModuleType("apm_crewconnect.fake_client")
+    module.requests = requests
+    sys.modules[module.__name__] = module
+
+    yield module
+
+    del sys.modules[module.__name__]
+
+
+def _prepared(url=URL):
+    return requests.Request("get", url).prepare()
+
+
+def test_library_requests_get_timeout(library_module):
+    """Test requests of calls run through a transport are sent with a timeout."""
+    transport = ApmTransport()
+
+    with requests_mock.Mocker() as mocker:
+        mocker.get(URL, json={"ok": True})
+        response = transport.run(library_module.requests.get, URL)
+
+    assert response.json() == {"ok": True}
+    assert mocker.request_history[0].timeout == REQUEST_TIMEOUT
+    assert library_module.requests.exceptions is requests.exceptions
+
+
+def test_every_method_goes_through_transport(library_module):
+    """Test each request method of the module is sent through a transport."""
+    transport = ApmTransport()
+    client = library_module.requests
+
+    with requests_mock.Mocker() as mocker:
+        mocker.register_uri(requests_mock.ANY, URL)
+        for send in (
+            client.options,
+            client.head,
+            client.put,
+            client.patch,
+            client.delete,
+        ):
+            transport.run(send, URL)
+
+    assert [request.method for request in mocker.request_history] == [
+        "OPTIONS",
+        "HEAD",
+        "PUT",
+        "PATCH",
+        "DELETE",
+    ]
+    assert all(
+        request.timeout == REQUEST_TIMEOUT for request in mocker.request_history
+    )
+
+
+def test_other_calls_use_requests(library_module):
+    """Test requests made outside a transport are sent by requests as they are."""
+    ApmTransport()
+
+    with requests_mock.Mocker() as mocker:
+        mocker.get(URL, status_code=503)
+        response = library_module.requests.get(URL)
+
+    assert response.status_code == 503
+    assert mocker.request_history[0].timeout is None
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_overloaded_responses_raise(library_module, status):
+    """Test responses telling APM is overloaded are raised."""
+    transport = ApmTransport()
+
+    with requests_mock.Mocker() as mocker:
+        mocker.get(URL, status_code=status, headers={"Retry-After": "5"})
+
+        with pytest.raises(HTTPError) as err:
+            transport.run(
+                lambda: library_module.requests.request("get", URL, timeout=5)
+            )
+
+    assert err.value.response.status_code == status
+    assert mocker.request_history[0].timeout == 5
+
+
+def test_other_errors_are_left_to_the_library(library_module):
+    """Test other error responses are returned as they are."""
+    transport = ApmTransport()
+
+    with requests_mock.Mocker() as mocker:
+        mocker.post(URL, status_code=401)
+
+        response = transport.run(lambda: library_module.requests.post(URL, json={}))
+
+    assert response.status_code == 401
+
+
+def test_other_modules_are_left_alone():
+    """Test modules outside the library keep the requests module."""
+    module = ModuleType("apm_crewconnect_other")
+    module.requests = requests
+    sys.modules[module.__name__] = module
+
+    try:
+        ApmTransport()
+    finally:
+        del sys.modules[module.__name__]
+
+    assert module.requests is requests
+
+
+def test_attach_mounts_adapter_on_okta_session():
+    """Test a client's Okta session sends its requests through the transport."""
+    session = Session()
+    okta_client = SimpleNamespace(session=session)
+    apm = SimpleNamespace(client=SimpleNamespace(okta_client=okta_client))
+    transport = ApmTransport()
+
+    transport.attach(apm)
+
+    assert session.get_adapter(URL) is transport._adapter
+
+
+@patch.object(AiohttpClientMockResponse, "reason", "OK", create=True)
+async def test_library_requests_go_through_aiohttp(
+    hass, aioclient_mock, library_module
+):
+    """Test requests of the library are sent over Home Assistant's aiohttp session."""
+    aioclient_mock.get(URL, json={"activities": []})
+    aioclient_mock.get(URL + "/busy", status=503)
+    transport = async_get_transport(hass)
+
+    response = await hass.async_add_executor_job(
+        transport.run,
+        lambda: library_module.requests.get(URL, params={"dateFrom": "2024-01-01"}),
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"activities": []}
+    assert aioclient_mock.call_count == 1
+    assert str(aioclient_mock.mock_calls[0][1]) == URL + "?dateFrom=2024-01-01"
+
+    with pytest.raises(HTTPError):
+        await hass.async_add_executor_job(
+            transport.run, library_module.requests.get, URL + "/busy"
+        )
+
+    assert aioclient_mock.call_count == 2
+    assert async_get_transport(hass) is transport
+
+
+@patch.object(AiohttpClientMockResponse, "reason", "OK", create=True)
+async def test_aiohttp_cookies_and_errors(hass, aioclient_mock, library_module):
+    """Test cookies are handed back, and aiohttp errors raised as requests errors."""
+    aioclient_mock.get(URL, cookies={"sid": "abc"})
+    aioclient_mock.get(URL + "/slow", exc=TimeoutError)
+    aioclient_mock.get(URL + "/down", exc=aiohttp.ClientConnectionError)
+    transport = async_get_transport(hass)
+
+    response = await hass.async_add_executor_job(
+        transport.run, library_module.requests.get, URL
+    )
+
+    assert response.cookies["sid"] == "abc"
+
+    with pytest.raises(Timeout):
+        await hass.async_add_executor_job(
+            transport.run, library_module.requests.get, URL + "/slow"
+        )
+
+    with pytest.raises(ConnectionError):
+        await hass.async_add_executor_job(
+            transport.run, library_module.requests.get, URL + "/down"
+        )
+
+
+async def test_requests_refused_from_event_loop(hass, aioclient_mock, library_module):
+    """Test requests can't block the event loop."""
+    transport = async_get_transport(hass)
+
+    with pytest.raises(RuntimeError):
+        transport.run(library_module.requests.get, URL)
+
+
+async def test_hung_request_is_cancelled(hass):
+    """Test the executor thread stops waiting and cancels a hung request."""
+    cancelled = asyncio.Event()
+    adapter = AiohttpAdapter(hass, None)
+
+    async def _async_send(request, timeout):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with patch.object(adapter, "_async_send", _async_send), patch(
+        "custom_components.apm.transport.RESULT_GRACE", 0
+    ):
+        with pytest.raises(Timeout):
+            await hass.async_add_executor_job(
+                lambda: adapter.send(_prepared(), timeout=0.1)
+            )
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+
+async def test_failed_request_is_cancelled(hass):
+    """Test any other error of a request is raised in the executor thread."""
+    adapter = AiohttpAdapter(hass, None)
+
+    async def _async_send(request, timeout):
+        raise ValueError
+
+    with patch.object(adapter, "_async_send", _async_send), pytest.raises(
+        ValueError
+    ):
+        await hass.async_add_executor_job(adapter.send, _prepared())
+
+
+def test_requests_fall_back_once_the_loop_stopped():
+    """Test requests are sent with requests itself once the event loop stopped."""
+    loop = asyncio.new_event_loop()
+    loop.close()
+    adapter = AiohttpAdapter(SimpleNamespace(loop=loop), None)
+    response = Response()
+
+    with patch.object(HTTPAdapter, "send", return_value=response) as send:
+        assert adapter.send(_prepared()) is response
+
+    assert send.call_args.args[2] == REQUEST_TIMEOUT
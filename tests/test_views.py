@@ -0,0 +1,140 @@
+"""Test the iCal roster feed."""
+from functools import partial
+from http import HTTPStatus
+from unittest.mock import AsyncMock
+
+from custom_components.apm.util.ical import render_event
+from custom_components.apm.util.roster_store import MergeResult
+from custom_components.apm.views import ApmRosterFeedView
+from homeassistant.setup import async_setup_component
+import pytest
+
+from .common import at, flight_activity, merge_roster, mock_apm_data
+
+FEED_URL = "/api/apm/123/roster.ics"
+
+
+@pytest.fixture(name="feed_data")
+async def feed_data_fixture(hass, freezer):
+    """Serve the feed of an account with a single flight."""
+    freezer.move_to(at(1, 6))
+    assert await async_setup_component(hass, "http", {})
+    hass.http.register_view(ApmRosterFeedView())
+
+    data = mock_apm_data(hass)
+    data.ical_blocks = data.coordinator.store.memo(partial(render_event, "123"))
+    data.coordinator.async_fetch_range = AsyncMock(return_value=MergeResult())
+    merge_roster(data, [flight_activity(at(2, 8), at(2, 10), id=1, pairing_id=7)])
+
+    return data
+
+
+async def test_feed(hass, feed_data, hass_client):
+    """Test the feed lists the roster with a weak ETag and its last change."""
+    client = await hass_client()
+
+    response = await client.get(FEED_URL)
+    body = await response.text()
+
+    assert response.status == HTTPStatus.OK
+    assert response.content_type == "text/calendar"
+    assert response.headers["ETag"].startswith('W/"')
+    assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 06:00:00 GMT"
+    assert body.startswith("BEGIN:VCALENDAR\r\n")
+    assert "SUMMARY:AF7700 CDG-NCE(+0100)\r\n" in body
+    assert body.endswith("END:VCALENDAR\r\n")
+
+
+async def test_unchanged_feed_by_etag(hass, feed_data, hass_client):
+    """Test a known ETag gets a bodiless 304, whatever the encoding."""
+    client = await hass_client()
+    etag = (await client.get(FEED_URL)).headers["ETag"]
+
+    for encoding in ("gzip", "identity"):
+        response = await client.get(
+            FEED_URL,
+            headers={"If-None-Match": etag, "Accept-Encoding": encoding},
+        )
+
+        assert response.status == HTTPStatus.NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+
+    response = await client.get(FEED_URL, headers={"If-None-Match": '"other"'})
+
+    assert response.status == HTTPStatus.OK
+
+
+async def test_changed_feed_by_etag(hass, feed_data, hass_client):
+    """Test a roster change gets a new ETag."""
+    client = await hass_client()
+    etag = (await client.get(FEED_URL)).headers["ETag"]
+
+    merge_roster(
+        feed_data,
+        [flight_activity(at(2, 9), at(2, 11), id=1, pairing_id=7)],
+    )
+    response = await client.get(FEED_URL, headers={"If-None-Match": etag})
+
+    assert response.status == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+
+
+async def test_unchanged_feed_by_date(hass, feed_data, hass_client):
+    """Test a feed unchanged since the given date gets a bodiless 304."""
+    client = await hass_client()
+
+    response = await client.get(
+        FEED_URL, headers={"If-Modified-Since": "Mon, 01 Jan 2024 06:00:00 GMT"}
+    )
+
+    assert response.status == HTTPStatus.NOT_MODIFIED
+
+    response = await client.get(
+        FEED_URL, headers={"If-Modified-Since": "Mon, 01 Jan 2024 05:00:00 GMT"}
+    )
+
+    assert response.status == HTTPStatus.OK
+
+    response = await client.get(FEED_URL, headers={"If-Modified-Since": "never"})
+
+    assert response.status == HTTPStatus.OK
+
+
+async def test_feed_when_apm_is_unreachable(hass, feed_data, hass_client):
+    """Test the cached roster is served when it can't be refreshed."""
+    feed_data.coordinator.async_fetch_range.side_effect = TimeoutError
+    client = await hass_client()
+
+    response = await client.get(FEED_URL)
+
+    assert response.status == HTTPStatus.OK
+    assert "BEGIN:VEVENT\r\n" in await response.text()
+
+
+async def test_unknown_user(hass, feed_data, hass_client):
+    """Test the feed of an account which isn't set up isn't found."""
+    client = await hass_client()
+
+    response = await client.get("/api/apm/456/roster.ics")
+
+    assert response.status == HTTPStatus.NOT_FOUND
+
+
+async def test_feed_requires_auth(hass, feed_data, hass_client_no_auth):
+    """Test the feed isn't served without authentication."""
+    client = await hass_client_no_auth()
+
+    response = await client.get(FEED_URL)
+
+    assert response.status == HTTPStatus.UNAUTHORIZED
+
+
+async def test_unchanged_feed_by_date_without_zone(hass, feed_data, hass_client):
+    """Test a date without a time zone is taken as UTC."""
+    client = await hass_client()
+
+    response = await client.get(
+        FEED_URL, headers={"If-Modified-Since": "Mon, 01 Jan 2024 06:00:00 -0000"}
+    )
+
+    assert response.status == HTTPStatus.NOT_MODIFIED